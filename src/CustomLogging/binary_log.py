@@ -0,0 +1,378 @@
+"""
+Compact binary telemetry log format
+
+Replaces the eval()-parsed *_parsed.txt files. A log is a short header (magic, version and a JSON schema taken from
+fcb_message_parsing.MESSAGE_CALLBACKS) followed by length-prefixed records:
+
+    R: run start                 float64 start_time
+    T: message type definition   uint16 type_id, utf-8 name
+    K: key definition            uint16 key_id, utf-8 name
+    P: packet                    float64 timestamp, uint16 type_id, uint16 field_count, then field_count fields of
+                                 uint16 key_id, 1 byte value tag, value
+
+Value tags are ? (bool), q (int64), d (float64), s (uint16 length + utf-8), l (uint16 count + float64s) and
+b (uint16 count + one byte per bool).  Anything else gets written as its str().
+
+Type and key ids are scoped to a run, so a file can be appended to the same way the text logs are.
+"""
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Tuple
+
+import numpy
+
+MAGIC = b"DPFBLOG\x00"
+VERSION = 1
+BINARY_LOG_EXTENSION = ".bin"
+
+FILE_HEADER = struct.Struct("<8sHI")
+RECORD_HEADER = struct.Struct("<cI")
+RUN_START = struct.Struct("<d")
+DEFINITION = struct.Struct("<H")
+PACKET_HEADER = struct.Struct("<dHH")
+UINT_16 = struct.Struct("<H")
+FLOAT_64 = struct.Struct("<d")
+INT_64 = struct.Struct("<q")
+
+RUN_START_RECORD = b"R"
+TYPE_RECORD = b"T"
+KEY_RECORD = b"K"
+PACKET_RECORD = b"P"
+
+BOOL_VALUE = b"?"
+INT_VALUE = b"q"
+FLOAT_VALUE = b"d"
+STRING_VALUE = b"s"
+LIST_VALUE = b"l"
+BOOL_LIST_VALUE = b"b"
+
+
+def get_binary_log_schema():
+    """Builds the schema header from the FCB message definitions, so a log can be interpreted without the code that wrote it"""
+    from src.Modules.MessageParsing.fcb_message_parsing import (
+        GROUND_STATION_MESSAGE_TYPES,
+        MESSAGE_CALLBACKS,
+    )
+
+    message_types = {}
+    for message_number in MESSAGE_CALLBACKS:
+        [message_name, message_class] = MESSAGE_CALLBACKS[message_number]
+        message_types[str(message_number)] = {"name": message_name.strip(), "fields": [line[1] for line in message_class.messageData]}
+
+    return {"message_types": message_types, "ground_station_message_types": GROUND_STATION_MESSAGE_TYPES, "value_tags": {"?": "bool", "q": "int64", "d": "float64", "s": "utf-8 string", "l": "float64 list", "b": "bool list"}}
+
+
+def encode_value(value) -> bytes:
+    """Encodes one dictionary value as a tag byte followed by its payload"""
+    if isinstance(value, (bool, numpy.bool_)):
+        return BOOL_VALUE + (b"\x01" if value else b"\x00")
+    elif isinstance(value, (int, numpy.integer)) and -(2**63) <= value < 2**63:
+        return INT_VALUE + INT_64.pack(int(value))
+    elif isinstance(value, (float, numpy.floating)):
+        return FLOAT_VALUE + FLOAT_64.pack(float(value))
+    elif isinstance(value, (list, tuple)) and len(value) > 0 and all(isinstance(it, (bool, numpy.bool_)) for it in value):
+        return BOOL_LIST_VALUE + UINT_16.pack(len(value)) + bytes(bool(it) for it in value)
+    elif isinstance(value, (list, tuple)) and all(isinstance(it, (bool, int, float, numpy.number)) for it in value):
+        return LIST_VALUE + UINT_16.pack(len(value)) + struct.pack("<{}d".format(len(value)), *value)
+    else:
+        string_bytes = str(value).encode(errors="replace")[:0xFFFF]
+        return STRING_VALUE + UINT_16.pack(len(string_bytes)) + string_bytes
+
+
+def decode_value(buffer, offset) -> Tuple[object, int]:
+    """Decodes a value written by encode_value.  Returns (value, next_offset)"""
+    tag = buffer[offset : offset + 1]
+    offset += 1
+
+    if tag == FLOAT_VALUE:
+        return FLOAT_64.unpack_from(buffer, offset)[0], offset + 8
+    elif tag == INT_VALUE:
+        return INT_64.unpack_from(buffer, offset)[0], offset + 8
+    elif tag == BOOL_VALUE:
+        return buffer[offset] != 0, offset + 1
+    elif tag == STRING_VALUE:
+        length = UINT_16.unpack_from(buffer, offset)[0]
+        offset += 2
+        return bytes(buffer[offset : offset + length]).decode(errors="replace"), offset + length
+    elif tag == LIST_VALUE:
+        count = UINT_16.unpack_from(buffer, offset)[0]
+        offset += 2
+        return list(struct.unpack_from("<{}d".format(count), buffer, offset)), offset + 8 * count
+    elif tag == BOOL_LIST_VALUE:
+        count = UINT_16.unpack_from(buffer, offset)[0]
+        offset += 2
+        return [it != 0 for it in buffer[offset : offset + count]], offset + count
+    else:
+        raise ValueError("Unknown value tag {}".format(tag))
+
+
+class BinaryLogWriter(object):
+    def __init__(self, file_name):
+        """
+        Writes parsed packets into the binary log format.
+
+        Opens the file in append mode, and starts a new run every time it's created.
+        """
+        self.file_name = file_name
+        is_new_file = not os.path.exists(file_name) or os.path.getsize(file_name) == 0
+
+        self.file = open(file_name, "ab")
+        if is_new_file:
+            schema = json.dumps(get_binary_log_schema()).encode()
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(schema)))
+            self.file.write(schema)
+
+        self.type_ids = {}
+        self.key_ids = {}
+
+    def writeRecord(self, tag: bytes, body: bytes):
+        self.file.write(RECORD_HEADER.pack(tag, len(body)))
+        self.file.write(body)
+
+    def writeRunStart(self, start_time=None):
+        if start_time is None:
+            start_time = time.time()
+
+        # Ids are scoped to a run, so throw out the old definitions
+        self.type_ids = {}
+        self.key_ids = {}
+        self.writeRecord(RUN_START_RECORD, RUN_START.pack(start_time))
+
+    def getDefinitionId(self, id_dict: Dict[str, int], tag: bytes, name: str) -> int:
+        if name not in id_dict:
+            id_dict[name] = len(id_dict)
+            self.writeRecord(tag, DEFINITION.pack(id_dict[name]) + name.encode(errors="replace"))
+        return id_dict[name]
+
+    def writePacket(self, message_type: str, dictionary: dict, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        type_id = self.getDefinitionId(self.type_ids, TYPE_RECORD, str(message_type))
+
+        fields = []
+        for key in dictionary:
+            key_id = self.getDefinitionId(self.key_ids, KEY_RECORD, str(key))
+            fields.append(UINT_16.pack(key_id) + encode_value(dictionary[key]))
+
+        self.writeRecord(PACKET_RECORD, PACKET_HEADER.pack(timestamp, type_id, len(fields)) + b"".join(fields))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryLogReader(object):
+    def __init__(self, file_name):
+        """
+        Memory maps a binary log and indexes every packet in it without decoding any values.
+
+        Values are only decoded when asked for, either one packet at a time (for playback) or as whole NumPy columns (for graphs).
+        """
+        self.file_name = file_name
+        self.schema = {}
+        self.run_start_times: List[float] = []
+        self.run_type_names: List[Dict[int, str]] = []
+        self.run_key_names: List[Dict[int, str]] = []
+
+        # One entry per packet
+        packet_offsets = []
+        packet_times = []
+        packet_runs = []
+
+        self.file = open(file_name, "rb")
+        file_size = os.path.getsize(file_name)
+        if file_size < FILE_HEADER.size:
+            self.buffer = b""
+        else:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.buffer) > 0:
+            [magic, version, schema_length] = FILE_HEADER.unpack_from(self.buffer, 0)
+            if magic != MAGIC:
+                raise ValueError("{} is not a binary telemetry log".format(file_name))
+            if version > VERSION:
+                raise ValueError("{0} is binary log version {1}, newest supported is {2}".format(file_name, version, VERSION))
+
+            offset = FILE_HEADER.size
+            self.schema = json.loads(bytes(self.buffer[offset : offset + schema_length]))
+            offset += schema_length
+
+            run_index = -1
+            while offset + RECORD_HEADER.size <= file_size:
+                [tag, length] = RECORD_HEADER.unpack_from(self.buffer, offset)
+                body_offset = offset + RECORD_HEADER.size
+                if body_offset + length > file_size:
+                    break  # Truncated record at the end of the file, probably from the GUI getting killed
+
+                if tag == PACKET_RECORD:
+                    if run_index < 0:  # Shouldn't happen, but don't throw out packets if it does
+                        self.addRun(0)
+                        run_index = 0
+                    packet_offsets.append(body_offset)
+                    packet_times.append(FLOAT_64.unpack_from(self.buffer, body_offset)[0])
+                    packet_runs.append(run_index)
+                elif tag == TYPE_RECORD or tag == KEY_RECORD:
+                    if run_index < 0:
+                        self.addRun(0)
+                        run_index = 0
+                    definition_id = DEFINITION.unpack_from(self.buffer, body_offset)[0]
+                    name = bytes(self.buffer[body_offset + DEFINITION.size : body_offset + length]).decode(errors="replace")
+                    if tag == TYPE_RECORD:
+                        self.run_type_names[run_index][definition_id] = name
+                    else:
+                        self.run_key_names[run_index][definition_id] = name
+                elif tag == RUN_START_RECORD:
+                    self.addRun(RUN_START.unpack_from(self.buffer, body_offset)[0])
+                    run_index = len(self.run_start_times) - 1
+
+                offset = body_offset + length
+
+        self.packet_offsets = numpy.array(packet_offsets, dtype=numpy.int64)
+        self.packet_times = numpy.array(packet_times, dtype=numpy.float64)
+        self.packet_runs = numpy.array(packet_runs, dtype=numpy.int32)
+
+    def addRun(self, start_time):
+        self.run_start_times.append(start_time)
+        self.run_type_names.append({})
+        self.run_key_names.append({})
+
+    @staticmethod
+    def getRunName(run_index):
+        """Run names match the ones RecordedDataReader uses for text logs"""
+        return "run_{}".format(run_index + 1)
+
+    def getRuns(self) -> List[str]:
+        return [self.getRunName(run_index) for run_index in numpy.unique(self.packet_runs)]
+
+    def getRunIndex(self, run_name) -> int:
+        try:
+            return int(run_name.split("_")[-1]) - 1
+        except ValueError:
+            return -1
+
+    def getPacketCount(self) -> int:
+        return len(self.packet_offsets)
+
+    def getPacketTime(self, packet_num) -> float:
+        return float(self.packet_times[packet_num])
+
+    def decodePacket(self, packet_num) -> Tuple[str, Dict]:
+        offset = int(self.packet_offsets[packet_num])
+        run_index = int(self.packet_runs[packet_num])
+        key_names = self.run_key_names[run_index]
+
+        [_, type_id, field_count] = PACKET_HEADER.unpack_from(self.buffer, offset)
+        offset += PACKET_HEADER.size
+
+        dictionary = {}
+        for _ in range(field_count):
+            key_id = UINT_16.unpack_from(self.buffer, offset)[0]
+            value, offset = decode_value(self.buffer, offset + 2)
+            dictionary[key_names.get(key_id, str(key_id))] = value
+
+        return self.run_type_names[run_index].get(type_id, str(type_id)), dictionary
+
+    def getPacket(self, packet_num) -> List:
+        """Returns [packet_type, packet_dict], in the same format as RecordedDataReader.getPacket"""
+        if packet_num < 0 or packet_num >= self.getPacketCount():
+            return ["", {}]
+
+        packet_type, dictionary = self.decodePacket(packet_num)
+        dictionary["timestamp"] = str(datetime.datetime.fromtimestamp(self.packet_times[packet_num]))
+        dictionary["run_number"] = int(self.packet_runs[packet_num]) + 1
+        return [packet_type, dictionary]
+
+    def getKeys(self, run_name=None) -> List[str]:
+        if run_name is None:
+            keys = []
+            for key_names in self.run_key_names:
+                keys.extend(name for name in key_names.values() if name not in keys)
+            return keys
+        else:
+            run_index = self.getRunIndex(run_name)
+            if 0 <= run_index < len(self.run_key_names):
+                return list(self.run_key_names[run_index].values())
+            return []
+
+    def getKeyArrays(self, run_name, keys=None) -> Dict[str, Tuple[numpy.ndarray, numpy.ndarray]]:
+        """
+        Returns {key: (values, timestamps)} for every key in a run, or just the keys asked for.
+
+        Numeric keys come back as numeric arrays.  Strings and anything ragged come back as object arrays.
+        """
+        run_index = self.getRunIndex(run_name)
+        if run_index < 0 or run_index >= len(self.run_key_names):
+            return {}
+
+        key_names = self.run_key_names[run_index]
+        if keys is not None:
+            keys = set(keys)
+            wanted_ids = {key_id for key_id in key_names if key_names[key_id] in keys}
+        else:
+            wanted_ids = set(key_names.keys())
+
+        values = {key_id: [] for key_id in wanted_ids}
+        times = {key_id: [] for key_id in wanted_ids}
+
+        for packet_num in numpy.flatnonzero(self.packet_runs == run_index):
+            offset = int(self.packet_offsets[packet_num])
+            [packet_time, _, field_count] = PACKET_HEADER.unpack_from(self.buffer, offset)
+            offset += PACKET_HEADER.size
+
+            for _ in range(field_count):
+                key_id = UINT_16.unpack_from(self.buffer, offset)[0]
+                if key_id in wanted_ids:
+                    value, offset = decode_value(self.buffer, offset + 2)
+                    values[key_id].append(value)
+                    times[key_id].append(packet_time)
+                else:
+                    offset = skip_value(self.buffer, offset + 2)
+
+        ret = {}
+        for key_id in wanted_ids:
+            if len(values[key_id]) > 0:
+                ret[key_names[key_id]] = (to_numpy_array(values[key_id]), numpy.array(times[key_id], dtype=numpy.float64))
+        return ret
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+
+def skip_value(buffer, offset) -> int:
+    """Returns the offset after a value without decoding it"""
+    tag = buffer[offset : offset + 1]
+    if tag == FLOAT_VALUE or tag == INT_VALUE:
+        return offset + 9
+    elif tag == BOOL_VALUE:
+        return offset + 2
+    elif tag == STRING_VALUE:
+        return offset + 3 + UINT_16.unpack_from(buffer, offset + 1)[0]
+    elif tag == LIST_VALUE:
+        return offset + 3 + 8 * UINT_16.unpack_from(buffer, offset + 1)[0]
+    elif tag == BOOL_LIST_VALUE:
+        return offset + 3 + UINT_16.unpack_from(buffer, offset + 1)[0]
+    else:
+        raise ValueError("Unknown value tag {}".format(tag))
+
+
+def to_numpy_array(values: list) -> numpy.ndarray:
+    if all(isinstance(it, (int, float)) for it in values):
+        return numpy.array(values)
+
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def is_binary_log(file_name) -> bool:
+    return str(file_name).endswith(BINARY_LOG_EXTENSION)
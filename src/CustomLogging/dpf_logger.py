@@ -2,11 +2,13 @@ import datetime
 import logging
 import os
 import time
-from collections import OrderedDict
 from sys import stdout
 from typing import Callable, List
 
+from src.CustomLogging.binary_log import BinaryLogWriter
+from src.CustomLogging.log_writer import LOG_WRITER
 from src.CustomLogging.prop_logger import PropLogger
+from src.CustomLogging.run_catalog import RUN_CATALOG
 
 
 # Used to log to the console widget
@@ -92,39 +94,10 @@ class DpfLogger:
         """
         Get a list of dicts with this structure for each log file we have:
             name: (date, duration, has_groundstation, has_prop)
+
+        Comes from the run catalog, so only logs that changed since the last call get read
         """
-        subpaths = os.listdir("logs")
-        ret = {}
-        for path in subpaths:
-            try:
-                main_log = open(f"logs/{path}/logs.txt").readlines()
-                if len(main_log) < 1:
-                    continue
-                first_time = main_log[0].split(" : ")[0]
-                first_time = time.strptime(first_time, "%Y-%m-%d %H:%M:%S,%f")
-                last_time = main_log[-1].split(" : ")[0]
-                last_time = time.strptime(last_time, "%Y-%m-%d %H:%M:%S,%f")
-                duration = time.mktime(last_time) - time.mktime(first_time)
-
-                groundstation_path = f"logs/{path}/GroundStationDataInterface_parsed.txt"
-                if os.path.exists(groundstation_path):
-                    has_groundstation_data = len(open(groundstation_path).readlines()) > 6  # RUN START takes up 5 lines
-                else:
-                    has_groundstation_data = False
-                prop_path = f"logs/{path}/PROP_DATA_0.txt"
-                if os.path.exists(prop_path):
-                    has_prop_data = len(open(prop_path).readlines()) > 6  # RUN START takes up 5 lines
-                else:
-                    has_prop_data = False
-                # has_prop_data = len(open(f"logs/{path}/").readlines()) > 6 # RUN START takes up 5 lines
-
-                ret[path] = (time.mktime(first_time), duration, has_groundstation_data, has_prop_data)
-            except Exception as e:
-                print(e)
-
-        # Sort by key (path), alphabetically. TODO This will only sorta work if dates are in the same year lol
-
-        return OrderedDict(sorted(ret.items()))
+        return RUN_CATALOG.getAllRuns()
 
 
 MAIN_GUI_LOGGER = DpfLogger()
@@ -148,29 +121,60 @@ class SerialLogger:
             self.raw_data_file.write("\n\nRUN START {}\n\n".format(START_TIME.strftime("%Y-%m-%d %H:%M:%S")))
             self.parsed_messages_file.write("\n\nRUN START {}\n\n".format(START_TIME.strftime("%Y-%m-%d %H:%M:%S")))
 
+            # Binary copy of the parsed messages, so we don't have to eval() the text log to read it back
+            self.binary_log = BinaryLogWriter(f"{LOGS_SUBDIR}/{self.name}_parsed.bin")
+            self.binary_log.writeRunStart(START_TIME.timestamp())
+
+            # The log writer flushes these every so often, instead of us flushing every message
+            for file in [self.raw_data_file, self.parsed_messages_file, self.binary_log.file]:
+                LOG_WRITER.registerFile(file)
+
             self.log_opened = True
 
+    # write_raw, write_parsed and close just queue up work for the log writer thread, so they never wait on the disk
+    # The functions ending in _now are what actually runs on the writer thread
     def write_raw(self, bytes):
-        self.open_file()
-
-        self.raw_data_file.write("{0}: {1}\n".format(datetime.datetime.now().strftime("%H:%M:%S.%f"), str(bytes)))
-        self.raw_data_file.flush()
+        LOG_WRITER.submit(self.name, self.write_raw_now, time.time(), bytes)
 
     def write_parsed(self, message_type, parsed_message):
+        # Shallow copy, since the interface can keep using the dictionary after this
+        if isinstance(parsed_message, dict):
+            parsed_message = dict(parsed_message)
+        LOG_WRITER.submit(self.name, self.write_parsed_now, time.time(), message_type, parsed_message)
+
+    def close(self):
+        LOG_WRITER.submitControl(self.name, self.close_now)
+
+    def write_raw_now(self, timestamp, bytes):
         self.open_file()
+        self.raw_data_file.write("{0}: {1}\n".format(datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f"), str(bytes)))
 
-        self.parsed_messages_file.write("{0}: {1} {2}\n".format(datetime.datetime.now().strftime("%H:%M:%S.%f"), message_type, str(parsed_message)))
-        self.parsed_messages_file.flush()
+    def write_parsed_now(self, timestamp, message_type, parsed_message):
+        self.open_file()
+        self.parsed_messages_file.write("{0}: {1} {2}\n".format(datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f"), message_type, str(parsed_message)))
 
-    def close(self):
+        # Only actual parsed packets go in the binary log, not status strings
+        if isinstance(parsed_message, dict):
+            self.binary_log.writePacket(message_type, parsed_message, timestamp)
+
+    def close_now(self):
         if self.log_opened:
+            for file in [self.raw_data_file, self.parsed_messages_file, self.binary_log.file]:
+                LOG_WRITER.unregisterFile(file)
+
             self.raw_data_file.close()
             self.parsed_messages_file.close()
+            self.binary_log.close()
+            self.log_opened = False
 
 
 def set_test_name(test):
     # Need to CD into a new directory with a new name
     global LOGS_SUBDIR
+
+    # Anything already queued belongs in the old directory
+    LOG_WRITER.flush()
+
     if test != "":
         LOGS_SUBDIR = f"logs/{START_TIME.strftime('%m-%d-%Y_%H-%M-%S')}_{test}"
     else:
@@ -182,6 +186,12 @@ def set_test_name(test):
         # We just need to call the ctor, really
         logger = SerialLogger.LOGGERS[logger]
         logger.close()
+    PROP_LOGGER.close()
+
+    # Wait for the old files to be closed before resetting the loggers
+    LOG_WRITER.flush()
+    for logger in SerialLogger.LOGGERS:
+        logger = SerialLogger.LOGGERS[logger]
         logger.__init__(logger.name)
 
     # I kinda hate this
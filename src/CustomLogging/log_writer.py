@@ -0,0 +1,181 @@
+"""
+Background thread that does all the writing for SerialLogger and PropLogger
+
+Producers (the serial read loops, the prop websocket) only timestamp their data and put it on a bounded queue, so they never
+wait on the disk.  The writer thread formats and writes records in batches, flushes files every FLUSH_PERIOD seconds or
+FLUSH_RECORD_COUNT records, and optionally fsyncs them every fsync_period seconds.
+
+If the queue fills up, data records are either dropped (and counted) or the producer waits up to BLOCK_TIMEOUT for room,
+depending on block_when_full.  Control records (closing files, flush markers) always wait for room.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+from src.config import ConfigSaver
+
+QUEUE_SIZE = 20000  # Records.  At 100 packets/sec that's a few minutes of the disk not keeping up
+FLUSH_PERIOD = 0.25  # Seconds
+FLUSH_RECORD_COUNT = 1000
+BLOCK_TIMEOUT = 0.1  # Longest a producer waits for room in the queue when block_when_full is set, before dropping the record anyway
+
+
+class LogWriter(object):
+    def __init__(self, queue_size=QUEUE_SIZE, fsync_period=None, block_when_full=False):
+        """
+        fsync_period is how often (seconds) to fsync the open files.  None never fsyncs and leaves it up to the OS, and 0 fsyncs every flush
+        """
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.fsync_period = fsync_period
+        self.block_when_full = block_when_full
+
+        self.files = set()  # Every file the writer thread has open, so they can all be flushed together
+        self.last_flush_time = time.time()
+        self.last_fsync_time = time.time()
+        self.records_since_flush = 0
+
+        self.written_count = 0
+        self.drop_counts: Dict[str, int] = defaultdict(int)  # {producer name: records dropped}
+        self.max_queue_depth = 0
+
+        self.thread = threading.Thread(target=self.run, name="LogWriter", daemon=True)
+        self.thread.start()
+
+        # Daemon threads just get killed at exit, so make sure whatever's queued ends up on disk first
+        atexit.register(self.stop)
+
+    def submit(self, producer_name, function, *args):
+        """
+        Queues function(*args) to run on the writer thread.  Only call this with data that won't get changed afterwards.
+        Returns False if the queue was full and the record got dropped
+        """
+        try:
+            if self.block_when_full:
+                self.queue.put((producer_name, function, args), timeout=BLOCK_TIMEOUT)
+            else:
+                self.queue.put_nowait((producer_name, function, args))
+        except queue.Full:
+            self.drop_counts[producer_name] += 1
+            return False
+
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return True
+
+    def submitControl(self, producer_name, function, *args):
+        """
+        Queues function(*args) to run on the writer thread, waiting for room in the queue if it has to.  For things like closing
+        files, which can't be dropped the way data records can.  Runs it right here if the writer thread isn't running
+        """
+        if not self.thread.is_alive():
+            function(*args)
+            return
+
+        self.queue.put((producer_name, function, args))
+
+    def flush(self, timeout=5.0) -> bool:
+        """Waits until everything queued so far has been written and flushed.  Returns False if that took longer than timeout"""
+        if not self.thread.is_alive():
+            return False
+
+        done = threading.Event()
+        self.queue.put((None, done.set, ()))
+        return done.wait(timeout)
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout=5.0)
+
+    def registerFile(self, file):
+        """Only call from the writer thread (from inside a submitted function)"""
+        self.files.add(file)
+
+    def unregisterFile(self, file):
+        self.files.discard(file)
+
+    def run(self):
+        while True:
+            timeout = max(self.last_flush_time + FLUSH_PERIOD - time.time(), 0.001)
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = False
+
+            if record is None:
+                break
+            elif record is not False:
+                self.processRecord(record)
+
+                # Grab whatever else is waiting, so it all gets written before the next flush
+                while self.records_since_flush < FLUSH_RECORD_COUNT:
+                    try:
+                        record = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        self.flushFiles()
+                        return
+                    self.processRecord(record)
+
+            if self.records_since_flush >= FLUSH_RECORD_COUNT or time.time() - self.last_flush_time >= FLUSH_PERIOD:
+                self.flushFiles()
+
+        self.flushFiles()
+
+    def processRecord(self, record):
+        [producer_name, function, args] = record
+
+        if producer_name is None:
+            # flush() marker
+            self.flushFiles()
+            function(*args)
+            return
+
+        try:
+            function(*args)
+            self.written_count += 1
+            self.records_since_flush += 1
+        except Exception as e:
+            print("Unable to write log record for {0}: {1}".format(producer_name, e))
+
+    def flushFiles(self):
+        fsync = self.fsync_period is not None and time.time() - self.last_fsync_time >= self.fsync_period
+
+        for file in list(self.files):
+            try:
+                file.flush()
+                if fsync:
+                    os.fsync(file.fileno())
+            except (OSError, ValueError) as e:
+                print("Unable to flush log file: {}".format(e))
+                self.files.discard(file)
+
+        if fsync:
+            self.last_fsync_time = time.time()
+        self.last_flush_time = time.time()
+        self.records_since_flush = 0
+
+    def getQueueDepth(self):
+        return self.queue.qsize()
+
+    def getDropCount(self):
+        return sum(self.drop_counts.values())
+
+    def getStatsString(self):
+        return "{0} records written, {1} queued (max {2}), {3} dropped {4}".format(self.written_count, self.getQueueDepth(), self.max_queue_depth, self.getDropCount(), dict(self.drop_counts))
+
+
+def make_log_writer():
+    settings = ConfigSaver("Log Writer")
+    fsync_period = settings.get("fsync_period", -1, float)  # Negative never fsyncs
+    block_when_full = settings.get("block_when_full", "False", str).lower() == "true"
+    return LogWriter(fsync_period=fsync_period if fsync_period >= 0 else None, block_when_full=block_when_full)
+
+
+LOG_WRITER = make_log_writer()
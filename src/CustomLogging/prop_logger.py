@@ -1,6 +1,8 @@
 import json
 import time
 
+from src.CustomLogging.log_writer import LOG_WRITER
+
 
 class PropLogger:
     def __init__(self, subdir) -> None:
@@ -17,7 +19,7 @@ class PropLogger:
             other_filename = self.subdir + "/PROP_OTHER_MSGS.txt"
             self.other_writer = open(other_filename, "a")
             self.other_writer.write("RUN START\n")
-            self.other_writer.flush()
+            LOG_WRITER.registerFile(self.other_writer)
 
             self.file_opened = True
 
@@ -49,8 +51,10 @@ class PropLogger:
             save_path = self.subdir + f"/PROP_DATA_{self.file_idx}.txt"
             self.file_idx = self.file_idx + 1
             if self.csv_file_handle is not None:
+                LOG_WRITER.unregisterFile(self.csv_file_handle)
                 self.csv_file_handle.close()
             self.csv_file_handle = open(save_path, "w")
+            LOG_WRITER.registerFile(self.csv_file_handle)
             # Write header
             self.csv_file_handle.write(",".join(csv_fields))
             self.csv_file_handle.write("\n")
@@ -61,23 +65,42 @@ class PropLogger:
     # handle non-data (error messages, etc) and write to the text file#
     # param msg_json is the dictionary of the json provided by the ecs
     # param other_file is the writer containing
-    def handle_other(self, msg_json):
+    # param receive_time is when the message came in, since it gets written a little later
+    def handle_other(self, msg_json, receive_time):
         self.open_file()
 
-        self.other_writer.write("NON-DATA : " + str(round(time.time())) + " : " + json.dumps(msg_json) + "\n")
-        self.other_writer.flush()
+        self.other_writer.write("NON-DATA : " + str(round(receive_time)) + " : " + json.dumps(msg_json) + "\n")
 
-    # listens for json data from the ecs, calls other methods to parse and write data received
+    # listens for json data from the ecs, and queues it up for the log writer thread so the websocket never waits on the disk
     def log_ws_msg(self, output_json):
+        LOG_WRITER.submit("PropLogger", self.log_ws_msg_now, time.time(), output_json)
+
+    def close(self):
+        LOG_WRITER.submitControl("PropLogger", self.close_now)
+
+    # calls other methods to parse and write data received.  Runs on the log writer thread
+    def log_ws_msg_now(self, receive_time, output_json):
         try:
             if output_json["command"] == "DATA":
                 self.handle_data(output_json)
             else:
-                self.handle_other(output_json)
+                self.handle_other(output_json, receive_time)
         except Exception as e:
             self.open_file()
 
-            print("Data logging error:", e, "at time:", str(round(time.time())))
-            self.other_writer.write("ERROR at time" + str(round(time.time())) + "\n")
+            print("Data logging error:", e, "at time:", str(round(receive_time)))
+            self.other_writer.write("ERROR at time" + str(round(receive_time)) + "\n")
             self.other_writer.write(str(e))
             self.other_writer.write("\n")
+
+    def close_now(self):
+        if self.csv_file_handle is not None:
+            LOG_WRITER.unregisterFile(self.csv_file_handle)
+            self.csv_file_handle.close()
+            self.csv_file_handle = None
+            self.last_columns = ""
+
+        if self.file_opened:
+            LOG_WRITER.unregisterFile(self.other_writer)
+            self.other_writer.close()
+            self.file_opened = False
@@ -0,0 +1,232 @@
+"""
+Index of every run in the logs folder, saved to logs/run_catalog.json
+
+Keeps each run's start time, duration, line counts and which log files it has, so the logger control table and the playback
+menu don't have to open every log on disk to list them.  Files are only re-read when their size or mtime changes, and since
+the loggers only ever append, a file that grew only gets the new bytes counted.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+CATALOG_FILE_NAME = "run_catalog.json"
+CATALOG_VERSION = 1
+RUN_LIST_REFRESH_PERIOD = 1.0  # Most often (seconds) getRunNames goes back to disk to look for new runs
+TAIL_READ_SIZE = 64 * 1024  # How far back from the end of a file to look for its last timestamp
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+MAIN_LOG_FILE = "logs.txt"
+GROUND_STATION_LOG_FILE = "GroundStationDataInterface_parsed.txt"
+PROP_LOG_FILE = "PROP_DATA_0.txt"
+HEADER_LINE_COUNT = 6  # RUN START takes up 5 lines, so a log with this many lines or less doesn't have any data
+
+
+def is_line_counted_file(file_name):
+    """Text logs with one message per line.  Everything else (raw captures, binary logs) just gets its size tracked"""
+    return file_name == MAIN_LOG_FILE or file_name.endswith("_parsed.txt") or file_name.startswith("PROP_DATA_")
+
+
+def parse_log_line_time(line: bytes):
+    """Time from the start of a logs.txt line, or None if the line doesn't start with one (like the middle of a traceback)"""
+    try:
+        return time.mktime(time.strptime(line.split(b" : ")[0].decode(), "%Y-%m-%d %H:%M:%S,%f"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def find_first_time(file):
+    file.seek(0)
+    for line in file:
+        line_time = parse_log_line_time(line)
+        if line_time is not None:
+            return line_time
+    return None
+
+
+def find_last_time(file, size):
+    file.seek(max(size - TAIL_READ_SIZE, 0))
+    for line in reversed(file.read().splitlines()):
+        line_time = parse_log_line_time(line)
+        if line_time is not None:
+            return line_time
+    return None
+
+
+class RunCatalog(object):
+    def __init__(self, logs_folder="logs"):
+        self.logs_folder = logs_folder
+        self.catalog_path = os.path.join(logs_folder, CATALOG_FILE_NAME)
+
+        # {run_name: {"dir_mtime": float, "files": {file_name: {"size", "mtime", "lines", "first_time", "last_time"}}}}
+        self.runs: Dict[str, dict] = {}
+        self.last_run_list_refresh = 0
+        self.run_names_cache: Dict[tuple, List[str]] = {}  # {tuple(file_names): run names}, cleared whenever the run list changes
+        self.lock = threading.RLock()
+
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.catalog_path) as file:
+                catalog = json.load(file)
+            if catalog.get("version") == CATALOG_VERSION:
+                self.runs = catalog["runs"]
+        except (OSError, ValueError, KeyError):
+            self.runs = {}  # Missing or from an old version, it'll get rebuilt
+
+    def save(self):
+        # Write to a temporary file first, so a crash can't leave half a catalog behind
+        temp_path = self.catalog_path + ".tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump({"version": CATALOG_VERSION, "runs": self.runs}, file)
+            os.replace(temp_path, self.catalog_path)
+        except OSError as e:
+            print("Unable to save run catalog: {}".format(e))
+
+    def refreshRunList(self, max_age=0.0) -> bool:
+        """
+        Looks for runs that were added or removed, and for files that were added to runs.  Only does anything if the last refresh was more than max_age seconds ago.
+        Costs one stat per run, since files only get listed for runs whose folder changed.  Returns True if anything changed
+        """
+        with self.lock:
+            if time.time() - self.last_run_list_refresh < max_age:
+                return False
+            self.last_run_list_refresh = time.time()
+
+            try:
+                run_names = [it for it in os.listdir(self.logs_folder) if os.path.isdir(os.path.join(self.logs_folder, it))]
+            except OSError:
+                run_names = []
+
+            changed = set(run_names) != set(self.runs.keys())
+            self.runs = {run_name: self.runs.get(run_name, {"dir_mtime": None, "files": {}}) for run_name in run_names}
+
+            for run_name in run_names:
+                run_path = os.path.join(self.logs_folder, run_name)
+                run = self.runs[run_name]
+                dir_mtime = os.stat(run_path).st_mtime
+                if run["dir_mtime"] == dir_mtime:
+                    continue
+
+                # Only new files need entries, details get filled in by refreshRunDetails
+                file_names = os.listdir(run_path)
+                run["files"] = {file_name: run["files"].get(file_name, {"size": 0, "mtime": None, "lines": 0, "first_time": None, "last_time": None}) for file_name in file_names}
+                run["dir_mtime"] = dir_mtime
+                changed = True
+
+            if changed:
+                self.run_names_cache = {}
+            return changed
+
+    def refreshRunDetails(self):
+        """Updates sizes, line counts and timestamps for every file that changed since the last refresh, and saves the catalog"""
+        with self.lock:
+            changed = self.refreshRunList()
+
+            for run_name in self.runs:
+                for file_name in self.runs[run_name]["files"]:
+                    file_path = os.path.join(self.logs_folder, run_name, file_name)
+                    try:
+                        changed = self.updateFileInfo(file_path, self.runs[run_name]["files"][file_name]) or changed
+                    except OSError as e:
+                        print(e)
+
+            if changed:
+                self.save()
+
+    def updateFileInfo(self, file_path, info) -> bool:
+        stat = os.stat(file_path)
+        if stat.st_size == info["size"] and stat.st_mtime == info["mtime"]:
+            return False
+
+        if not is_line_counted_file(os.path.basename(file_path)):
+            info["size"] = stat.st_size
+            info["mtime"] = stat.st_mtime
+            return True
+
+        with open(file_path, "rb") as file:
+            # Loggers only append, so only count what was added since last time.  If the file shrank, start over
+            start = info["size"] if stat.st_size >= info["size"] else 0
+            if start == 0:
+                info["lines"] = 0
+                info["first_time"] = None
+
+            file.seek(start)
+            while True:
+                chunk = file.read(COUNT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                info["lines"] += chunk.count(b"\n")
+
+            # Only logs.txt has full timestamps on each line
+            if os.path.basename(file_path) == MAIN_LOG_FILE:
+                if info["first_time"] is None:
+                    info["first_time"] = find_first_time(file)
+                info["last_time"] = find_last_time(file, stat.st_size)
+
+        info["size"] = stat.st_size
+        info["mtime"] = stat.st_mtime
+        return True
+
+    def getRunNames(self, file_names: List[str] = None) -> List[str]:
+        """
+        Names of runs that have at least one of file_names (or all runs if file_names is None), newest first.
+        Cheap enough to call every GUI loop, since it only goes back to disk every RUN_LIST_REFRESH_PERIOD seconds
+        """
+        cache_key = tuple(file_names) if file_names is not None else None
+        with self.lock:
+            self.refreshRunList(max_age=RUN_LIST_REFRESH_PERIOD)
+            if cache_key not in self.run_names_cache:
+                runs = [run_name for run_name in self.runs if file_names is None or any(file_name in self.runs[run_name]["files"] for file_name in file_names)]
+                runs.sort(reverse=True)
+                self.run_names_cache[cache_key] = runs
+
+            return list(self.run_names_cache[cache_key])
+
+    def getRunInfo(self, run_name) -> dict:
+        """Start time, duration, line counts and the files that have anything in them for one run.  Call refreshRunDetails first"""
+        with self.lock:
+            files = self.runs[run_name]["files"]
+
+            main_log = files.get(MAIN_LOG_FILE, {})
+            start_time = main_log.get("first_time")
+            last_time = main_log.get("last_time")
+            duration = last_time - start_time if start_time is not None and last_time is not None else None
+
+            return {
+                "start_time": start_time,
+                "duration": duration,
+                "line_counts": {file_name: files[file_name]["lines"] for file_name in files if is_line_counted_file(file_name)},
+                "sources": [file_name for file_name in files if files[file_name]["size"] > 0],
+            }
+
+    def getAllRuns(self):
+        """
+        Same format DpfLogger.get_all_runs always had:
+            name: (date, duration, has_groundstation, has_prop)
+        Runs without a timestamp in logs.txt are left out
+        """
+        self.refreshRunDetails()
+
+        ret = {}
+        with self.lock:
+            for run_name in self.runs:
+                info = self.getRunInfo(run_name)
+                if info["start_time"] is None or info["duration"] is None:
+                    continue
+
+                line_counts = info["line_counts"]
+                has_groundstation_data = line_counts.get(GROUND_STATION_LOG_FILE, 0) > HEADER_LINE_COUNT
+                has_prop_data = line_counts.get(PROP_LOG_FILE, 0) > HEADER_LINE_COUNT
+                ret[run_name] = (info["start_time"], info["duration"], has_groundstation_data, has_prop_data)
+
+        # Sort by key (path), alphabetically. TODO This will only sorta work if dates are in the same year lol
+        return OrderedDict(sorted(ret.items()))
+
+
+RUN_CATALOG = RunCatalog()
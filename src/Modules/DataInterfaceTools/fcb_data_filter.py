@@ -0,0 +1,69 @@
+"""
+Filters for data coming from the FCB
+
+Holds the GPS position filter and median filters for one stream of FCB packets, so more than one stream (like one per radio)
+can be filtered separately
+"""
+
+from src.constants import Constants
+from src.Modules.DataInterfaceTools.gps_position_filter import GPSPositionFilter
+from src.Modules.DataInterfaceTools.median_filter import MedianFilter
+from src.Modules.MessageParsing.fcb_message_parsing import get_fcb_state_from_state_num
+
+KEYS_TO_FILTER = [
+    Constants.altitude_key,
+    Constants.vertical_speed_key,
+    Constants.fcb_battery_voltage,
+]
+
+
+class FCBDataFilter(object):
+    def __init__(self, name="FCB"):
+        self.vehicle_position_filter = GPSPositionFilter(name)
+        self.fcb_state_filter = MedianFilter()
+
+        self.filter_dictionary = {}  # Add a filter for each key that we want to filter
+        for key in KEYS_TO_FILTER:
+            self.filter_dictionary[key] = MedianFilter()
+
+    def filterData(self, dictionary):
+        """Replaces the values in dictionary with filtered ones, and adds the values calculated from them"""
+
+        # Special parse operations to deal with filtering lat and lon data
+        if Constants.latitude_key in dictionary and Constants.longitude_key in dictionary:  # If dictionary contains vehicle gps position, filter it
+            self.vehicle_position_filter.new_gps_coords(dictionary[Constants.latitude_key], dictionary[Constants.longitude_key])
+            [new_lat, new_lon] = self.vehicle_position_filter.get_filtered_position_output()
+            dictionary[Constants.latitude_key] = new_lat
+            dictionary[Constants.longitude_key] = new_lon
+
+            if Constants.ground_speed_key not in dictionary:
+                dictionary[Constants.ground_speed_key] = self.vehicle_position_filter.get_filtered_speed_output()
+
+        # Loop through the dictionary of median filters, and filter each data point if it exists
+        for key_to_filter in self.filter_dictionary:
+            if key_to_filter in dictionary:
+                filter_object = self.filter_dictionary[key_to_filter]
+                filter_object.new_data(dictionary[key_to_filter])
+                dictionary[key_to_filter] = filter_object.get_filtered_data_output()
+
+        # Filter the FCB state, and update the FCB state text
+        if Constants.fcb_state_number_key in dictionary:
+            self.fcb_state_filter.new_data(dictionary[Constants.fcb_state_number_key])
+            dictionary[Constants.fcb_state_number_key] = int(self.fcb_state_filter.get_filtered_data_output())
+            dictionary[Constants.fcb_state_key] = get_fcb_state_from_state_num(dictionary[Constants.fcb_state_number_key])
+
+        # We want a rssi value without the "db" text at the end for plotting
+        rssi_val = get_rssi_value(dictionary)
+        if rssi_val is not None:
+            dictionary[Constants.rssi_val_key] = rssi_val
+
+
+def get_rssi_value(dictionary):
+    """RSSI in dB from the "-80 db" style text the parser makes, or None if there isn't a valid one"""
+    rssi_val = str(dictionary.get(Constants.rssi_key, ""))
+    if " db" not in rssi_val:
+        return None
+    try:
+        return float(rssi_val.strip(" db"))
+    except ValueError:
+        return None
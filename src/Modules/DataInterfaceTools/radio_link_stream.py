@@ -0,0 +1,117 @@
+"""
+Per radio packet streams, and merging them into one stream of the best copy of each packet
+
+The ground station hears the FCB on more than one radio at once, so most packets come in once per radio.  Each radio gets a
+RadioLinkStream with its own filters and link stats, and BestPacketMerger picks which copy goes into the main stream.
+"""
+
+import time
+from collections import OrderedDict
+
+from src.constants import Constants
+from src.Modules.DataInterfaceTools.fcb_data_filter import FCBDataFilter, get_rssi_value
+from src.Modules.MessageParsing.fcb_message_parsing import get_fcb_state_from_state_num
+
+LINK_TIMEOUT = 5  # Seconds without a packet before a radio link counts as down
+
+# Link quality keys that still get published for a packet with a bad CRC
+RADIO_STATUS_KEYS = [Constants.rssi_key, Constants.lqi_key, Constants.crc_key, Constants.radio_id_key, Constants.radio_id_string]
+
+
+class RadioLinkStream(object):
+    def __init__(self, radio_id, name):
+        self.radio_id = radio_id
+        self.name = name
+        self.fcb_data_filter = FCBDataFilter(name)
+
+        self.packet_count = 0
+        self.good_crc_count = 0
+        self.merged_count = 0  # Packets from this radio that were the best copy, and went into the main stream
+        self.last_packet_time = 0
+        self.last_rssi = None
+        self.good_radio_crc = False
+
+    def handlePacket(self, dictionary, crc):
+        """
+        Filters a copy of a parsed packet from this radio with this radio's filters.
+        Returns the data to publish, with keys made with Constants.makeRadioString
+        """
+        self.packet_count += 1
+        self.last_packet_time = time.time()
+        self.good_radio_crc = bool(crc)
+        self.last_rssi = get_rssi_value(dictionary)
+
+        if self.good_radio_crc:
+            self.good_crc_count += 1
+            dictionary = dict(dictionary)
+            if Constants.fcb_state_number_key in dictionary:
+                dictionary[Constants.fcb_state_key] = get_fcb_state_from_state_num(dictionary[Constants.fcb_state_number_key])
+            self.fcb_data_filter.filterData(dictionary)
+        else:
+            # Same as the main stream, nothing but the link quality updates on a bad CRC
+            dictionary = {key: dictionary[key] for key in RADIO_STATUS_KEYS if key in dictionary}
+
+        return {Constants.makeRadioString(self.radio_id, key): dictionary[key] for key in dictionary}
+
+    def getAnnunciatorState(self):
+        """Returns [level, message] for this radio's link annunciator"""
+        if time.time() - self.last_packet_time > LINK_TIMEOUT:
+            return [2, "No packets on {}".format(self.name)]
+        elif not self.good_radio_crc:
+            return [1, "Bad CRC on last {} packet".format(self.name)]
+        else:
+            return [0, "{} link good".format(self.name)]
+
+    def getDiagnostics(self):
+        return {
+            "Packets": self.packet_count,
+            "Good CRC": self.good_crc_count,
+            "Used in merged stream": self.merged_count,
+            "Last RSSI": "No data" if self.last_rssi is None else "{} db".format(self.last_rssi),
+            "Last packet age": round(time.time() - self.last_packet_time, 1) if self.packet_count > 0 else "No data",
+        }
+
+
+class BestPacketMerger(object):
+    """
+    Deduplicates packets heard on more than one radio, using the message type and FCB timestamp.
+
+    The first copy of a packet goes through right away, so merging doesn't add any latency.  A later copy only goes through if
+    the copy that went through had a bad CRC (which the main stream doesn't use the data from), and this one is better: a good
+    CRC, or a bad CRC with a higher RSSI.  Two copies with good CRCs have the same data, so the second one is always dropped.
+    """
+
+    def __init__(self, history_length=256):
+        self.history_length = history_length
+        self.seen_packets = OrderedDict()  # {(message type, timestamp): (good crc, rssi)} for the last history_length packets
+
+        self.duplicate_count = 0
+        self.replaced_count = 0
+
+    def isBestCopy(self, message_type, dictionary, crc):
+        """Returns whether this copy of the packet should go into the merged stream"""
+        if Constants.timestamp_ms_key not in dictionary:
+            return True
+
+        key = (message_type, dictionary[Constants.timestamp_ms_key])
+        rssi = get_rssi_value(dictionary)
+        quality = (bool(crc), rssi if rssi is not None else float("-inf"))
+
+        if key in self.seen_packets:
+            self.duplicate_count += 1
+            previous_quality = self.seen_packets[key]
+            if previous_quality[0] or quality <= previous_quality:
+                return False
+            self.replaced_count += 1
+
+        self.seen_packets[key] = quality
+        self.seen_packets.move_to_end(key)
+        while len(self.seen_packets) > self.history_length:
+            self.seen_packets.popitem(last=False)
+        return True
+
+    def getDiagnostics(self):
+        return {
+            "Duplicate packets": self.duplicate_count,
+            "Replaced bad CRC packets": self.replaced_count,
+        }
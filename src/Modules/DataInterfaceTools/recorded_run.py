@@ -0,0 +1,67 @@
+"""
+Read-only {key: (data_series, time_series)} mapping for a recorded run, that only loads a column when something asks for it
+
+Modules hand one of these to the widgets instead of a dictionary with every key already converted.  Columns come out as
+NumPy arrays, and only the MAX_LOADED_COLUMNS most recently used ones stay in memory, so opening a run with hundreds of
+keys only costs as much as the handful of keys that are actually on screen.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Iterable
+
+import numpy
+
+MAX_LOADED_COLUMNS = 64  # More than the graphs on any one tab show at once, so what's on screen never gets evicted
+
+
+class RecordedRun(Mapping):
+    def __init__(self, keys: Iterable[str], load_column: Callable, max_loaded_columns=MAX_LOADED_COLUMNS):
+        """load_column(key) returns (data_series, time_series) for one key.  It gets called from whatever thread asks for the key"""
+        self.keys_list = list(dict.fromkeys(keys))  # Keep the order, drop duplicates
+        self.key_set = set(self.keys_list)
+        self.load_column = load_column
+        self.max_loaded_columns = max_loaded_columns
+
+        self.loaded_columns = OrderedDict()  # {key: (data_series, time_series)}, least recently used first
+        self.load_count = 0
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        if key not in self.key_set:
+            raise KeyError(key)
+
+        with self.lock:
+            if key in self.loaded_columns:
+                self.loaded_columns.move_to_end(key)
+                return self.loaded_columns[key]
+
+        # Load outside the lock, since it can take a while
+        [data_series, time_series] = self.load_column(key)
+        column = (numpy.asarray(data_series), numpy.asarray(time_series))
+
+        with self.lock:
+            self.load_count += 1
+            self.loaded_columns[key] = column
+            while len(self.loaded_columns) > self.max_loaded_columns:
+                self.loaded_columns.popitem(last=False)
+        return column
+
+    def __contains__(self, key):
+        # Mapping's version would load the column just to check
+        return key in self.key_set
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __len__(self):
+        return len(self.keys_list)
+
+    def getLoadedKeys(self):
+        with self.lock:
+            return list(self.loaded_columns.keys())
+
+    def unloadAll(self):
+        with self.lock:
+            self.loaded_columns.clear()
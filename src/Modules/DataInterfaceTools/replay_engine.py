@@ -0,0 +1,176 @@
+"""
+Schedules recorded packets on their original timing
+
+Modules give it the timestamp of every packet once (the timestamp index), and then each spin ask which packets are due.
+Playback can run at a speed multiplier or as fast as possible, be paused, and seek to any time, since finding a packet by
+time is just a binary search through the index.  Controls show up as a reconfigure page.
+"""
+
+import threading
+import time
+
+import numpy
+
+from src.Modules.DataInterfaceTools.reconfigure_helper import ReconfigurePage
+
+REPLAY_SPEEDS = [0.25, 0.5, 1, 2, 5, 10, 25, 100]
+AS_FAST_AS_POSSIBLE = 0  # Speed that means don't wait between packets
+MAX_PACKETS_PER_SPIN = 500  # So a module that's behind (or going as fast as possible) still gets back to its loop
+MAX_WAIT = 0.5  # Longest time (seconds) to wait for the next packet, so control changes don't lag too much
+
+
+def format_speed(speed):
+    """Speed as the reconfigure page shows it.  The current value has to match one of the enum values exactly, so 1.0 and 1 both have to come out as 1"""
+    return "{:g}".format(speed)
+
+
+class ReplayEngine(object):
+    def __init__(self, page_name="Replay", on_change=None):
+        """on_change gets called (from whatever thread changed the controls) so the module can wake up and reschedule"""
+        self.packet_times = numpy.zeros(0)
+        self.next_index = 0
+
+        self.speed = 1.0
+        self.paused = False
+
+        # Replay time was anchor_replay_time at wall clock time anchor_wall_time
+        self.anchor_wall_time = time.time()
+        self.anchor_replay_time = 0.0
+
+        self.on_change = on_change
+        self.lock = threading.Lock()
+
+        self.reconfigure_page = ReconfigurePage(page_name)
+        for speed in REPLAY_SPEEDS:
+            self.reconfigure_page.addEnumOption("replay_speeds", "{}x".format(speed), format_speed(speed))
+        self.reconfigure_page.addEnumOption("replay_speeds", "As fast as possible", format_speed(AS_FAST_AS_POSSIBLE))
+        self.reconfigure_page.addEnumOption("replay_paused", "Playing", False)
+        self.reconfigure_page.addEnumOption("replay_paused", "Paused", True)
+
+        self.reconfigure_page.updateLine("Replay Speed", "enum", format_speed(self.speed), "Playback speed, relative to how fast the data was recorded", "replay_speeds")
+        self.reconfigure_page.bindCallback("Replay Speed", self.onSpeedChange)
+        self.reconfigure_page.updateLine("Paused", "enum", str(self.paused), "Pause or resume playback", "replay_paused")
+        self.reconfigure_page.bindCallback("Paused", self.onPausedChange)
+        self.reconfigure_page.updateLine("Seek", "float", "0", "Jump to this many seconds after the start of the recording")
+        self.reconfigure_page.bindCallback("Seek", self.onSeek)
+
+    def setPacketTimes(self, packet_times):
+        """Sets the timestamp index (seconds, one per packet, in packet order) and restarts playback from the beginning"""
+        packet_times = numpy.asarray(packet_times, dtype=numpy.float64)
+
+        # Clock jumps in the recording would break the binary search, so never let time go backwards
+        if len(packet_times) > 0:
+            packet_times = numpy.maximum.accumulate(packet_times)
+
+        with self.lock:
+            self.packet_times = packet_times
+            self.next_index = 0
+            self.anchor_wall_time = time.time()
+            self.anchor_replay_time = self.getStartTime()
+        self.notifyChange()
+
+    def getStartTime(self):
+        return float(self.packet_times[0]) if len(self.packet_times) > 0 else 0.0
+
+    def getDuration(self):
+        return float(self.packet_times[-1]) - self.getStartTime() if len(self.packet_times) > 0 else 0.0
+
+    def getReplayTime(self):
+        """Recorded time playback is at right now"""
+        if self.paused or self.speed == AS_FAST_AS_POSSIBLE:
+            return self.anchor_replay_time
+        return self.anchor_replay_time + (time.time() - self.anchor_wall_time) * self.speed
+
+    def getPosition(self):
+        """Seconds since the start of the recording"""
+        return self.getReplayTime() - self.getStartTime()
+
+    def reanchor(self, replay_time=None):
+        if replay_time is None:
+            replay_time = self.getReplayTime()
+        self.anchor_replay_time = replay_time
+        self.anchor_wall_time = time.time()
+
+    def setSpeed(self, speed):
+        with self.lock:
+            self.reanchor()
+            self.speed = speed
+        self.notifyChange()
+
+    def setPaused(self, paused):
+        with self.lock:
+            self.reanchor()
+            self.paused = paused
+        self.notifyChange()
+
+    def seek(self, position):
+        """Jumps to position seconds after the start of the recording"""
+        with self.lock:
+            replay_time = self.getStartTime() + max(position, 0)
+            self.reanchor(replay_time)
+            self.next_index = int(numpy.searchsorted(self.packet_times, replay_time, side="left"))
+        self.notifyChange()
+
+    def getDuePackets(self) -> range:
+        """Indices of packets that should be played now.  Call this every spin, and play all of them in order"""
+        with self.lock:
+            if self.paused:
+                return range(self.next_index, self.next_index)
+
+            last_index = min(self.next_index + MAX_PACKETS_PER_SPIN, len(self.packet_times))
+            if self.speed != AS_FAST_AS_POSSIBLE:
+                last_index = min(last_index, int(numpy.searchsorted(self.packet_times, self.getReplayTime(), side="right")))
+
+            due = range(self.next_index, last_index)
+            self.next_index = last_index
+
+            # Keep recorded time in sync with what's been played, so switching to a real speed picks up from here
+            if self.speed == AS_FAST_AS_POSSIBLE and last_index > 0:
+                self.anchor_replay_time = float(self.packet_times[last_index - 1])
+
+            return due
+
+    def getTimeUntilNextPacket(self):
+        """Seconds until the next packet is due, for use as a module's spin_period.  None if there's nothing to wait for"""
+        with self.lock:
+            if self.paused or self.isDone():
+                return None
+            if self.speed == AS_FAST_AS_POSSIBLE:
+                return 0
+
+            wait_time = (self.packet_times[self.next_index] - self.getReplayTime()) / self.speed
+            return float(min(max(wait_time, 0), MAX_WAIT))
+
+    def isDone(self):
+        return self.next_index >= len(self.packet_times)
+
+    def notifyChange(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def onSpeedChange(self, data):
+        try:
+            speed = float(data)
+        except ValueError:
+            return
+        self.setSpeed(max(speed, AS_FAST_AS_POSSIBLE))
+        self.reconfigure_page.updateLine("Replay Speed", "enum", format_speed(self.speed), config="replay_speeds")
+
+    def onPausedChange(self, data):
+        self.setPaused(str(data).lower() == "true")
+        self.reconfigure_page.updateLine("Paused", "enum", str(data), config="replay_paused")
+
+    def onSeek(self, data):
+        try:
+            self.seek(float(data))
+        except ValueError:
+            pass
+
+    def getReconfigureCallbacks(self, database_dictionary_key):
+        return self.reconfigure_page.getCallbackFunctions(database_dictionary_key)
+
+    def getPageName(self):
+        return self.reconfigure_page.getPageName()
+
+    def getDataStructure(self):
+        return self.reconfigure_page.getDataStructure()
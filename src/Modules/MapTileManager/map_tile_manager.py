@@ -7,13 +7,26 @@ import navpy
 from src.CustomLogging.dpf_logger import MAIN_GUI_LOGGER
 
 from src.Modules.MapTileManager.map_tile_tools import (
+    OFFLINE,
+    TILE_STORE,
+    decode_tile,
     get_all_tiles_in_box,
     get_bounding_box_tiles,
     get_edges_for_tile_set,
+    get_tile_name,
     get_tiles_at_all_zoom_levels,
     get_zoom_level_from_pixels_per_meter,
-    stitch_all_tiles_in_box,
+    import_legacy_cache_folder,
 )
+from src.Modules.MapTileManager.tile_cache import DEFAULT_MEMORY_BUDGET, TileCache
+from src.Modules.MapTileManager.tile_fetcher import TILE_FETCHER
+from src.Modules.MapTileManager.tile_mosaic import TileMosaic
+from src.Modules.MapTileManager.tile_prefetcher import (
+    get_tiles_around_positions,
+    predict_positions,
+)
+
+MAX_PREFETCH_TILES = 256  # Most prefetch downloads to have going at once
 
 
 class MapTile(object):
@@ -27,18 +40,25 @@ class MapTile(object):
 
 
 class MapTileManager(object):
-    def __init__(self):
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, compress_cold_tiles=True):
         self.next_request = []
         self.callback_list = []
         self.download_request = None
 
         self.last_tile_set = [0, 0, 0, 0]
 
-        self.tile_cache = {}  # Probably not the most efficient way to do this
+        # Offline mode makes up missing tiles from their parents, and those shouldn't end up on disk looking like real tiles
+        self.tile_cache = TileCache(memory_budget=memory_budget, compress_cold_tiles=compress_cold_tiles, spill_to_disk=not OFFLINE)
+
+        self.mosaic = TileMosaic()
+        self.prefetch_futures = {}  # {(x, y, zoom): Future} of tiles being prefetched
+        self.prefetched_count = 0
+        self.checked_legacy_cache = False  # Tiles saved before the tile store get imported the first time requests are processed
 
         self.last_rendered_tile = None
         self.last_zoom = 0
         self.has_new_map = False
+        self.request_callback = None  # Called when a new request comes in, so whatever is processing requests can wake up
 
         self.logger: logging.Logger = MAIN_GUI_LOGGER.get_logger(__name__)
 
@@ -53,6 +73,12 @@ class MapTileManager(object):
         return self.last_rendered_tile
 
     def process_requests(self):
+        if not self.checked_legacy_cache:
+            self.checked_legacy_cache = True
+            import_legacy_cache_folder()
+
+        self.collect_prefetched_tiles()
+
         if self.download_request is not None:
             lower_left = self.download_request[0][0:2]
             upper_right = self.download_request[1][0:2]
@@ -92,13 +118,14 @@ class MapTileManager(object):
             return
 
         # self.logger.debug("Getting all tiles")
-        new_tiles = get_all_tiles_in_box(tile_set, zoom, self.tile_cache, exclude_list=self.tile_cache.keys(), 
-                                                    save_local_copy=False)
+        # Only tiles that aren't already in the last mosaic get checked against the cache, which pulls them back from compressed memory or disk
+        available_tiles = self.mosaic.getAvailableTileNames(tile_set, zoom, self.tile_cache)
+        new_tiles = get_all_tiles_in_box(tile_set, zoom, self.tile_cache, exclude_list=available_tiles, save_local_copy=False)
         # self.logger.debug(f"Saving {len(new_tiles)} tiles to cache")
         self.tile_cache.update(new_tiles)
 
         # self.logger.debug("Stitching image")
-        map_image = stitch_all_tiles_in_box(tile_set, zoom, self.tile_cache)
+        map_image = self.mosaic.update(tile_set, zoom, self.tile_cache)
         # self.logger.debug("Getting edges")
         edges = get_edges_for_tile_set(tile_set, zoom)
         # self.logger.debug("Done")
@@ -109,8 +136,62 @@ class MapTileManager(object):
         self.last_tile_set = tile_set
         self.last_zoom = zoom
 
+    def get_cache_stats_string(self):
+        return self.tile_cache.getStatsString()
+
+    def get_download_stats_string(self):
+        return "{0}, {1} prefetched".format(TILE_FETCHER.getStatsString(), self.prefetched_count)
+
+    def prefetch_trajectory(self, latitude, longitude, ground_speed, course, altitude=None, vertical_speed=None):
+        """
+        Starts downloading the tiles the map will want if the vehicle keeps going the way it's going, at low priority, around
+        the predicted positions, at the zoom level the map is at and the ones on either side of it.  Doesn't wait for them,
+        they get added to the tile cache as they finish.  Has to be called from the same thread as process_requests()
+        """
+        self.collect_prefetched_tiles()
+
+        if OFFLINE or self.last_zoom == 0:  # Nothing to download offline, and nothing to size the boxes from until the map has asked for something
+            return
+
+        positions = predict_positions(latitude, longitude, ground_speed, course, altitude, vertical_speed)
+
+        # Zooming in or out by one level shows about as many tiles as now, so use the same size box at every level
+        [x_min, x_max, y_min, y_max] = self.last_tile_set
+        half_width = (x_max - x_min + 1) // 2
+        half_height = (y_max - y_min + 1) // 2
+
+        stored_tiles = TILE_STORE.getIndex()
+        for zoom in [self.last_zoom, self.last_zoom - 1, self.last_zoom + 1]:
+            if not 0 <= zoom <= 19:
+                continue
+
+            for tile in get_tiles_around_positions(positions, zoom, half_width, half_height):
+                if len(self.prefetch_futures) >= MAX_PREFETCH_TILES:
+                    return
+                if tile in self.prefetch_futures or stored_tiles.contains(*tile) or self.tile_cache.isResident(get_tile_name(*tile)):
+                    continue
+                self.prefetch_futures[tile] = TILE_FETCHER.submit(*tile, low_priority=True)
+
+    def collect_prefetched_tiles(self):
+        """Moves prefetched tiles that finished downloading into the tile cache"""
+        new_tiles = {}
+        for tile in [tile for tile in self.prefetch_futures if self.prefetch_futures[tile].done()]:
+            data = self.prefetch_futures.pop(tile).result()
+            image = decode_tile(data) if data else None
+            if image is not None:
+                new_tiles[get_tile_name(*tile)] = image
+
+        self.tile_cache.update(new_tiles)
+        self.prefetched_count += len(new_tiles)
+
     def request_new_tile(self, lower_left_lla, upper_right_lla, pixel_width):
         self.next_request = [lower_left_lla, upper_right_lla, pixel_width]
+        self.notify_request()
 
     def request_tile_download(self, lower_left_lla, upper_right_lla):
         self.download_request = [lower_left_lla, upper_right_lla]
+        self.notify_request()
+
+    def notify_request(self):
+        if self.request_callback is not None:
+            self.request_callback()
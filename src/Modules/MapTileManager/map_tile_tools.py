@@ -1,137 +1,111 @@
-import asyncio
-from math import floor
-from queue import Queue
 import time
-from os.path import exists
 
-import aiohttp
 import cv2
 import numpy
 import os
 
 from src.Modules.MapTileManager.tile_convert import bbox_to_xyz, tile_edges
+from src.Modules.MapTileManager.tile_fetcher import TILE_FETCHER
+from src.Modules.MapTileManager.tile_store import TileStore
 
-CACHE_FOLDER = "tile_cache"
+CACHE_FOLDER = "tile_cache"  # Where tiles used to be saved, one PNG per tile.  Gets imported into the tile store once
+TILE_STORE_PATH = "tile_cache.mbtiles"
+TILE_STORE = TileStore(TILE_STORE_PATH)
+SAVE_BATCH_SIZE = 256  # Downloaded tiles get written to the tile store this many at a time
 OFFLINE = False
+MAX_OVERZOOM_LEVELS = 5  # Offline, missing tiles get made up from tiles at most this many zoom levels above them
+TILE_SIZE = 256  # Pixels
 
-async def download_tile(buf, x, y, z):
-    # url = "https://a.tile.openstreetmap.org/{0}/{1}/{2}.png".format(z, x, y)
-    url = "http://mt1.google.com/vt/lyrs=y&x={0}&y={1}&z={2}".format(x, y, z)
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 
-    # header_text = {
-    #     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.11 (KHTML, like Gecko) Chrome/23.0.1271.64 Safari/537.11",
-    #     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    #     "Accept-Charset": "ISO-8859-1,utf-8;q=0.7,*;q=0.3",
-    #     "Accept-Encoding": "none",
-    #     "Accept-Language": "en-US,en;q=0.8",
-    #     "Connection": "keep-alive",
-    # }
 
-    # request = Request(url, headers=header_text)
-    # data = urllib.request.urlopen(request).read()
+def decode_tile(data):
+    nparr = numpy.frombuffer(data, numpy.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-    semaphore = asyncio.BoundedSemaphore(50)  # I think this keeps too many from running at the same time
 
-    async with semaphore, aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            assert resp.status == 200
-            data = await resp.read()
+def to_png_bytes(data, tile=None):
+    # Tiles that are already PNGs get stored as is, anything else gets converted so everything in the tile store is a PNG
+    if data.startswith(PNG_SIGNATURE):
+        return data
 
-    buf.append(data)
+    if tile is None:
+        tile = decode_tile(data)
+    if tile is None:
+        return None
+    [success, png] = cv2.imencode(".png", tile)
+    return png.tobytes() if success else None
 
-def get_tile_from_offline_cache(x,y,zoom, tile_cache, new_tiles_queue: Queue, recursion_depth=0):
-    subsampleIfInCache: bool = True
-    max_recursion=5   
 
-    tile_name = get_tile_name(x, y, zoom)
+def import_legacy_cache_folder():
+    """Moves tiles saved the old way, one file per tile, into the tile store.  Only runs if there isn't a tile store yet"""
+    if os.path.exists(TILE_STORE_PATH) or not os.path.isdir(CACHE_FOLDER):
+        return
 
-    # Simple case: tile exists in cache
-    if tile_name in tile_cache:
-        print("Cache hit")
-        return (tile_cache[tile_name], recursion_depth)
-
-    # Next simplest case: tile exists on disk, but not yet in the dict. Add it to the queue
-    if exists(get_file_path(x, y, zoom)):
-        imread_start = time.time()
-        ret = cv2.imread(get_file_path(x, y, zoom), cv2.IMREAD_UNCHANGED)
-        imread_end = time.time()
-        print(f"Loaded from disk in {(imread_end - imread_start) * 1e3} ms")
-        
-        # memoize the tile we loaded from disk for later. Non-multithreaded code will update the cache
-        new_tiles_queue.put((tile_name, ret))
-
-        return (ret, recursion_depth)
-
-    # Give up if we shouldn't try tomfoolery
-    if not subsampleIfInCache or recursion_depth > max_recursion:
-        # print(f"{x}:{y}:{zoom}: Reached max recursion!")
-        return (None, recursion_depth)
-
-    # Tile name of the next-zoom-level-up tile that contains the same info
-    parent_x = floor(x/2.0)
-    parent_y = floor(y/2.0)
-    parent_z = zoom - 1
-    parent_img, parent_depth = get_tile_from_offline_cache(parent_x, parent_y, parent_z, tile_cache, new_tiles_queue, recursion_depth+1)
-
-    if parent_img is None:
-        # print(f"{x}:{y}:{zoom}: Recursive search failed, passing up None!")
-        return (None, recursion_depth)
-
-    # print(f"{x}:{y}:{zoom}: superscaling!")
-
-    # we need to figure out which quadrant of the image we're in
-    is_left_half = abs(y/2 % 1) < 1e-3
-    is_top_half = abs(x/2 % 1) < 1e-3
-
-    if is_left_half:
-        x_min = 0
-    else:
-        x_min = 128
-
-    if is_top_half:
-        y_min = 0
-    else:
-        y_min = 128
-
-    # print(f"Supersampling from x {x_min} and y {y_min}")
-
-    IMAGE_SIZE = (256, 256)
-    img = cv2.resize(parent_img[x_min:x_min+128, y_min:y_min+128], IMAGE_SIZE, interpolation=cv2.INTER_NEAREST)
-
-    return (img, parent_depth)
-
-
-async def download_task(tile_dict, tile_name, save_local_copy, x, y, z, queue, current_cache: dict):
     start_time = time.time()
+    count = TILE_STORE.importFolder(CACHE_FOLDER)
+    print(f"Imported {count} tiles from {CACHE_FOLDER} into {TILE_STORE_PATH} in {time.time() - start_time:.1f} s")
+
+
+def crop_from_ancestor(ancestor_img, x, y, levels):
+    """Cuts out the part of a tile `levels` zoom levels above tile x, y that covers it, and scales it up to a full tile"""
+    size = TILE_SIZE >> levels
+    mask = (1 << levels) - 1
+
+    # In map land, x corrosponds to image columns and y to image rows
+    row = (y & mask) * size
+    col = (x & mask) * size
+    return cv2.resize(ancestor_img[row:row + size, col:col + size], (TILE_SIZE, TILE_SIZE), interpolation=cv2.INTER_NEAREST)
+
+
+def synthesize_offline_tiles(tiles, zoom, tile_cache):
+    """
+    Makes up tiles that aren't in the tile store from the closest tile above them that is, for a list of (x, y) at one zoom level.
+    The tile store's index says where to look, so nothing gets read from disk that isn't there, and each tile above gets read
+    and decoded once no matter how many tiles get cut from it.
+
+    Returns {tile_name: image} of the made up tiles, and the tiles above them that got loaded from the tile store
+    """
+    index = TILE_STORE.getIndex()
+
+    # Find the closest tile above each one we need, in memory or in the store
+    ancestors = {}  # {(x, y): (ancestor x, ancestor y, ancestor zoom)}
+    ancestor_images = {}  # {ancestor tile_name: image}
+    to_load = {}  # {zoom: {(x, y)}} of ancestors that have to come from the store
+    for (x, y) in tiles:
+        for levels in range(1, min(MAX_OVERZOOM_LEVELS, zoom) + 1):
+            ancestor = (x >> levels, y >> levels, zoom - levels)
+            ancestor_name = get_tile_name(*ancestor)
+            if ancestor_name not in ancestor_images:
+                ancestor_img = tile_cache.get(ancestor_name)
+                if ancestor_img is None and index.contains(*ancestor):
+                    to_load.setdefault(ancestor[2], set()).add(ancestor[0:2])
+                elif ancestor_img is not None:
+                    ancestor_images[ancestor_name] = ancestor_img
+                else:
+                    continue
+            ancestors[(x, y)] = ancestor
+            break
 
-    # If we're online but have the tile already saved, use it
-    if exists(get_file_path(x, y, z)) and not OFFLINE:
-        tile = cv2.imread(get_file_path(x, y, z), cv2.IMREAD_UNCHANGED)
-    elif OFFLINE:
-        # Use tile cache folder, and fake missing tiles using their cropped parents if we have to
-        tile, recusion_depth = get_tile_from_offline_cache(x,y,z, current_cache, queue)
-        if tile is None:
-            return
-        tile_is_fake = (recusion_depth < 1)
-        tile_on_disk = tile_is_fake
-    else:
-        # Normal download from the interwebz
-        data = []
-        await download_tile(data, x, y, z)
-        nparr = numpy.frombuffer(data[0], numpy.uint8)
-        tile = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        tile_is_fake = False
-        tile_on_disk = False
-
-
-    if save_local_copy and not tile_is_fake and not tile_on_disk:
-        # print("saving " + tile_name)
-        cv2.imwrite(get_file_path(x, y, z), tile)
-
-    tile_dict[tile_name] = tile
+    # One query per zoom level for all the ancestors that are only on disk
+    out_dict = {}
+    for ancestor_zoom, keys in to_load.items():
+        xs = [key[0] for key in keys]
+        ys = [key[1] for key in keys]
+        stored_tiles = TILE_STORE.getTilesInBox([min(xs), max(xs), min(ys), max(ys)], ancestor_zoom)
+        for key in keys:
+            ancestor_img = decode_tile(stored_tiles[key]) if key in stored_tiles else None
+            if ancestor_img is not None:
+                ancestor_name = get_tile_name(key[0], key[1], ancestor_zoom)
+                ancestor_images[ancestor_name] = ancestor_img
+                out_dict[ancestor_name] = ancestor_img  # Real tiles, so hand them back to get cached too
+
+    for (x, y), ancestor in ancestors.items():
+        ancestor_img = ancestor_images.get(get_tile_name(*ancestor))
+        if ancestor_img is not None:
+            out_dict[get_tile_name(x, y, zoom)] = crop_from_ancestor(ancestor_img, x, y, zoom - ancestor[2])
 
-    end_time = time.time()
-    # print(f"Download for {x} {y} {z} done in {(end_time - start_time) * 1e3} ms")
+    return out_dict
 
 
 def get_bounding_box_tiles(lower_left, upper_right, zoom):
@@ -147,57 +121,101 @@ def get_tile_name(x, y, zoom):
     return "{0},{1},{2}".format(zoom, x, y)
 
 
-def get_file_path(x, y, zoom):
-    return "{}/{}.png".format(CACHE_FOLDER, get_tile_name(x, y, zoom))
+def parse_tile_name(tile_name):
+    """Returns (x, y, zoom) from a name made by get_tile_name"""
+    [zoom, x, y] = [int(it) for it in tile_name.split(",")]
+    return (x, y, zoom)
 
 
-async def addAsyncTasks(bounding_box, zoom, exclude_list, save_local_copy, out_dict, current_tile_cache):
+def get_all_tiles_in_box(bounding_box, zoom, current_cache, exclude_list=None, save_local_copy=False):
     [x_min, x_max, y_min, y_max] = bounding_box
 
-    tasks = []
-    queue = Queue(0)
+    if exclude_list is None or save_local_copy:
+        exclude_list = []
+
+    out_dict = {}
+    to_synthesize = []
+    to_download = []
+    to_save = []
+
+    # One query for everything in the box that's already saved
+    stored_tiles = TILE_STORE.getTilesInBox(bounding_box, zoom)
 
     for x in range(x_min, x_max + 1):
         for y in range(y_min, y_max + 1):
             tile_name = get_tile_name(x, y, zoom)
+            if tile_name in exclude_list:
+                continue
+
+            if (x, y) in stored_tiles:
+                # Use the saved copy if we have one, online or not
+                tile = decode_tile(stored_tiles[(x, y)])
+                if tile is not None:
+                    out_dict[tile_name] = tile
+            elif OFFLINE:
+                to_synthesize.append((x, y))
+            else:
+                to_download.append((x, y, zoom))
 
-            if tile_name not in exclude_list:
-                task = asyncio.create_task(download_task(out_dict, tile_name, save_local_copy, x, y, zoom, queue, current_tile_cache))
-                tasks.append(task)
-                # await task
-
-    for task in tasks:
-        await task
-
-    while queue.qsize() > 0:
-        try:
-            (name, tile) = queue.get_nowait()
-            out_dict[name] = tile
-        except Exception as e:
-            print(e)
-            break
-
+    # Everything that isn't saved gets downloaded at once by the shared fetcher
+    for (x, y, z), data in TILE_FETCHER.fetchTilesAsCompleted(to_download):
+        if data is None:
+            continue
+        tile = decode_tile(data)
+        if tile is None:
+            continue
+        if save_local_copy:
+            png = to_png_bytes(data, tile)
+            if png is not None:
+                to_save.append((x, y, z, png))
+        out_dict[get_tile_name(x, y, z)] = tile
 
-def get_all_tiles_in_box(bounding_box, zoom, current_cache, exclude_list=None, save_local_copy=False):
-    if exclude_list is None or save_local_copy:
-        exclude_list = []
+    TILE_STORE.putTiles(to_save)
 
-    if save_local_copy and not os.path.exists(CACHE_FOLDER):
-        os.makedirs(CACHE_FOLDER)
+    # Fake missing tiles using their cropped parents if we have to, all at once
+    if to_synthesize:
+        out_dict.update(synthesize_offline_tiles(to_synthesize, zoom, current_cache))
 
-    out_dict = {}
+    return out_dict
 
-    asyncio.run(addAsyncTasks(bounding_box, zoom, exclude_list, save_local_copy, out_dict, current_cache))
 
-    return out_dict
+def get_tiles_at_all_zoom_levels(lower_left_lla, upper_right_lla, save_local_copy=False, min_zoom=10, max_zoom=19):
+    """
+    Downloads every tile in a box at every zoom level into the tile store, all at once instead of one zoom level at a time.
+    Returns how many tiles got downloaded
+    """
 
+    if OFFLINE:
+        return 0
 
-def get_tiles_at_all_zoom_levels(lower_left_lla, upper_right_lla, save_local_copy=False):
-    time.sleep(0.01)
+    to_download = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        tile_set = get_bounding_box_tiles(lower_left_lla, upper_right_lla, zoom)
+        [x_min, x_max, y_min, y_max] = tile_set
+        stored_tiles = TILE_STORE.getTilesInBox(tile_set, zoom, keys_only=True)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                if (x, y) not in stored_tiles:
+                    to_download.append((x, y, zoom))
 
-    for i in range(10, 20):
-        tile_set = get_bounding_box_tiles(lower_left_lla, upper_right_lla, i)
-        get_all_tiles_in_box(tile_set, i, save_local_copy=save_local_copy)
+    start_time = time.time()
+    downloaded = 0
+    to_save = []
+    for (x, y, z), data in TILE_FETCHER.fetchTilesAsCompleted(to_download):
+        if data is None:
+            continue
+        downloaded += 1
+        if save_local_copy:
+            png = to_png_bytes(data)
+            if png is not None:
+                to_save.append((x, y, z, png))
+            if len(to_save) >= SAVE_BATCH_SIZE:
+                TILE_STORE.putTiles(to_save)
+                to_save = []
+    TILE_STORE.putTiles(to_save)
+
+    print(f"Downloaded {downloaded} of {len(to_download)} tiles in {time.time() - start_time:.1f} s")
+    return downloaded
 
 
 def stitch_all_tiles_in_box(bounding_box, zoom, tile_database):
@@ -211,10 +229,8 @@ def stitch_all_tiles_in_box(bounding_box, zoom, tile_database):
 
     for x in range(x_min, x_max + 1):
         for y in range(y_min, y_max + 1):
-            tile_name = get_tile_name(x, y, zoom)
-            if tile_name in tile_database:
-                tile = tile_database[tile_name]
-
+            tile = tile_database.get(get_tile_name(x, y, zoom))
+            if tile is not None:
                 # Location of the top-left corner of the tile in our map, in pixels
                 tile_start_col_px = (x-x_min)*256
                 tile_start_row_px = (y-y_min)*256
@@ -235,26 +251,12 @@ def stitch_all_tiles_in_box(bounding_box, zoom, tile_database):
 def get_edges_for_tile_set(tile_set, zoom):
     [x_min, x_max, y_min, y_max] = tile_set
 
-    lower_left = []
-    upper_right = []
+    # Tiles line up in a grid, so the outside edges come from the corner tiles
+    [west, north, _, _] = tile_edges(x_min, y_min, zoom)  # Tile y counts down from the north
+    [_, _, east, south] = tile_edges(x_max, y_max, zoom)
 
-    for x in range(x_min, x_max + 1):
-        for y in range(y_min, y_max + 1):
-            edges = tile_edges(x, y, zoom)  # lon, lat, lon, lat, but not really clear what order
-
-            max_lat = max(edges[1], edges[3])  # Find mins and maxes
-            min_lat = min(edges[1], edges[3])
-            max_lon = max(edges[0], edges[2])
-            min_lon = min(edges[0], edges[2])
-
-            if len(lower_left) == 0:
-                lower_left = [min_lat, min_lon]
-                upper_right = [max_lat, max_lon]
-            else:
-                lower_left[0] = min(lower_left[0], min_lat)  # Latitude
-                lower_left[1] = min(lower_left[1], min_lon)
-                upper_right[0] = max(upper_right[0], max_lat)
-                upper_right[1] = max(upper_right[1], max_lon)
+    lower_left = [min(north, south), min(west, east)]
+    upper_right = [max(north, south), max(west, east)]
 
     return lower_left, upper_right
 
@@ -302,7 +304,7 @@ if __name__ == "__main__":
     for _ in range(5):
 
         start_time = time.time()
-        tile_cache.update(get_all_tiles_in_box(tile_set, zoom, exclude_list=tile_cache.keys(), save_local_copy=False))
+        tile_cache.update(get_all_tiles_in_box(tile_set, zoom, tile_cache, exclude_list=tile_cache.keys(), save_local_copy=False))
         end_time = time.time()
 
         print(f"Got {len(tile_cache)} tiles in {(end_time - start_time) * 1e3} ms")
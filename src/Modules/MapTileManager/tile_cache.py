@@ -0,0 +1,210 @@
+"""
+Least recently used cache for decoded map tiles, with a memory budget
+
+Recently used tiles are kept decoded (hot).  When the cache goes over its budget, the least recently used tiles are either
+compressed to PNG in memory (cold), or spilled to the tile store on disk and dropped.  Lookups check hot, then cold,
+then disk, and move whatever they find back to the front.
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy
+
+from src.Modules.MapTileManager.map_tile_tools import TILE_STORE, parse_tile_name
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024  # Bytes
+COLD_FRACTION = 0.5  # Most of the budget compressed tiles can use before they start getting spilled to disk
+PNG_COMPRESSION_LEVEL = 1  # Fast, since this runs in the map thread.  Satellite tiles barely compress better at higher levels
+
+
+class TileCacheStats(object):
+    def __init__(self):
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.compressed = 0
+        self.spilled = 0
+
+    def getHitRate(self):
+        lookups = self.hot_hits + self.cold_hits + self.disk_hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return float(lookups - self.misses) / lookups
+
+
+class TileCache(object):
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, compress_cold_tiles=True, spill_to_disk=True, tile_store=TILE_STORE):
+        """
+        Acts enough like a dict of {tile_name: image} that the map_tile_tools functions can use it directly.
+
+        `in` counts as a lookup for the hit/miss stats, and pulls the tile into memory if it finds it compressed or on disk.
+        get() and [] don't touch the stats, so checking for a tile and then grabbing it only counts once
+        """
+
+        self.memory_budget = memory_budget
+        self.compress_cold_tiles = compress_cold_tiles
+        self.spill_to_disk = spill_to_disk
+        self.tile_store = tile_store
+
+        self.hot_tiles = OrderedDict()  # {tile_name: image}, least recently used first
+        self.cold_tiles = OrderedDict()  # {tile_name: PNG bytes}, least recently used first
+        self.hot_bytes = 0
+        self.cold_bytes = 0
+
+        self.stats = TileCacheStats()
+        self.lock = threading.RLock()  # The map thread does all the work, but the GUI reads stats and clears the cache
+
+    def __contains__(self, tile_name):
+        with self.lock:
+            if tile_name in self.hot_tiles:
+                self.stats.hot_hits += 1
+                self.hot_tiles.move_to_end(tile_name)
+                return True
+            elif self.loadTile(tile_name) is not None:
+                return True
+            else:
+                self.stats.misses += 1
+                return False
+
+    def __getitem__(self, tile_name):
+        tile = self.get(tile_name)
+        if tile is None:
+            raise KeyError(tile_name)
+        return tile
+
+    def __setitem__(self, tile_name, tile):
+        if tile is None:
+            return
+
+        with self.lock:
+            self.removeTile(tile_name)
+            self.hot_tiles[tile_name] = tile
+            self.hot_bytes += tile.nbytes
+            self.enforceBudget()
+
+    def __len__(self):
+        return len(self.hot_tiles) + len(self.cold_tiles)
+
+    def get(self, tile_name, default=None):
+        with self.lock:
+            if tile_name in self.hot_tiles:
+                self.hot_tiles.move_to_end(tile_name)
+                return self.hot_tiles[tile_name]
+
+            tile = self.loadTile(tile_name, count_hit=False)
+            return default if tile is None else tile
+
+    def update(self, new_tiles: dict):
+        for tile_name in new_tiles:
+            self[tile_name] = new_tiles[tile_name]
+
+    def isResident(self, tile_name):
+        """Whether a tile is in memory, hot or compressed.  Doesn't count as a lookup, or touch the disk"""
+        with self.lock:
+            return tile_name in self.hot_tiles or tile_name in self.cold_tiles
+
+    def keys(self):
+        with self.lock:
+            return list(self.hot_tiles.keys()) + list(self.cold_tiles.keys())
+
+    def clear(self):
+        with self.lock:
+            self.hot_tiles.clear()
+            self.cold_tiles.clear()
+            self.hot_bytes = 0
+            self.cold_bytes = 0
+
+    def loadTile(self, tile_name, count_hit=True):
+        """Looks for a tile that isn't hot, and makes it hot if it finds it.  Returns None if the tile isn't in memory or on disk"""
+        if tile_name in self.cold_tiles:
+            data = self.cold_tiles.pop(tile_name)
+            self.cold_bytes -= len(data)
+            tile = cv2.imdecode(numpy.frombuffer(data, numpy.uint8), cv2.IMREAD_UNCHANGED)
+            if count_hit:
+                self.stats.cold_hits += 1
+        elif self.spill_to_disk:
+            data = self.tile_store.getTile(*parse_tile_name(tile_name))
+            if data is None:
+                return None
+            tile = cv2.imdecode(numpy.frombuffer(data, numpy.uint8), cv2.IMREAD_COLOR)
+            if count_hit and tile is not None:
+                self.stats.disk_hits += 1
+        else:
+            return None
+
+        self[tile_name] = tile
+        return tile
+
+    def removeTile(self, tile_name):
+        if tile_name in self.hot_tiles:
+            self.hot_bytes -= self.hot_tiles.pop(tile_name).nbytes
+        if tile_name in self.cold_tiles:
+            self.cold_bytes -= len(self.cold_tiles.pop(tile_name))
+
+    def enforceBudget(self):
+        # Never kick out the tile that was just added, even if it's bigger than the whole budget
+        while self.hot_bytes + self.cold_bytes > self.memory_budget and len(self) > 1:
+            if self.compress_cold_tiles and self.cold_bytes <= self.memory_budget * COLD_FRACTION and len(self.hot_tiles) > 1:
+                self.compressTile()
+            elif self.cold_tiles:
+                [tile_name, data] = self.cold_tiles.popitem(last=False)
+                self.cold_bytes -= len(data)
+                self.spillTile(tile_name, data)
+            else:
+                [tile_name, tile] = self.hot_tiles.popitem(last=False)
+                self.hot_bytes -= tile.nbytes
+                self.spillTile(tile_name, tile)
+
+    def compressTile(self):
+        """Compresses the least recently used hot tile"""
+        [tile_name, tile] = self.hot_tiles.popitem(last=False)
+        self.hot_bytes -= tile.nbytes
+
+        [success, data] = cv2.imencode(".png", tile, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION_LEVEL])
+        if success:
+            self.cold_tiles[tile_name] = data.tobytes()
+            self.cold_bytes += len(self.cold_tiles[tile_name])
+            self.stats.compressed += 1
+        else:
+            self.spillTile(tile_name, tile)
+
+    def spillTile(self, tile_name, tile):
+        """Writes a tile that's getting dropped from memory to the tile store, unless it's already there.  Takes either an image or PNG bytes"""
+        if not self.spill_to_disk:
+            return
+
+        try:
+            if not isinstance(tile, bytes):
+                [success, data] = cv2.imencode(".png", tile, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION_LEVEL])
+                if not success:
+                    return
+                tile = data.tobytes()
+            self.tile_store.putTile(*parse_tile_name(tile_name), tile, replace=False)
+            self.stats.spilled += 1
+        except Exception as e:
+            print("Unable to spill tile {0} to disk: {1}".format(tile_name, e))
+
+    def getResidentBytes(self):
+        return self.hot_bytes + self.cold_bytes
+
+    def getStats(self) -> TileCacheStats:
+        return self.stats
+
+    def getStatsString(self):
+        stats = self.stats
+        return "{0} hot tiles ({1:.1f} MB), {2} compressed ({3:.1f} MB) of {4:.0f} MB, {5:.0%} hit rate ({6} memory, {7} compressed, {8} disk, {9} misses), {10} spilled".format(
+            len(self.hot_tiles),
+            self.hot_bytes / 1048576,
+            len(self.cold_tiles),
+            self.cold_bytes / 1048576,
+            self.memory_budget / 1048576,
+            stats.getHitRate(),
+            stats.hot_hits,
+            stats.cold_hits,
+            stats.disk_hits,
+            stats.misses,
+            stats.spilled,
+        )
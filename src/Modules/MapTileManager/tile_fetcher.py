@@ -0,0 +1,203 @@
+"""
+Long lived map tile downloader
+
+Runs one asyncio event loop on its own thread, with one aiohttp session, so every download shares the same connection pool
+and the same limit on how many requests are out at once.  Asking for a tile that's already downloading waits on that download
+instead of starting another one, and failed downloads get retried with exponential backoff.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+import aiohttp
+
+DEFAULT_TILE_URL = "http://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}"
+# DEFAULT_TILE_URL = "https://a.tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+MAX_CONCURRENT_DOWNLOADS = 32
+MAX_LOW_PRIORITY_DOWNLOADS = 4  # Prefetching only gets this many of the download slots, so it never holds up tiles the map is waiting on
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.25  # Seconds before the first retry, doubles after that
+REQUEST_TIMEOUT = 10  # Seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TileFetcherStats(object):
+    def __init__(self):
+        self.requests = 0
+        self.downloads = 0
+        self.coalesced = 0  # Requests that waited on a download that was already running
+        self.low_priority = 0
+        self.promoted = 0  # Low priority downloads that something else started waiting on before they got a slot
+        self.retries = 0
+        self.failures = 0
+        self.bytes_downloaded = 0
+
+
+class TileFetcher(object):
+    def __init__(self, url_template=DEFAULT_TILE_URL, max_concurrent=MAX_CONCURRENT_DOWNLOADS, max_retries=MAX_RETRIES, retry_backoff=RETRY_BACKOFF, timeout=REQUEST_TIMEOUT):
+        """
+        url_template gets formatted with x, y and z for each tile.  Nothing starts until the first tile is requested
+        """
+
+        self.url_template = url_template
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+
+        self.stats = TileFetcherStats()
+
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self.semaphore = None
+        self.max_low_priority = min(MAX_LOW_PRIORITY_DOWNLOADS, max_concurrent)
+        self.low_priority_active = 0  # Low priority slots in use
+        self.low_priority_waiting = {}  # {(x, y, z): asyncio.Future} of low priority downloads waiting for a slot, oldest first
+        self.in_flight = {}  # {(x, y, z): asyncio.Task}, only touched from the event loop thread
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.loop is not None:
+                return
+
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, name="TileFetcher", daemon=True)
+            self.thread.start()
+            asyncio.run_coroutine_threadsafe(self.openSession(), self.loop).result()
+
+    async def openSession(self):
+        # These have to be made on the event loop they're used from
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    def close(self):
+        with self.start_lock:
+            if self.loop is None:
+                return
+
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+            self.session = None
+
+    async def fetchTile(self, x, y, z, low_priority=False):
+        """Returns the tile's image bytes, or None if it couldn't be downloaded.  Has to be awaited on the fetcher's event loop"""
+        self.stats.requests += 1
+
+        key = (x, y, z)
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.downloadTileLowPriority(x, y, z) if low_priority else self.downloadTile(x, y, z))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.stats.coalesced += 1
+
+            # Something that isn't a prefetch wants this tile now, so it can't keep waiting behind the other prefetches
+            ticket = self.low_priority_waiting.pop(key, None) if not low_priority else None
+            if ticket is not None and not ticket.done():
+                ticket.set_result(False)
+                self.stats.promoted += 1
+
+        # Shield it, so one caller giving up doesn't cancel the download for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    async def downloadTileLowPriority(self, x, y, z):
+        """Waits for one of the low priority slots first, unless a normal request for the same tile promotes it"""
+        self.stats.low_priority += 1
+        key = (x, y, z)
+
+        has_slot = self.low_priority_active < self.max_low_priority
+        if has_slot:
+            self.low_priority_active += 1
+        else:
+            ticket = asyncio.get_event_loop().create_future()  # True once it's handed a slot, False if it got promoted
+            self.low_priority_waiting[key] = ticket
+            try:
+                has_slot = await ticket
+            except asyncio.CancelledError:
+                if ticket.done() and not ticket.cancelled() and ticket.result():
+                    self.releaseLowPrioritySlot()
+                raise
+            finally:
+                self.low_priority_waiting.pop(key, None)
+
+        try:
+            return await self.downloadTile(x, y, z)
+        finally:
+            if has_slot:
+                self.releaseLowPrioritySlot()
+
+    def releaseLowPrioritySlot(self):
+        # Hand the slot straight to the oldest waiting download, so nothing can sneak in ahead of it
+        while self.low_priority_waiting:
+            key = next(iter(self.low_priority_waiting))
+            ticket = self.low_priority_waiting.pop(key)
+            if not ticket.done():
+                ticket.set_result(True)
+                return
+        self.low_priority_active -= 1
+
+    async def downloadTile(self, x, y, z):
+        url = self.url_template.format(x=x, y=y, z=z)
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.stats.retries += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+            try:
+                async with self.semaphore:
+                    async with self.session.get(url) as resp:
+                        if resp.status == 200:
+                            data = await resp.read()
+                            self.stats.downloads += 1
+                            self.stats.bytes_downloaded += len(data)
+                            return data
+                        if resp.status not in RETRY_STATUS_CODES:
+                            print("Could not download {}: HTTP {}".format(url, resp.status))
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    print("Could not download {}: {}".format(url, e))
+
+        self.stats.failures += 1
+        return None
+
+    def submit(self, x, y, z, low_priority=False) -> concurrent.futures.Future:
+        """
+        Starts downloading a tile from any thread.  The future's result is the image bytes, or None.
+        Low priority downloads (prefetching) only get a few of the download slots
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.fetchTile(x, y, z, low_priority), self.loop)
+
+    def fetchTilesAsCompleted(self, tiles):
+        """
+        Downloads a list of (x, y, z) tiles all at once, and yields (tile, image bytes or None) as each one finishes.
+        Blocks the calling thread, but not the fetcher, so more than one thread can do this at the same time
+        """
+        futures = {self.submit(*tile): tile for tile in tiles}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+    def fetchTiles(self, tiles):
+        """Downloads a list of (x, y, z) tiles all at once.  Returns {(x, y, z): image bytes or None}"""
+        return dict(self.fetchTilesAsCompleted(tiles))
+
+    def getStatsString(self):
+        return "{0} tiles downloaded ({1:.1f} MB), {2} low priority ({3} promoted), {4} coalesced, {5} retries, {6} failed".format(
+            self.stats.downloads, self.stats.bytes_downloaded / 1e6, self.stats.low_priority, self.stats.promoted, self.stats.coalesced, self.stats.retries, self.stats.failures
+        )
+
+
+# One fetcher for the whole program, so everything shares the same connection pool and download limit
+TILE_FETCHER = TileFetcher()
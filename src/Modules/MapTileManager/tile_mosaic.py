@@ -0,0 +1,116 @@
+"""
+Keeps the last stitched map image around, so that when the view moves, only the newly exposed tiles have to be drawn
+
+The old image gets handed to the GUI and it keeps drawing from it, so we can't shift it in place.  Instead, each update copies
+the part that's still in view into a new image as one block, and only looks up and draws the tiles that weren't already in it.
+"""
+
+from typing import Optional, Set, Tuple
+
+import numpy
+
+from src.Modules.MapTileManager.map_tile_tools import TILE_SIZE, get_tile_name
+
+
+def get_tile_set_overlap(tile_set_a, tile_set_b) -> Optional[Tuple[int, int, int, int]]:
+    """[x_min, x_max, y_min, y_max] of the tiles in both sets, or None if they don't overlap"""
+    x_min = max(tile_set_a[0], tile_set_b[0])
+    x_max = min(tile_set_a[1], tile_set_b[1])
+    y_min = max(tile_set_a[2], tile_set_b[2])
+    y_max = min(tile_set_a[3], tile_set_b[3])
+
+    if x_min > x_max or y_min > y_max:
+        return None
+    return x_min, x_max, y_min, y_max
+
+
+class TileMosaic(object):
+    def __init__(self):
+        self.image = None
+        self.tile_set = None
+        self.zoom = None
+        self.missing_tiles: Set[Tuple[int, int]] = set()  # (x, y) of tiles in the image that are still black
+
+        self.last_drawn_tile_count = 0
+        self.last_reused_tile_count = 0
+
+    def getOverlap(self, tile_set, zoom):
+        if self.image is None or zoom != self.zoom:
+            return None
+        return get_tile_set_overlap(self.tile_set, tile_set)
+
+    def isTileReusable(self, x, y, overlap):
+        return overlap is not None and overlap[0] <= x <= overlap[1] and overlap[2] <= y <= overlap[3] and (x, y) not in self.missing_tiles
+
+    def getAvailableTileNames(self, tile_set, zoom, tile_database) -> Set[str]:
+        """
+        Names of the tiles in tile_set that don't need to be fetched, because they're already in the current image or in tile_database.
+        Tiles that are in the current image never get looked up in tile_database
+        """
+        overlap = self.getOverlap(tile_set, zoom)
+        [x_min, x_max, y_min, y_max] = tile_set
+
+        available = set()
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                tile_name = get_tile_name(x, y, zoom)
+                if self.isTileReusable(x, y, overlap) or tile_name in tile_database:
+                    available.add(tile_name)
+        return available
+
+    def update(self, tile_set, zoom, tile_database) -> numpy.ndarray:
+        """Returns the stitched image for tile_set.  Same result as stitch_all_tiles_in_box, but reuses the last image where it can"""
+        [x_min, x_max, y_min, y_max] = tile_set
+
+        # in map land, x corresponds to image columns and y to image rows
+        image = numpy.zeros((TILE_SIZE * (y_max - y_min + 1), TILE_SIZE * (x_max - x_min + 1), 3), dtype=numpy.uint8)
+
+        overlap = self.getOverlap(tile_set, zoom)
+        if overlap is not None:
+            [overlap_x_min, overlap_x_max, overlap_y_min, overlap_y_max] = overlap
+            old_x_min = self.tile_set[0]
+            old_y_min = self.tile_set[2]
+
+            # Copy the part of the old image that's still in view as one block
+            new_rows = slice((overlap_y_min - y_min) * TILE_SIZE, (overlap_y_max - y_min + 1) * TILE_SIZE)
+            new_cols = slice((overlap_x_min - x_min) * TILE_SIZE, (overlap_x_max - x_min + 1) * TILE_SIZE)
+            old_rows = slice((overlap_y_min - old_y_min) * TILE_SIZE, (overlap_y_max - old_y_min + 1) * TILE_SIZE)
+            old_cols = slice((overlap_x_min - old_x_min) * TILE_SIZE, (overlap_x_max - old_x_min + 1) * TILE_SIZE)
+            image[new_rows, new_cols] = self.image[old_rows, old_cols]
+
+        missing_tiles = set()
+        drawn_tile_count = 0
+        reused_tile_count = 0
+
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                if self.isTileReusable(x, y, overlap):
+                    reused_tile_count += 1
+                    continue
+
+                tile = tile_database.get(get_tile_name(x, y, zoom))
+                if tile is None:
+                    missing_tiles.add((x, y))  # Leave it black, and try again next time
+                    continue
+
+                row = (y - y_min) * TILE_SIZE
+                col = (x - x_min) * TILE_SIZE
+                try:
+                    image[row : row + TILE_SIZE, col : col + TILE_SIZE] = tile
+                    drawn_tile_count += 1
+                except Exception as e:
+                    print(e)
+
+        self.image = image
+        self.tile_set = tuple(tile_set)
+        self.zoom = zoom
+        self.missing_tiles = missing_tiles
+        self.last_drawn_tile_count = drawn_tile_count
+        self.last_reused_tile_count = reused_tile_count
+
+        return image
+
+    def clear(self):
+        self.image = None
+        self.tile_set = None
+        self.missing_tiles = set()
@@ -0,0 +1,55 @@
+"""
+Works out which map tiles the map is going to need next, from where the vehicle is headed
+
+The map only asks for new tiles once the vehicle has already left the current image, so while the rocket drifts under its
+parachute the map keeps going blank.  These project the vehicle's position forward along its ground track, and to where it
+will land if it's coming down, so the tiles around those points can be downloaded before the map asks for them.
+"""
+
+import math
+
+import navpy
+
+from src.Modules.MapTileManager.tile_convert import latlon_to_xyz
+
+LOOKAHEAD_TIMES = [10, 20, 40]  # Seconds ahead along the ground track to prefetch around
+MIN_DESCENT_RATE = 1  # m/s, slower than this and we don't guess where the vehicle lands
+MAX_LANDING_TIME = 600  # Seconds, landing predictions further out than this aren't worth downloading for
+
+
+def predict_positions(latitude, longitude, ground_speed, course, altitude=None, vertical_speed=None):
+    """
+    Returns [[lat, lon], ...] of where the vehicle is now, where it will be LOOKAHEAD_TIMES from now if it keeps the same
+    ground speed (m/s) and course (degrees from north), and where it lands if it's coming down, nearest first.
+    Altitude should be above the ground, and vertical_speed is positive going up
+    """
+
+    time_to_landing = None
+    if altitude is not None and vertical_speed is not None and altitude > 0 and vertical_speed < -MIN_DESCENT_RATE:
+        time_to_landing = altitude / -vertical_speed
+
+    times = [t for t in LOOKAHEAD_TIMES if time_to_landing is None or t < time_to_landing]
+    if time_to_landing is not None and time_to_landing <= MAX_LANDING_TIME:
+        times.append(time_to_landing)
+
+    north_speed = ground_speed * math.cos(math.radians(course))
+    east_speed = ground_speed * math.sin(math.radians(course))
+
+    positions = [[latitude, longitude]]
+    for t in times:
+        positions.append(list(navpy.ned2lla([north_speed * t, east_speed * t, 0], latitude, longitude, 0)[0:2]))
+    return positions
+
+
+def get_tiles_around_positions(positions, zoom, half_width, half_height):
+    """Returns [(x, y, zoom), ...] of the tiles in a box half_width by half_height tiles around each position, nearest position first, without repeats"""
+    tiles = []
+    seen = set()
+    for [latitude, longitude] in positions:
+        [x, y] = [int(math.floor(it)) for it in latlon_to_xyz(latitude, longitude, zoom)]
+        for tile_x in range(x - half_width, x + half_width + 1):
+            for tile_y in range(y - half_height, y + half_height + 1):
+                if (tile_x, tile_y) not in seen:
+                    seen.add((tile_x, tile_y))
+                    tiles.append((tile_x, tile_y, zoom))
+    return tiles
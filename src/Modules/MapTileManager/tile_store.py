@@ -0,0 +1,166 @@
+"""
+Offline map tile archive in one SQLite file, laid out like an MBTiles file
+
+Tiles are stored as PNG bytes in a tiles table keyed on (zoom_level, tile_column, tile_row), so looking up every tile in a
+bounding box is one indexed query instead of a file system probe per tile.  Like MBTiles, tile_row counts up from the south
+(TMS), so the file opens in other MBTiles tools, and a whole launch site can be packed into one file and copied to another laptop.
+
+Usage: python -m src.Modules.MapTileManager.tile_store <tile folder> <archive.mbtiles>
+    Packs a folder of zoom,x,y.png tiles into an archive
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB, PRIMARY KEY (zoom_level, tile_column, tile_row)) WITHOUT ROWID",
+]
+METADATA = {"name": "Ground station map tiles", "format": "png", "type": "baselayer", "version": "1"}
+
+
+def flip_y(y, zoom):
+    """Converts between XYZ tile y (counts down from the north) and TMS tile_row (counts up from the south).  Works both ways"""
+    return (1 << zoom) - 1 - y
+
+
+class TileIndex(object):
+    """
+    Which tiles exist at which zoom level, kept in memory as a linear quadtree: one set of (x, y) per zoom level, where the
+    tile above (x, y) is (x // 2, y // 2) one level up.  Finding the closest tile above a missing one is a few set lookups,
+    instead of a disk read per level
+    """
+
+    def __init__(self, keys=()):
+        self.levels = {}  # {zoom: {(x, y)}}
+        for x, y, zoom in keys:
+            self.add(x, y, zoom)
+
+    def add(self, x, y, zoom):
+        self.levels.setdefault(zoom, set()).add((x, y))
+
+    def contains(self, x, y, zoom):
+        return (x, y) in self.levels.get(zoom, ())
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels.values())
+
+
+class TileStore(object):
+    def __init__(self, file_path):
+        """The file gets created the first time it's used, not here"""
+        self.file_path = file_path
+        self.connection = None
+        self.index = None  # TileIndex, built the first time it's asked for and kept up to date after that
+        self.lock = threading.Lock()  # The map thread does most of the work, but bulk downloads can run alongside it
+
+    def getConnection(self):
+        if self.connection is None:
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self.connection = sqlite3.connect(self.file_path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")  # Readers don't wait on a bulk download's writes
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            with self.connection:
+                for statement in SCHEMA:
+                    self.connection.execute(statement)
+                self.connection.executemany("INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)", METADATA.items())
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            self.index = None
+
+    def getTile(self, x, y, zoom):
+        """Returns the tile's PNG bytes, or None"""
+        with self.lock:
+            row = self.getConnection().execute("SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", (zoom, x, flip_y(y, zoom))).fetchone()
+        return None if row is None else row[0]
+
+    def getTilesInBox(self, bounding_box, zoom, keys_only=False):
+        """
+        Looks up every tile in an [x_min, x_max, y_min, y_max] box with one query.
+        Returns {(x, y): PNG bytes} for the tiles that are there, or a set of (x, y) with keys_only
+        """
+        [x_min, x_max, y_min, y_max] = bounding_box
+        columns = "tile_column, tile_row" if keys_only else "tile_column, tile_row, tile_data"
+        query = "SELECT {} FROM tiles WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?".format(columns)
+
+        with self.lock:
+            rows = self.getConnection().execute(query, (zoom, x_min, x_max, flip_y(y_max, zoom), flip_y(y_min, zoom))).fetchall()
+
+        if keys_only:
+            return {(row[0], flip_y(row[1], zoom)) for row in rows}
+        return {(row[0], flip_y(row[1], zoom)): row[2] for row in rows}
+
+    def putTiles(self, tiles, replace=True):
+        """Adds a list of (x, y, zoom, PNG bytes) in one transaction.  With replace=False, tiles that are already there are left alone"""
+        statement = "INSERT OR {} INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)".format("REPLACE" if replace else "IGNORE")
+        rows = [(zoom, x, flip_y(y, zoom), sqlite3.Binary(data)) for (x, y, zoom, data) in tiles]
+        if not rows:
+            return
+
+        with self.lock:
+            connection = self.getConnection()
+            with connection:
+                connection.executemany(statement, rows)
+            if self.index is not None:
+                for x, y, zoom, _ in tiles:
+                    self.index.add(x, y, zoom)
+
+    def putTile(self, x, y, zoom, data, replace=True):
+        self.putTiles([(x, y, zoom, data)], replace=replace)
+
+    def getIndex(self) -> TileIndex:
+        """Which tiles are in the store.  Reads every key once, so the first call can take a moment on a big store"""
+        with self.lock:
+            if self.index is None:
+                rows = self.getConnection().execute("SELECT tile_column, tile_row, zoom_level FROM tiles").fetchall()
+                self.index = TileIndex((x, flip_y(row, zoom), zoom) for (x, row, zoom) in rows)
+            return self.index
+
+    def getTileCount(self):
+        with self.lock:
+            return self.getConnection().execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def importFolder(self, folder, batch_size=512):
+        """Adds every zoom,x,y.png tile in a folder (the old one file per tile cache), skipping ones already here.  Returns how many were read"""
+        batch = []
+        count = 0
+        for file_name in os.listdir(folder):
+            [name, extension] = os.path.splitext(file_name)
+            try:
+                [zoom, x, y] = [int(it) for it in name.split(",")]
+            except ValueError:
+                continue
+            if extension.lower() != ".png":
+                continue
+
+            with open(os.path.join(folder, file_name), "rb") as file:
+                batch.append((x, y, zoom, file.read()))
+            count += 1
+
+            if len(batch) >= batch_size:
+                self.putTiles(batch, replace=False)
+                batch = []
+
+        self.putTiles(batch, replace=False)
+        return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    store = TileStore(sys.argv[2])
+    imported = store.importFolder(sys.argv[1])
+    print("Read {0} tiles, {1} in {2}".format(imported, store.getTileCount(), sys.argv[2]))
+    store.close()
@@ -75,6 +75,80 @@ BOOL_TYPE = "?"
 
 FLOAT_TYPE = "f"
 
+# Same types, as NumPy dtype strings.  Everything is little endian and packed, same as the struct formats
+NUMPY_TYPES = {
+    UINT_8_TYPE: "u1",
+    UINT_16_TYPE: "<u2",
+    UINT_32_TYPE: "<u4",
+    INT_8_TYPE: "i1",
+    INT_16_TYPE: "<i2",
+    BOOL_TYPE: "?",
+    FLOAT_TYPE: "<f4",
+}
+
+
+def gps_time_to_string(gps_time):
+    return str(datetime.datetime.fromtimestamp(gps_time))
+
+
+class MessageCodec(object):
+    def __init__(self, message_data):
+        """
+        Compiled version of a messageData layout.
+
+        Builds the struct once, and splits the per-field parse options into a plan so decoding a packet doesn't have to look at the
+        type of every parse option again.
+        """
+
+        self.formats = tuple(message_line[0] for message_line in message_data)
+        self.struct = struct.Struct("<" + "".join(self.formats))
+        self.keys = tuple(message_line[1] for message_line in message_data)
+
+        scaled_fields = []  # [(index, key, scale), ...]
+        transformed_fields = []  # [(index, key, function), ...]
+
+        for i in range(len(message_data)):
+            message_line = message_data[i]
+            if len(message_line) == 2:
+                continue
+
+            parse_type = message_line[2]
+            key = message_line[1]
+
+            # Various special options to parse
+            if isinstance(parse_type, (int, float)):  # If it's a number, just multiply
+                scaled_fields.append((i, key, parse_type))
+            elif parse_type == "TIME":  # If its a time, make a time string
+                transformed_fields.append((i, key, gps_time_to_string))
+            elif callable(parse_type):  # If its a function
+                transformed_fields.append((i, key, parse_type))
+            else:
+                print("Unknown parse type")
+
+        self.scaled_fields = tuple(scaled_fields)
+        self.transformed_fields = tuple(transformed_fields)
+
+    def getNumpyFields(self, base_offset=0):
+        """Returns [(key, numpy_type, offset), ...] for each field, with offsets relative to base_offset"""
+        fields = []
+        offset = base_offset
+        for message_format, key in zip(self.formats, self.keys):
+            fields.append((key, NUMPY_TYPES[message_format], offset))
+            offset += struct.calcsize("<" + message_format)
+        return fields
+
+    def decode(self, buffer, offset=0):
+        """Decodes one message starting at offset into buffer, without copying it out first"""
+        unpacked_data = self.struct.unpack_from(buffer, offset)
+        dictionary = dict(zip(self.keys, unpacked_data))
+
+        for i, key, scale in self.scaled_fields:
+            dictionary[key] = unpacked_data[i] * scale
+        for i, key, function in self.transformed_fields:
+            dictionary[key] = function(unpacked_data[i])
+
+        return dictionary
+
 
 class BaseMessage(object):
     messageData = []
@@ -83,47 +157,36 @@ class BaseMessage(object):
         """
         Base class for a message.
         Contains all the generic logic needed to parse one into a dictionary
+
+        The messageData layout is compiled into a MessageCodec the first time a message class is used, and reused after that
         """
 
-        self.byteOrder = "<"  # Make the string to pass to the struct library
-        for data_point in self.messageData:
-            self.byteOrder += data_point[0]
+        self.codec = self.getCodec()
+
+    @classmethod
+    def getCodec(cls) -> MessageCodec:
+        # Look in this class's own __dict__, so subclasses don't pick up their parent's codec
+        if "_codec" not in cls.__dict__:
+            cls._codec = MessageCodec(cls.messageData)
+        return cls._codec
 
     def parseMessage(self, data):
         """
         Returns a dictionary of values from the binary data in the message
         """
 
-        dictionary = {}
-
-        message_length = struct.calcsize(self.byteOrder)
-        data = data[0:message_length]
-        unpacked_data = struct.unpack(self.byteOrder, data)
-
-        if len(unpacked_data) != len(self.messageData):
-            print("length mismatch")
+        return self.parseMessageFrom(data, 0)
 
-        for i in range(len(self.messageData)):
-            message_line = self.messageData[i]
-
-            if len(message_line) == 2:
-                dictionary[message_line[1]] = unpacked_data[i]
-            else:
-                parse_type = message_line[2]
-                key = message_line[1]
-
-                # Various special options to parse
-                if type(parse_type) == int or type(parse_type) == float:  # If it's a number, just multiply
-                    dictionary[key] = unpacked_data[i] * parse_type
-                elif parse_type == "TIME":  # If its a time, make a time string
-                    dictionary[key] = str(datetime.datetime.fromtimestamp(unpacked_data[i]))
-                elif callable(parse_type):  # If its a function
-                    dictionary[key] = parse_type(unpacked_data[i])
-                else:
-                    print("Unknown parse type")
+    def parseMessageFrom(self, buffer, offset):
+        """
+        Same as parseMessage, but reads the message starting at offset in a larger buffer
+        """
 
-        self.extraParseOptions(data, dictionary)
+        return self.decodeWith(self.codec, buffer, offset)
 
+    def decodeWith(self, codec: MessageCodec, buffer, offset):
+        dictionary = codec.decode(buffer, offset)
+        self.extraParseOptions(buffer, dictionary)
         return dictionary
 
     def extraParseOptions(self, data, dictionary):
@@ -194,19 +257,44 @@ class PositionDataMessage(BaseMessage):
     ]
 
 
-class LineCutterVarsMessage(BaseMessage):
-    """uint8 number state uint32 timestamp float avgAlt avgDeltaAlt uint8 batt bool cut_1 cut_2 uint16 photoresistor"""
+class LineCutterMessageBase(BaseMessage):
+    """Line cutter messages have keys that depend on which line cutter sent them, so there's a codec per line cutter number"""
 
-    def parseMessage(self, data):
-        """We generate the message format after parsing which line cutter this data is for."""
+    codecs = {}
 
-        unpacked_data = struct.unpack("<B", data[0:1])  # Just get the first byte
-        line_cutter_number = unpacked_data[0]
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def makeMessageData(line_cutter_number):
+        raise NotImplementedError()
+
+    @classmethod
+    def getLineCutterCodec(cls, line_cutter_number) -> MessageCodec:
+        if "codecs" not in cls.__dict__:
+            cls.codecs = {}
+        if line_cutter_number not in cls.codecs:
+            cls.codecs[line_cutter_number] = MessageCodec(cls.makeMessageData(line_cutter_number))
+        return cls.codecs[line_cutter_number]
+
+    def parseMessageFrom(self, buffer, offset):
+        """We pick the message format after parsing which line cutter this data is for."""
+
+        line_cutter_number = buffer[offset]  # Just get the first byte
 
         if line_cutter_number > Constants.MAX_LINE_CUTTER_ID_VALID:
             return {}
 
-        self.messageData = [
+        # Parsers are shared between threads, so the codec gets passed along instead of stored on self
+        return self.decodeWith(self.getLineCutterCodec(line_cutter_number), buffer, offset)
+
+
+class LineCutterVarsMessage(LineCutterMessageBase):
+    """uint8 number state uint32 timestamp float avgAlt avgDeltaAlt uint8 batt bool cut_1 cut_2 uint16 photoresistor"""
+
+    @staticmethod
+    def makeMessageData(line_cutter_number):
+        return [
             [UINT_8_TYPE, Constants.line_cutter_number_key],
             [FLOAT_TYPE, Constants.makeLineCutterString(line_cutter_number, "limitVel")],
             [UINT_16_TYPE, Constants.makeLineCutterString(line_cutter_number, "altitude1")],
@@ -221,22 +309,11 @@ class LineCutterVarsMessage(BaseMessage):
             [UINT_32_TYPE, Constants.makeLineCutterString(line_cutter_number, "seaLevelPressure")],
         ]
 
-        super().__init__()
-
-        return super().parseMessage(data)  # Then call the parent parseMessage function like normal
-
 
-class LineCutterMessage(BaseMessage):
-    def parseMessage(self, data):
-        """We generate the message format after parsing which line cutter this data is for."""
-
-        unpacked_data = struct.unpack("<B", data[0:1])  # Just get the first byte
-        line_cutter_number = unpacked_data[0]
-
-        if line_cutter_number > Constants.MAX_LINE_CUTTER_ID_VALID:
-            return {}
-
-        self.messageData = [
+class LineCutterMessage(LineCutterMessageBase):
+    @staticmethod
+    def makeMessageData(line_cutter_number):
+        return [
             [UINT_8_TYPE, Constants.line_cutter_number_key],
             [UINT_8_TYPE, Constants.makeLineCutterString(line_cutter_number, Constants.line_cutter_state_key)],
             [UINT_32_TYPE, Constants.makeLineCutterString(line_cutter_number, Constants.timestamp_ms_key)],
@@ -252,10 +329,6 @@ class LineCutterMessage(BaseMessage):
             [UINT_16_TYPE, Constants.makeLineCutterString(line_cutter_number, Constants.photoresistor_key)],
         ]
 
-        super().__init__()
-
-        return super().parseMessage(data)  # Then call the parent parseMessage function like normal
-
 
 class CLIDataMessageBase(BaseMessage):
     def __init__(self, key):
@@ -272,14 +345,14 @@ class CLIDataMessageBase(BaseMessage):
     def set_last_id_parsed(self, payload_id):
         raise NotImplementedError()
 
-    def parseMessage(self, data):
-        length = data[0]
-        id = data[1]
-        trimmed_data = data[2 : length + 2]
+    def parseMessageFrom(self, buffer, offset):
+        length = buffer[offset]
+        id = buffer[offset + 1]
+        trimmed_data = buffer[offset + 2 : offset + length + 2]
         dictionary = {}
 
         try:
-            string = trimmed_data.decode()
+            string = bytes(trimmed_data).decode()
 
             # Don't parse duplicate keys, lmao
             if self.is_duplicate(id):
@@ -384,10 +457,11 @@ MESSAGE_CALLBACKS: typing.Dict[int, typing.List[typing.Union[str, BaseMessage]]]
 
 
 # Ground station messages
-def parse_ground_station_gps(data, dictionary):
-    data = data[0:33]
+GROUND_STATION_GPS_STRUCT = struct.Struct("<Bfffdd")
 
-    unpacked_data = struct.unpack("<Bfffdd", data)
+
+def parse_ground_station_gps(data, dictionary, offset=0):
+    unpacked_data = GROUND_STATION_GPS_STRUCT.unpack_from(data, offset)
     dictionary[Constants.ground_station_latitude_key] = lat_lon_decimal_minutes_to_decimal_degrees(unpacked_data[1])
     dictionary[Constants.ground_station_longitude_key] = lat_lon_decimal_minutes_to_decimal_degrees(unpacked_data[2])
     dictionary[Constants.ground_station_altitude_key] = unpacked_data[3]
@@ -397,12 +471,76 @@ def parse_ground_station_gps(data, dictionary):
 
 GROUND_STATION_MESSAGE_TYPES = ["Ground Station GPS"]
 
+# Structs for the parts of the packet that are the same for every message type
+HEADER_STRUCT = struct.Struct("<BBBI8s")
+RADIO_STATUS_STRUCT = struct.Struct("<Bb?B")
+HEADER_LENGTH = HEADER_STRUCT.size
+RADIO_STATUS_LENGTH = RADIO_STATUS_STRUCT.size
+
+CALLSIGN_LENGTH = 7
+NON_CALLSIGN_BYTES = bytes(i for i in range(256) if not chr(i).isalnum())  # Everything that gets stripped out of callsigns
+
+RADIO_ID_STRINGS = {0: "433 MHz Radio", 1: "915 MHz Radio"}
+
+# Message objects don't hold any per-packet state, so we only make one of each
+MESSAGE_PARSERS: typing.Dict[int, BaseMessage] = {}
+
+
+def get_message_parser(message_number) -> BaseMessage:
+    if message_number not in MESSAGE_PARSERS:
+        MESSAGE_PARSERS[message_number] = MESSAGE_CALLBACKS[message_number][1]()  # Make instance of message class
+    return MESSAGE_PARSERS[message_number]
+
+
+def parse_radio_status(buffer, offset, dictionary):
+    """Adds the radio id, RSSI, LQI and CRC from the 4 byte trailer at offset.  Returns the CRC"""
+    [radio_id, rssi, crc, lqi] = RADIO_STATUS_STRUCT.unpack_from(buffer, offset)
+
+    if rssi != -128:
+        rssi_text = "{} db".format(rssi - 50)
+    else:
+        rssi_text = "Invalid RSSI"
+
+    dictionary[Constants.radio_id_key] = radio_id
+    dictionary[Constants.radio_id_string] = RADIO_ID_STRINGS.get(radio_id, "Invalid Radio ID")
+    dictionary[Constants.rssi_key] = rssi_text
+    dictionary[Constants.lqi_key] = lqi
+    dictionary[Constants.crc_key] = "Good" if crc else "Bad"
+
+    return crc
+
+
+def get_packet_dtype(codec: MessageCodec = None) -> numpy.dtype:
+    """
+    NumPy dtype for a whole PACKET_LENGTH byte radio packet: header, the message fields from codec, then the radio status trailer.
+    With no codec, the payload is left as raw bytes
+    """
+
+    fields = [
+        ("message_number", "u1", 0),
+        (Constants.software_version_key, "u1", 1),
+        (Constants.serial_number_key, "u1", 2),
+        (Constants.timestamp_ms_key, "<u4", 3),
+        (Constants.callsign_key, "S8", 7),
+    ]
+    if codec is None:
+        fields.append(("payload", "V{}".format(PACKET_LENGTH - HEADER_LENGTH - RADIO_STATUS_LENGTH), HEADER_LENGTH))
+    else:
+        fields += codec.getNumpyFields(HEADER_LENGTH)
+
+    radio_status_offset = PACKET_LENGTH - RADIO_STATUS_LENGTH
+    fields += [
+        (Constants.radio_id_key, "u1", radio_status_offset),
+        ("rssi_raw", "i1", radio_status_offset + 1),
+        (Constants.crc_key, "?", radio_status_offset + 2),
+        (Constants.lqi_key, "u1", radio_status_offset + 3),
+    ]
+
+    return numpy.dtype({"names": [it[0] for it in fields], "formats": [it[1] for it in fields], "offsets": [it[2] for it in fields], "itemsize": PACKET_LENGTH})
+
 
 def parse_fcb_message(data):
     """Will check packet type, and call the required parse function"""
-    dictionary = {}
-    message_number = data[0]
-
     if len(data) < PACKET_LENGTH:
         test = ""
         try:
@@ -410,59 +548,43 @@ def parse_fcb_message(data):
         except:
             pass
         return [False, {}, "Packet too short: {0} of {1} bytes: [{2}]".format(len(data), PACKET_LENGTH, test), 1]
-    elif message_number in MESSAGE_CALLBACKS:
-        # Get CRC, LQI, RSSI data from message (First 4)
-        radio_data = data[-4:]
-        unpacked_radio_status_data = struct.unpack("<Bb?B", radio_data)
-
-        # Add radio stuff
-        radio_id = unpacked_radio_status_data[0]
-        rssi = unpacked_radio_status_data[1]
-        crc = unpacked_radio_status_data[2]
-        lqi = unpacked_radio_status_data[3]
-
-        if rssi != -128:
-            rssi_text = "{} db".format(rssi - 50)
-        else:
-            rssi_text = "Invalid RSSI"
 
-        if radio_id == 0:
-            radio_id_string = "433 MHz Radio"
-        elif radio_id == 1:
-            radio_id_string = "915 MHz Radio"
-        else:
-            radio_id_string = "Invalid Radio ID"
+    # The radio status is always the last 4 bytes of whatever we got
+    return parse_fcb_message_from(data, 0, len(data) - RADIO_STATUS_LENGTH)
+
+
+def parse_fcb_message_from(buffer, offset, radio_status_offset=None):
+    """
+    Parses the packet starting at offset in buffer, without slicing it out first.
+
+    buffer can be bytes, bytearray or a memoryview, and must have at least PACKET_LENGTH bytes after offset
+    """
+
+    dictionary = {}
+    message_number = buffer[offset]
 
-        crc_str = "Good" if crc else "Bad"
+    if radio_status_offset is None:
+        radio_status_offset = offset + PACKET_LENGTH - RADIO_STATUS_LENGTH
 
-        dictionary[Constants.radio_id_key] = radio_id
-        dictionary[Constants.radio_id_string] = radio_id_string
-        dictionary[Constants.rssi_key] = rssi_text
-        dictionary[Constants.lqi_key] = lqi
-        dictionary[Constants.crc_key] = crc_str
+    if message_number in MESSAGE_CALLBACKS:
+        # Get CRC, LQI, RSSI data from message (Last 4)
+        crc = parse_radio_status(buffer, radio_status_offset, dictionary)
 
         # Get the packet header
-        fcb_data = data[0:-4]
-        header_data = fcb_data[0:15]
-        unpacked_header = struct.unpack("<BBBIBBBBBBBB", header_data)
+        unpacked_header = HEADER_STRUCT.unpack_from(buffer, offset)
         dictionary[Constants.software_version_key] = unpacked_header[1]
         dictionary[Constants.serial_number_key] = unpacked_header[2]
         dictionary[Constants.timestamp_ms_key] = unpacked_header[3]
 
-        callsign = ""
-        for i in range(4, 11):
-            if chr(unpacked_header[i]).isalnum():
-                callsign += chr(unpacked_header[i])
-        dictionary[Constants.callsign_key] = callsign.strip()
+        callsign = unpacked_header[4][:CALLSIGN_LENGTH].translate(None, NON_CALLSIGN_BYTES)
+        dictionary[Constants.callsign_key] = callsign.decode("latin-1").strip()
 
-        # Get the rest of the packet
-        raw_packet = fcb_data[15:]
         message_type = MESSAGE_CALLBACKS[message_number][0]  # Get message type
 
         # Parse message
         try:
-            message_object: BaseMessage = MESSAGE_CALLBACKS[message_number][1]()  # Make instance of message class
-            dictionary.update(message_object.parseMessage(raw_packet))  # Run the parse method
+            message_object = get_message_parser(message_number)
+            dictionary.update(message_object.parseMessageFrom(buffer, offset + HEADER_LENGTH))  # Run the parse method on the rest of the packet
             success = True
 
             if "line cutter" in message_type.lower() and Constants.line_cutter_number_key in dictionary:
@@ -470,14 +592,12 @@ def parse_fcb_message(data):
                 message_type += str(line_cutter_number)
         except Exception:
             # print("Could not parse message of type {0}: {1}".format(message_type, e))
-            # print(raw_packet)
             success = False
 
         return [success, dictionary, message_type, crc]
     elif message_number == 200:  # Ground station packet
         try:
-            data = data[0:29]
-            parse_ground_station_gps(data, dictionary)
+            parse_ground_station_gps(buffer, dictionary, offset)
             return [True, dictionary, GROUND_STATION_MESSAGE_TYPES[0], 1]
         except Exception:
             return [False, {}, GROUND_STATION_MESSAGE_TYPES[0], 1]
@@ -0,0 +1,73 @@
+"""
+Benchmark for FCB radio packet parsing
+
+Run with python -m src.Modules.MessageParsing.fcb_message_parsing_benchmark
+Builds a buffer of synthetic packets and reports packets per second for parsing them with parse_fcb_message on a slice of each
+packet, and with parse_fcb_message_from straight out of the buffer, the way the ground station interface does.
+"""
+
+import random
+import struct
+import time
+
+from src.Modules.MessageParsing import fcb_message_parsing
+from src.Modules.MessageParsing.fcb_message_parsing import PACKET_LENGTH
+
+HEADER_LENGTH = 15
+RADIO_TRAILER_LENGTH = 4
+
+# Payloads for the message types that show up in flight, roughly in the ratio they get sent
+SAMPLE_PAYLOADS = {
+    2: lambda: struct.pack("<Bbbbbfffffffffh", 3, 100, 0, 0, 0, *[random.random() for _ in range(9)], 450),
+    3: lambda: struct.pack("<fffffffffIBBB", 20.0, random.random() * 1000, 10.0, 4221.1367, -7105.3671, 100.0, 8.1, 2.0, 90.0, 1690000000, 8, 3, 0),
+    4: lambda: struct.pack("<BBIIfffffHHHH", 1, 2, 1000, 101325, 100.0, 1.0, 2000.0, 9.8, 8.2, 0, 0, 10, 500),
+    6: lambda: struct.pack("<ffffff", 101325.0, 101300.0, 101325.0, 10.0, 20.0, 0.0),
+    7: lambda: struct.pack("<BHB", 0b101, 0, 12),
+}
+MESSAGE_MIX = [2, 2, 2, 3, 3, 4, 6, 7]
+
+
+def make_packet(message_number):
+    header = struct.pack("<BBBI8s", message_number, 1, 2, random.randint(0, 2**31), b"KM6GNL\x00\x00")
+    payload = SAMPLE_PAYLOADS[message_number]()
+    body = (header + payload).ljust(PACKET_LENGTH - RADIO_TRAILER_LENGTH, b"\x00")
+    return body + struct.pack("<Bb?B", random.randint(0, 1), -40, True, 50)
+
+
+def make_packet_buffer(packet_count):
+    return b"".join(make_packet(random.choice(MESSAGE_MIX)) for _ in range(packet_count))
+
+
+def best_time(function, repeats):
+    """Best of a few runs, so one-off hiccups (and the first run warming up caches) don't count"""
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def parse_one_at_a_time(buffer):
+    for offset in range(0, len(buffer), PACKET_LENGTH):
+        fcb_message_parsing.parse_fcb_message(buffer[offset : offset + PACKET_LENGTH])
+
+
+def parse_in_place(buffer):
+    for offset in range(0, len(buffer), PACKET_LENGTH):
+        fcb_message_parsing.parse_fcb_message_from(buffer, offset)
+
+
+def run_benchmark(packet_count=20000, repeats=5):
+    random.seed(0)
+    buffer = make_packet_buffer(packet_count)
+
+    single_time = best_time(lambda: parse_one_at_a_time(buffer), repeats)
+    print(f"parse_fcb_message:      {packet_count / single_time:,.0f} packets/s")
+
+    in_place_time = best_time(lambda: parse_in_place(buffer), repeats)
+    print(f"parse_fcb_message_from: {packet_count / in_place_time:,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    run_benchmark()
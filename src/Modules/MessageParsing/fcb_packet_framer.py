@@ -0,0 +1,142 @@
+"""
+Splits a serial byte stream from the ground station into PACKET_LENGTH byte radio packets.
+
+The stream has no sync word, so frame boundaries are checked with what every packet has in common: a known message number in
+the first byte, and a radio status trailer with a valid radio ID and a 0 or 1 CRC byte.  Payloads are mostly zero padding, so a
+misaligned frame can pass that on its own, and a frame is only trusted once the packet after it checks out too.  The newest frame
+gets held back until the next packet starts arriving, or until flush() is called because the stream went quiet.  If a byte gets
+dropped or corrupted, the framer slides forward one byte at a time until it finds something that looks like a packet again,
+instead of staying misaligned until the port gets reopened.  The packet right before a short one fails the check on the packet
+after it even though it's fine, so it's kept aside, and let out once the framer resyncs if the next good packet doesn't overlap it.
+"""
+
+from src.Modules.MessageParsing.fcb_message_parsing import (
+    MESSAGE_CALLBACKS,
+    PACKET_LENGTH,
+    RADIO_ID_STRINGS,
+    RADIO_STATUS_LENGTH,
+)
+
+GROUND_STATION_MESSAGE_NUMBER = 200
+
+VALID_MESSAGE_NUMBERS = frozenset(list(MESSAGE_CALLBACKS.keys()) + [GROUND_STATION_MESSAGE_NUMBER])
+RADIO_ID_OFFSET = PACKET_LENGTH - RADIO_STATUS_LENGTH
+CRC_OFFSET = RADIO_ID_OFFSET + 2
+
+
+class PacketFramer(object):
+    def __init__(self):
+        self.buffer = bytearray()
+        self.synced = True  # Assume the stream starts on a packet boundary, like it does when the port is opened
+        self.suspect_frame = None  # Last frame before losing sync, that only failed because of the packet after it
+        self.suspect_distance = 0  # Bytes between the start of suspect_frame and where we're looking now
+
+        self.bytes_in = 0
+        self.frames_out = 0
+        self.resyncs = 0
+        self.discarded_bytes = 0
+
+    def frameLooksValid(self, offset):
+        """Checks the message number and trailer of the packet that would start at offset.  Needs a whole packet after offset"""
+        message_number = self.buffer[offset]
+        if message_number not in VALID_MESSAGE_NUMBERS:
+            return False
+        if message_number == GROUND_STATION_MESSAGE_NUMBER:
+            return True  # Ground station packets come straight from the ground station, without a radio status trailer
+
+        return self.buffer[offset + RADIO_ID_OFFSET] in RADIO_ID_STRINGS and self.buffer[offset + CRC_OFFSET] <= 1
+
+    def frameIsConfirmed(self, offset):
+        """
+        Checks that the packet after the one at offset looks valid too, so a short packet doesn't get glued onto the start of the
+        next one.  Returns None if there isn't enough of the next packet here to tell yet
+        """
+        next_offset = offset + PACKET_LENGTH
+        available = len(self.buffer) - next_offset
+        if available >= PACKET_LENGTH:
+            return self.frameLooksValid(next_offset)
+        if not self.synced or available == 0:
+            return None  # Coming out of a resync, wait for the whole next packet.  Otherwise its first byte is enough
+
+        return self.buffer[next_offset] in VALID_MESSAGE_NUMBERS
+
+    def addData(self, data):
+        """
+        Adds newly read bytes, and returns every complete packet now available as one bytearray of back to back packets
+        (empty if there aren't any).  Partial packets are kept until the rest comes in
+        """
+        self.buffer += data
+        self.bytes_in += len(data)
+
+        offset = 0
+        frame_start = 0
+        frame_end = 0
+        frames = bytearray()
+        while len(self.buffer) - offset >= PACKET_LENGTH:
+            if self.frameLooksValid(offset):
+                confirmed = self.frameIsConfirmed(offset)
+                if confirmed is None:
+                    break  # Wait for more data
+                if confirmed:
+                    if offset != frame_end:  # Packets between here and the last run of good ones were dropped, copy that run out
+                        frames += self.buffer[frame_start:frame_end]
+                        frame_start = offset
+                    if self.suspect_frame is not None:
+                        if self.suspect_distance >= PACKET_LENGTH:  # Doesn't run into this packet, so it was the one after it that was bad
+                            frames += self.suspect_frame
+                            self.frames_out += 1
+                            self.discarded_bytes -= PACKET_LENGTH
+                        self.suspect_frame = None
+                    offset += PACKET_LENGTH
+                    frame_end = offset
+                    self.frames_out += 1
+                    self.synced = True
+                    continue
+                if self.synced:
+                    self.suspect_frame = bytes(self.buffer[offset : offset + PACKET_LENGTH])
+                    self.suspect_distance = 0
+
+            if self.synced:
+                self.resyncs += 1
+                self.synced = False
+            self.discarded_bytes += 1
+            self.suspect_distance += 1
+            offset += 1
+
+        frames += self.buffer[frame_start:frame_end]
+        del self.buffer[:offset]
+        return frames
+
+    def flush(self):
+        """
+        Returns the packet held back waiting for the next one to start, for when the stream goes quiet and nothing is coming to
+        check it against.  Only while synced, frames found while resyncing keep waiting for the packet after them
+        """
+        if not self.hasHeldFrame() or not self.synced or not self.frameLooksValid(0):
+            return bytearray()
+
+        frame = self.buffer[:PACKET_LENGTH]
+        del self.buffer[:PACKET_LENGTH]
+        self.frames_out += 1
+        return frame
+
+    def hasHeldFrame(self):
+        return len(self.buffer) >= PACKET_LENGTH
+
+    def getBytesNeeded(self):
+        """Smallest read that could finish the next packet, or let a held one out"""
+        return max(PACKET_LENGTH - len(self.buffer), 1)
+
+    def reset(self):
+        """Throws out any partial packet, for when the port gets reopened.  Counters are kept"""
+        self.buffer.clear()
+        self.synced = True
+        self.suspect_frame = None
+
+    def getCounters(self):
+        return {
+            "Bytes in": self.bytes_in,
+            "Frames out": self.frames_out,
+            "Resyncs": self.resyncs,
+            "Discarded bytes": self.discarded_bytes,
+        }
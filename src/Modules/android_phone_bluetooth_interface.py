@@ -60,6 +60,7 @@ class AndroidPhoneBluetoothInterface(ThreadedModuleCore):
         self.bluetooth_running = False
 
         self.client_sock_list = []
+        self.spin_period = 1
 
         self.connection_thread = threading.Thread(target=self.advertise_bluetooth)
         self.connection_thread.setDaemon(True)  # Means the thread dies when the main thread exits
@@ -90,8 +91,6 @@ class AndroidPhoneBluetoothInterface(ThreadedModuleCore):
                 # time, lat, lon, fix quality, satellites, hdop, alt, alt_unit, height above wgs84, height unit, DGPS time, DGPS station
                 msg = pynmea2.GGA("GP", "GGA", (time_str, lat_min, lat_sign, lon_min, lon_sign, "1", "04", "2.6", str(altitude), "M", "0", "M", "", "0000"))
                 self.send_bluetooth(str(msg))
-
-            time.sleep(1)
         except Exception:
             pass
 
@@ -1,7 +1,9 @@
 import socket
+import struct
 import time
 
 from src.Modules.ground_station_data_interface import GroundStationDataInterface
+from src.Modules.MessageParsing import fcb_message_parsing
 from src.Modules.MessageParsing.fcb_message_generation import createCLICommandPacket
 
 HOST = "127.0.0.1"  # The server's hostname or IP address
@@ -20,6 +22,7 @@ class LocalSimulationFlightInterface(GroundStationDataInterface):
         self.cli_queue = []
 
         self.log_to_file = False
+        self.spin_period = 0  # recv() already blocks until the simulation sends something
 
     def onRadioSwitch(self, data):
         pass
@@ -58,7 +61,9 @@ class LocalSimulationFlightInterface(GroundStationDataInterface):
 
         try:
             data = self.recv_size()
-            self.parseData(data)
+            self.handleParseResult(*fcb_message_parsing.parse_fcb_message(data))
+        except struct.error as e:
+            self.logger.warning("Can't parse message (length: {1} bytes):\n{0}".format(e, len(data)))
         except Exception as e:
             self.logger.error("Couldn't parse local simulation message: {0}, closing connection".format(e))
             self.enabled = False
@@ -12,6 +12,8 @@ from src.Device_Drivers.nmea_gps_driver import GPSDriver
 from src.Modules.DataInterfaceTools.diagnostics_box_helper import DiagnosticsBoxHelper
 from src.Modules.module_core import ThreadedModuleCore
 
+SERIAL_READ_TIMEOUT = 0.5  # Longest a read blocks waiting for data, so the timeout checks still run without data
+
 
 @dataclass
 class EggPacketDescription:
@@ -48,6 +50,8 @@ class EggFinderRadioInterface(ThreadedModuleCore):
         self.serial_port = ""
         self.baud_rate = 9600
         self.last_data_time = time.time()
+        self.serial = None
+        self.spin_period = SERIAL_READ_TIMEOUT  # Only matters while disconnected, connectedLoop blocks on the serial port
 
         self.connected = False
         self.has_data = False
@@ -85,13 +89,25 @@ class EggFinderRadioInterface(ThreadedModuleCore):
     def changeActiveSerialPort(self, port_name):
         self.serial_port = port_name
         self.connected = False
+        self.nextCheckTime = time.time()
+        self.wakeUp()
+
+    def wakeUp(self):
+        super().wakeUp()
+
+        # Cancel the read connectedLoop is blocked on, so it sees the change right away
+        try:
+            if self.serial is not None and self.serial.is_open:
+                self.serial.cancel_read()
+        except Exception:
+            pass
 
     def spin(self):
         # TODO: Break serial logic out into base class
         if self.nextCheckTime <= time.time():
             self.logger.info(f"Trying to connect to egg finder on {self.serial_port}")
             try:
-                self.serial = serial.Serial(self.serial_port, self.baud_rate, timeout=0.01)  # Set the serial port timeout really small, so we only get one message at a time
+                self.serial = serial.Serial(self.serial_port, self.baud_rate, timeout=SERIAL_READ_TIMEOUT)
                 self.connected = True
                 self.connectedLoop()
                 self.nextCheckTime = time.time() + 1
@@ -109,21 +125,23 @@ class EggFinderRadioInterface(ThreadedModuleCore):
         self.last_data_time = time.time()
         try:
             while self.connected and self.should_be_running and self.enabled:
-                self.readData()
+                got_data = self.readData()  # Blocks until data comes in, the read times out, or wakeUp() is called
                 self.updateEveryLoop()
                 if time.time() - self.last_data_time > 5:  # Timeout checks on any data, not just good data
                     self.logToConsoleThrottle(f"Egg finder on port {self.serial_port} timed out", logging.ERROR, 1)
                     self.has_data = False
-                time.sleep(0.01)
+                self.recordWakeUp(idle=not got_data)
             self.logger.error(f"Disconnected from egg finder on port {self.serial_port}")
         except IOError:
             self.logger.error(f"Lost connection to egg finder on port {self.serial_port}")
             self.connected = False
 
     def readData(self):
-        raw_bytes = self.serial.read(1000)  # Read in bytes
+        """Reads whatever data is waiting.  Returns False if the read timed out without getting anything"""
+        raw_bytes = self.serial.read(1)  # Wait for the first byte
         if len(raw_bytes) == 0:  # If it didn't send a message, we don't parse
-            return
+            return False
+        raw_bytes += self.serial.read(self.serial.in_waiting)  # Then grab everything else that came in with it
 
         self.last_data_time = time.time()
 
@@ -139,7 +157,8 @@ class EggFinderRadioInterface(ThreadedModuleCore):
                 self.parsePackets(split_data[0:-1])
         except Exception as e:
             self.logger.warn(f"Could not decode egg finder string: {e}")
-            return
+
+        return True
 
     def parsePackets(self, packets: List[str]):
         packets = [packet.strip() for packet in packets]
@@ -3,20 +3,14 @@ import time
 from src.constants import Constants
 from src.Modules.DataInterfaceTools.annunciator_helper import AnnunciatorHelper
 from src.Modules.DataInterfaceTools.diagnostics_box_helper import DiagnosticsBoxHelper
+from src.Modules.DataInterfaceTools.fcb_data_filter import FCBDataFilter
 from src.Modules.DataInterfaceTools.gps_position_filter import GPSPositionFilter
-from src.Modules.DataInterfaceTools.median_filter import MedianFilter
 from src.Modules.MessageParsing.fcb_message_parsing import (
     get_fcb_state_from_state_num,
     is_ground_station_message,
 )
 from src.Modules.module_core import ThreadedModuleCore
 
-KEYS_TO_FILTER = [
-    Constants.altitude_key,
-    Constants.vertical_speed_key,
-    Constants.fcb_battery_voltage,
-]
-
 
 class FCBDataInterfaceCore(ThreadedModuleCore):
     """
@@ -42,13 +36,8 @@ class FCBDataInterfaceCore(ThreadedModuleCore):
 
         self.annunciator = AnnunciatorHelper()
         self.diagnostics_box_helper = DiagnosticsBoxHelper(self.module_name)
-        self.vehicle_position_filter = GPSPositionFilter("FCB")
+        self.fcb_data_filter = FCBDataFilter("FCB")
         self.ground_station_position_filter = GPSPositionFilter("Ground Station")
-        self.fcb_state_filter = MedianFilter()
-
-        self.filter_dictionary = {}  # Add a filter for each key that we want to filter
-        for key in KEYS_TO_FILTER:
-            self.filter_dictionary[key] = MedianFilter()
 
     def spin(self):
         self.connected = False
@@ -73,15 +62,8 @@ class FCBDataInterfaceCore(ThreadedModuleCore):
 
         # Most of this data only updates if we have a good crc
         if self.good_radio_crc or update_on_bad_crc:
-            # Special parse operations to deal with filtering lat and lon data
-            if Constants.latitude_key in dictionary and Constants.longitude_key in dictionary:  # If dictionary contains vehicle gps position, filter it
-                self.vehicle_position_filter.new_gps_coords(dictionary[Constants.latitude_key], dictionary[Constants.longitude_key])
-                [new_lat, new_lon] = self.vehicle_position_filter.get_filtered_position_output()
-                dictionary[Constants.latitude_key] = new_lat
-                dictionary[Constants.longitude_key] = new_lon
-
-                if Constants.ground_speed_key not in dictionary:
-                    dictionary[Constants.ground_speed_key] = self.vehicle_position_filter.get_filtered_speed_output()
+            # Filter vehicle position, altitude, FCB state and so on
+            self.fcb_data_filter.filterData(dictionary)
 
             # Filter ground station lat and lon
             if Constants.ground_station_latitude_key in dictionary and Constants.ground_station_longitude_key in dictionary:
@@ -96,29 +78,6 @@ class FCBDataInterfaceCore(ThreadedModuleCore):
                 dictionary[Constants.ground_station_latitude_key] = new_lat
                 dictionary[Constants.ground_station_longitude_key] = new_lon
 
-            # Loop through the dictionary of median filters, and filter each data point if it exists
-            for key_to_filter in self.filter_dictionary:
-                if key_to_filter in dictionary:
-                    filter_object = self.filter_dictionary[key_to_filter]
-                    filter_object.new_data(dictionary[key_to_filter])
-                    dictionary[key_to_filter] = filter_object.get_filtered_data_output()
-
-            # Filter the FCB state, and update the FCB state text
-            if Constants.fcb_state_number_key in dictionary:
-                self.fcb_state_filter.new_data(dictionary[Constants.fcb_state_number_key])
-                dictionary[Constants.fcb_state_number_key] = int(self.fcb_state_filter.get_filtered_data_output())
-                dictionary[Constants.fcb_state_key] = get_fcb_state_from_state_num(dictionary[Constants.fcb_state_number_key])
-
-            # We want a rssi value without the "db" text at the end for plotting
-            if Constants.rssi_key in dictionary:
-                rssi_val = str(dictionary[Constants.rssi_key])
-                if " db" in rssi_val:
-                    rssi_val = rssi_val.strip(" db")
-                    try:
-                        dictionary[Constants.rssi_val_key] = float(rssi_val)
-                    except ValueError:
-                        pass
-
             self.data_dictionary.update(dictionary)
 
             if not is_ground_station_message(message_type):
@@ -148,7 +107,7 @@ class FCBDataInterfaceCore(ThreadedModuleCore):
         else:
             self.annunciator.setAnnunciator(2, "Good FCB Data", 0, "FCB data current")
 
-        if self.vehicle_position_filter.has_gps_data():
+        if self.fcb_data_filter.vehicle_position_filter.has_gps_data():
             self.annunciator.setAnnunciator(3, "FCB GPS Fix", 0, "Valid GPS Fix")
         else:
             self.annunciator.setAnnunciator(3, "FCB GPS Fix", 1, "No GPS Fix")
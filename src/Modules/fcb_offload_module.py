@@ -1,22 +1,32 @@
 import os
+import threading
 import time
 from os import listdir
 from os.path import isfile, join
-from typing import Dict, List
+from typing import Dict, Tuple
 
-import pandas as pd
+import numpy
 
 from src.constants import Constants
 from src.data_helpers import quaternion_to_euler_angle
 from src.Modules.DataInterfaceTools.comms_console_helper import CommsConsoleHelper
+from src.Modules.DataInterfaceTools.recorded_run import RecordedRun
+from src.Modules.DataInterfaceTools.replay_engine import ReplayEngine
 from src.Modules.MessageParsing.fcb_message_parsing import (
     lat_lon_decimal_minutes_to_decimal_degrees,
 )
 from src.Modules.module_core import ThreadedModuleCore
 from src.python_avionics.exceptions import SerialPortDisconnectedError
 from src.python_avionics.model.fcb_cli import FcbCli
+from src.python_avionics.model.offload_csv_cache import (
+    read_csv_cached,
+    read_csv_columns,
+)
 from src.python_avionics.model.serial_port import SerialPort
 
+IDLE_SPIN_PERIOD = 0.5  # Only needs to retry the serial connection, commands wake the thread up
+REPLAY_KEYS = ["gps_lat", "gps_long", "pos_z", "gps_alt", "vel_z", "q_w", "q_x", "q_y", "q_z"]  # Offload columns replay sends to the GUI
+
 
 class FCBOffloadModule(ThreadedModuleCore):
     def __init__(self):
@@ -27,10 +37,11 @@ class FCBOffloadModule(ThreadedModuleCore):
 
         self.serial_port_name = ""
         self.serial_connection = False
-        self.python_avionics_fcb_cli = FcbCli(None)
+        self.python_avionics_fcb_cli = FcbCli(None, offload_progress_cb=self.onOffloadProgress)
         self.updatePythonAvionicsSerialPort()
 
         self.command_queue = []
+        self.command_thread = None  # Commands (like multi-minute offloads) run here, so this thread can keep spinning
 
         self.serial_devices["FCB USB Connection"] = self.changeActiveSerialPort
 
@@ -38,11 +49,20 @@ class FCBOffloadModule(ThreadedModuleCore):
 
         self.cliConsole = CommsConsoleHelper(Constants.new_usb_cli_message_key)
 
-        self.replay_dict: Dict[str, List[float]] = None
+        self.replay_dict: Dict[str, Tuple[numpy.ndarray, numpy.ndarray]] = None  # Just the REPLAY_KEYS columns, so they can't get evicted mid-replay
         self.replay_idx: int = 0
         self.replay_len = 0
         self.replay_name_to_path = {}
 
+        # Schedules offload rows by their timestamps, and gives us the speed/pause/seek controls
+        self.replay = ReplayEngine("FCB Offload Replay", on_change=self.wakeUp)
+        self.reconfigure_options_dictionary[self.replay.getPageName()] = self.replay.getDataStructure()
+        reconfigure_callbacks = self.replay.getReconfigureCallbacks(Constants.primary_reconfigure)
+        for callback in reconfigure_callbacks:
+            self.callback_handler.addCallback(callback, reconfigure_callbacks[callback])
+
+        self.spin_period = IDLE_SPIN_PERIOD
+
     def changeActiveSerialPort(self, portName):
         self.serial_port_name = portName
         self.serial_connection = False
@@ -86,35 +106,33 @@ class FCBOffloadModule(ThreadedModuleCore):
             self.command_queue.append(command)
         else:
             self.cliConsole.manualAddEntry("FCB USB offload module not enabled, can not run commands", False)
+        self.wakeUp()
 
     def getOffloadKey(self, key):
         return self.replay_dict[f"offload_{key}"][0][self.replay_idx]
 
+    def isCommandRunning(self):
+        return self.command_thread is not None and self.command_thread.is_alive()
+
     def spin(self):
-        if not self.serial_connection:
+        # Don't touch the serial port while a command is using it
+        if not self.serial_connection and not self.isCommandRunning():
             self.updatePythonAvionicsSerialPort()
 
-        if len(self.command_queue) > 0:
+        # Commands run one at a time, since they all share the serial port
+        if len(self.command_queue) > 0 and not self.isCommandRunning():
             command = self.command_queue.pop(0)
             self.cliConsole.manualAddEntry(command, False)
             self.data_dictionary[Constants.cli_interface_usb_command_running] = True
-            ret = self.runCLICommand(command)
-
-            if ret is not None:
-                if "Available flights to offload" in ret:  # Check and see if we have a list of flights, and update the database dictionary
-                    self.data_dictionary[Constants.cli_flights_list_key] = ret
-
-                self.cliConsole.autoAddEntry(ret, True)
-
-            # Report command done by broadcasting the result string, and also setting running back to false
-            self.callback_handler.requestCallback(Constants.cli_interface_usb_result_key, ret)
-            self.data_dictionary[Constants.cli_interface_usb_command_running] = False
+            self.command_thread = threading.Thread(target=self.runCommandInBackground, args=[command], name="FCBOffloadCommand", daemon=True)
+            self.command_thread.start()
 
         # Hack recorded data directly into the GUI pretending like it's full rate telemetry
         if self.replay_dict is not None:
-            if self.replay_idx >= self.replay_len:
-                self.replay_dict = None
-            else:
+            # The GUI only keeps the newest value of each key, so only the last row that's due needs to be sent
+            due_rows = self.replay.getDuePackets()
+            if len(due_rows) > 0:
+                self.replay_idx = due_rows[-1]
                 # create a dict from recorded data
                 # This is SUCH A HACK. at each key we have a (data, time) array
                 lat = self.getOffloadKey("gps_lat")
@@ -149,20 +167,38 @@ class FCBOffloadModule(ThreadedModuleCore):
                 }
                 self.data_dictionary.update(dictionary)
 
-            self.replay_idx += 1
-            time.sleep(0.015)
-        else:
-            time.sleep(0.1)
+            # Keep the replay around after it finishes, so it can be seeked back into
+            replay_wait = self.replay.getTimeUntilNextPacket()
+            self.spin_period = IDLE_SPIN_PERIOD if replay_wait is None else min(replay_wait, IDLE_SPIN_PERIOD)
 
     def runsEveryLoop(self):
         self.data_dictionary[Constants.cli_interface_usb_command_key] = self.cliConsole.getList()
 
+    def runCommandInBackground(self, command):
+        ret = self.runCLICommand(command)
+
+        if ret is not None:
+            if "Available flights to offload" in ret:  # Check and see if we have a list of flights, and update the database dictionary
+                self.data_dictionary[Constants.cli_flights_list_key] = ret
+
+            self.cliConsole.autoAddEntry(ret, True)
+
+        # Report command done by broadcasting the result string, and also setting running back to false
+        self.callback_handler.requestCallback(Constants.cli_interface_usb_result_key, ret)
+        self.data_dictionary[Constants.cli_interface_usb_command_running] = False
+
+        self.wakeUp()  # Start the next command, if there is one
+
+    def onOffloadProgress(self, progress):
+        """Called from the command thread while an offload transfer runs"""
+        self.data_dictionary[Constants.cli_offload_progress_key] = str(progress)
+
     def runCLICommand(self, command):
         """Function to tell python_avionics to run the cli command, and handle states where the serial port isn't open"""
         if self.serial_connection:
             try:
                 ret = self.python_avionics_fcb_cli.run_command(command)
-                print(f"Successfully ran {command}")
+                print(f"Successfully ran {command} in {self.python_avionics_fcb_cli.last_command_time_s:.3f} s")
                 return ret
             except (IOError, SerialPortDisconnectedError) as e:
                 self.serial_connection = False
@@ -176,9 +212,7 @@ class FCBOffloadModule(ThreadedModuleCore):
         """
         Override this function to allow us to return the database dict while disabled
         """
-        temporary_dict = self.data_dictionary.copy()
-        self.data_dictionary = {}
-        return temporary_dict
+        return self.data_dictionary.drain()
 
     def runOnEnableAndDisable(self):
         if not self.enabled:
@@ -209,27 +243,18 @@ class FCBOffloadModule(ThreadedModuleCore):
             if key is not run_name:
                 self.recorded_data_dictionary[key] = {}
 
-        # Actually load the data file
-        df = pd.read_csv(self.replay_name_to_path[run_name], index_col=0)
-
-        if "timestamp_s" in df:
-            time_series = df["timestamp_s"]  # no longer /1000
-        elif "timestamp_ms" in df:
-            time_series = df["timestamp_ms"] / 1000
-        else:
+        # Only read the header now.  The data gets read when a widget actually asks for a column
+        offload_csv = OffloadCsv(self.replay_name_to_path[run_name])
+        columns = offload_csv.getColumns()
+        if "timestamp_s" not in columns and "timestamp_ms" not in columns:
             self.logger.error(f"No time series in run {run_name}?")
             return
-        time_series = time_series - time_series.iloc[0]
 
-        for key in df.keys():
-            key = str(key)
-            # Filter out IMU and high-g accelerometer raw count columns
-            if ("imu" in key and "_real" not in key) or ("high_g" in key and "_real" not in key):
-                continue
+        # Filter out IMU and high-g accelerometer raw count columns
+        columns = [key for key in columns if not (("imu" in key and "_real" not in key) or ("high_g" in key and "_real" not in key))]
 
-            # Put column into our data dictionary prefixed with offload_
-            self.recorded_data_dictionary[run_name]["offload_" + key] = [list(df[key]), list(time_series)]
-        self.recorded_data_dictionary[run_name]["keys"] = df.keys()
+        # Put columns into our data dictionary prefixed with offload_
+        self.recorded_data_dictionary[run_name] = RecordedRun(["offload_" + key for key in columns], lambda key: offload_csv.loadColumn(key[len("offload_") :]))
 
         return super().getSpecificRun(run_name)
 
@@ -237,6 +262,42 @@ class FCBOffloadModule(ThreadedModuleCore):
         """
         Reset this widget's internal state in order to translate a FCB log file into the GUI
         """
-        self.replay_dict = self.recorded_data_dictionary[run_name]
+        run = self.recorded_data_dictionary[run_name]
+        missing_keys = [key for key in REPLAY_KEYS if "offload_" + key not in run]
+        if missing_keys:
+            self.logger.error(f"Can't replay run {run_name}, it doesn't have {missing_keys}")
+            self.replay_dict = None
+            return
+
+        self.replay_dict = {"offload_" + key: run["offload_" + key] for key in REPLAY_KEYS}
         self.replay_idx = 0
-        self.replay_len = len(list(self.replay_dict.values())[0][0])
+
+        # Every offload column has the same time series, so any of them works as the timestamp index
+        time_series = self.replay_dict["offload_" + REPLAY_KEYS[0]][1]
+        self.replay_len = len(time_series)
+        self.replay.setPacketTimes(time_series)  # Wakes us up
+
+
+class OffloadCsv(object):
+    """Hands out single columns of an offload CSV as NumPy arrays, read through the offload CSV cache"""
+
+    def __init__(self, path):
+        self.path = path
+        self.time_series = None
+        self.lock = threading.Lock()
+
+    def getColumns(self):
+        return read_csv_columns(self.path)[1:]  # First column is the index
+
+    def loadColumn(self, key):
+        """Returns [data_series, time_series].  Every column shares the same time series array"""
+        with self.lock:
+            if self.time_series is None:
+                columns = self.getColumns()
+                if "timestamp_s" in columns:
+                    time_series = read_csv_cached(self.path, ["timestamp_s"])["timestamp_s"].to_numpy(dtype=float)  # no longer /1000
+                else:
+                    time_series = read_csv_cached(self.path, ["timestamp_ms"])["timestamp_ms"].to_numpy(dtype=float) / 1000
+                self.time_series = time_series - time_series[0]
+
+        return [read_csv_cached(self.path, [key])[key].to_numpy(), self.time_series]
@@ -1,5 +1,4 @@
 import logging
-import struct
 import time
 
 import serial
@@ -8,6 +7,10 @@ import serial.tools.list_ports
 from src.constants import Constants
 from src.CustomLogging.dpf_logger import SerialLogger
 from src.Modules.DataInterfaceTools.comms_console_helper import CommsConsoleHelper
+from src.Modules.DataInterfaceTools.radio_link_stream import (
+    BestPacketMerger,
+    RadioLinkStream,
+)
 from src.Modules.DataInterfaceTools.reconfigure_helper import ReconfigurePage
 from src.Modules.fcb_data_interface_core import FCBDataInterfaceCore
 from src.Modules.MessageParsing import fcb_message_parsing
@@ -15,10 +18,16 @@ from src.Modules.MessageParsing.fcb_message_generation import (
     createCLICommandMessage,
     createRadioBandCommandMessage,
 )
+from src.Modules.MessageParsing.fcb_packet_framer import PacketFramer
 
 RADIO_433 = 0
 RADIO_915 = 1
 RADIO_NAMES = {RADIO_433: "433 MHz", RADIO_915: "915 MHz"}
+RADIO_LINK_ANNUNCIATOR_INDEX = 6  # Per radio link annunciators go after the ones FCBDataInterfaceCore sets
+
+SERIAL_READ_TIMEOUT = 0.5  # Longest a read blocks waiting for a packet, so timeouts and the annunciators still update without data
+QUEUED_WRITE_INTERVAL = 0.01  # Time between messages when there's more than one waiting to go out
+HELD_PACKET_TIMEOUT = 0.05  # Longest the framer holds a packet back waiting for the next one to start, before letting it out anyway
 
 
 class GroundStationDataInterface(FCBDataInterfaceCore):
@@ -32,6 +41,9 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
         self.nextCheckTime = time.time()
         self.serial_port = ""
         self.baud_rate = 9600
+        self.serial = None
+        self.framer = PacketFramer()
+        self.spin_period = SERIAL_READ_TIMEOUT  # Only matters while disconnected, connectedLoop blocks on the serial port
 
         if is_connected_to_radio:
             self.active_radio = self.config_saver.get("active_radio", RADIO_433, int)
@@ -45,6 +57,11 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
             else:
                 self.active_radio_bands[radio_id] = 0
 
+        # Receiving on all radios keeps every radio's packets in its own stream, and merges the best copy of each into the main one
+        self.receive_all_radios = is_connected_to_radio and str(self.config_saver.get("receive_all_radios", False)).lower() == "true"
+        self.radio_streams = {radio_id: RadioLinkStream(radio_id, RADIO_NAMES[radio_id]) for radio_id in RADIO_NAMES}
+        self.packet_merger = BestPacketMerger()
+
         self.outgoing_serial_queue = []
 
         self.serial_logger = SerialLogger(self.__class__.__name__)
@@ -56,9 +73,14 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
         self.radio_reconfigure_page = ReconfigurePage("Serial Ground Station Config")
         self.radio_reconfigure_page.addEnumOption("radio_types", "433 MHz", RADIO_433)
         self.radio_reconfigure_page.addEnumOption("radio_types", "915 MHz", RADIO_915)
-        self.radio_reconfigure_page.updateLine("Target Radio", "enum", str(self.active_radio), "Which radio to use", "radio_types")
+        self.radio_reconfigure_page.updateLine("Target Radio", "enum", str(self.active_radio), "Which radio to send commands on, and receive on unless receiving on all radios", "radio_types")
         self.radio_reconfigure_page.bindCallback("Target Radio", self.onRadioSwitch)
 
+        self.radio_reconfigure_page.addEnumOption("receive_modes", "Target radio only", False)
+        self.radio_reconfigure_page.addEnumOption("receive_modes", "All radios", True)
+        self.radio_reconfigure_page.updateLine("Receive On", "enum", str(self.receive_all_radios), "Receive on just the target radio, or on all radios at once", "receive_modes")
+        self.radio_reconfigure_page.bindCallback("Receive On", self.onReceiveModeSwitch)
+
         self.radio_reconfigure_page.updateLine("Radio Band", "int", self.active_radio_bands[self.active_radio], "Which radio band to use")
         self.radio_reconfigure_page.bindCallback("Radio Band", self.onBandSwitch)
 
@@ -73,15 +95,29 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
     def changeActiveSerialPort(self, portName):
         self.serial_port = portName
         self.connected = False
+        self.nextCheckTime = time.time()
+        self.wakeUp()
+
+    def wakeUp(self):
+        super(GroundStationDataInterface, self).wakeUp()
+
+        # Cancel the read connectedLoop is blocked on, so it sees the change right away
+        try:
+            if self.serial is not None and self.serial.is_open:
+                self.serial.cancel_read()
+        except Exception:
+            pass
 
     def cliCommand(self, data):
         self.cliConsole.manualAddEntry(data)
         self.outgoing_serial_queue.append(createCLICommandMessage(self.active_radio, data))
+        self.wakeUp()
 
     def onBandSwitch(self, data):
         try:
             data = int(data)
             self.outgoing_serial_queue.append(createRadioBandCommandMessage(0xFF, self.active_radio, data))
+            self.wakeUp()
             self.logger.info("Switching to band {}".format(data))
             self.logMessageToFile("Switching radio to band", str(data))
             self.serial_logger.write_raw(f"Switching radio to band {data}")
@@ -112,11 +148,18 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
         else:
             self.logger.warning("Unknown radio id {}".format(data))
 
+    def onReceiveModeSwitch(self, data):
+        self.receive_all_radios = str(data).lower() == "true"
+        self.logger.info("Receiving on {}".format("all radios" if self.receive_all_radios else "the target radio only"))
+        self.radio_reconfigure_page.updateLine("Receive On", "enum", str(self.receive_all_radios), config="receive_modes")
+        self.config_saver.save("receive_all_radios", self.receive_all_radios)
+
     def spin(self):
         if self.nextCheckTime <= time.time():
             self.logger.info("Trying to connect to ground station on {}".format(self.serial_port))
             try:
-                self.serial = serial.Serial(self.serial_port, self.baud_rate, timeout=0.01)  # Set the serial port timeout really small, so we only get one message at a time
+                self.serial = serial.Serial(self.serial_port, self.baud_rate, timeout=SERIAL_READ_TIMEOUT)  # Reads return as soon as a whole message is in
+                self.framer.reset()
                 self.connected = True
                 self.onRadioSwitch(self.active_radio)
                 self.onBandSwitch(self.active_radio_bands[self.active_radio])
@@ -137,63 +180,83 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
         self.last_data_time = time.time()
         try:
             while self.connected and self.should_be_running and self.enabled:
-                self.readData()
+                got_data = self.readData()  # Blocks until a message comes in, the read times out, or wakeUp() is called
                 self.writeData()
                 self.updateEveryEnabledLoop()
                 if time.time() - self.last_data_time > 5:  # Timeout checks on any data, not just good data
                     self.logToConsoleAndCheck("Ground station on port {} timed out".format(self.serial_port), logging.ERROR)
                     self.has_data = False
                     self.good_fcb_data = False
-                time.sleep(0.01)
+                self.recordWakeUp(idle=not got_data)
             self.logger.error("Disconnected from ground station on port {}".format(self.serial_port))
         except IOError:
             self.logger.error("Lost connection to ground station on port {}".format(self.serial_port))
             self.connected = False
 
-    def parseData(self, raw_bytes):
-        try:
-            [success, dictionary, message_type, crc] = fcb_message_parsing.parse_fcb_message(raw_bytes)
-
-            if Constants.radio_id_key in dictionary and dictionary[Constants.radio_id_key] != self.active_radio:  # Data coming in over the wrong radio
-                return
-
-            if Constants.cli_string_key in dictionary:
-                self.cliConsole.autoAddEntry(dictionary[Constants.cli_string_key], from_remote=True)
-
-            if not success:
-                self.logger.warning("Could not parse message: {0}".format(message_type))
-                self.logMessageToFile(message_type, "Could not parse message")
-                self.good_fcb_data = False
-            elif not crc:
-                self.logger.warning("Bad CRC for {} message".format(message_type))
-                self.logMessageToFile(message_type, dictionary)
-                self.handleParsedData(message_type, dictionary, update_on_bad_crc=False)
-            else:
-                self.logger.info("New [{0}] message".format(message_type))
-                self.logMessageToFile(message_type, dictionary)
-                self.handleParsedData(message_type, dictionary)
+    def handleParseResult(self, success, dictionary, message_type, crc):
+        """Handles one [success, dictionary, message_type, crc] from the message parser"""
+        radio_id = dictionary.get(Constants.radio_id_key)
+        if self.receive_all_radios and radio_id in self.radio_streams:
+            if success:
+                radio_stream = self.radio_streams[radio_id]
+                self.data_dictionary.update(radio_stream.handlePacket(dictionary, crc))
+                if not self.packet_merger.isBestCopy(message_type, dictionary, crc):  # Already got this packet on another radio
+                    return
+                radio_stream.merged_count += 1
+        elif radio_id is not None and radio_id != self.active_radio:  # Data coming in over the wrong radio
+            return
 
-            if not fcb_message_parsing.is_ground_station_message(message_type):
-                self.has_data = True
+        if Constants.cli_string_key in dictionary:
+            self.cliConsole.autoAddEntry(dictionary[Constants.cli_string_key], from_remote=True)
+
+        if not success:
+            self.logger.warning("Could not parse message: {0}".format(message_type))
+            self.logMessageToFile(message_type, "Could not parse message")
+            self.good_fcb_data = False
+        elif not crc:
+            self.logger.warning("Bad CRC for {} message".format(message_type))
+            self.logMessageToFile(message_type, dictionary)
+            self.handleParsedData(message_type, dictionary, update_on_bad_crc=False)
+        else:
+            self.logger.info("New [{0}] message".format(message_type))
+            self.logMessageToFile(message_type, dictionary)
+            self.handleParsedData(message_type, dictionary)
 
-        except struct.error as e:
-            self.logger.warning("Can't parse message (length: {1} bytes):\n{0}".format(e, len(raw_bytes)))
+        if not fcb_message_parsing.is_ground_station_message(message_type):
+            self.has_data = True
 
     def readData(self):
-        raw_bytes = self.serial.read(fcb_message_parsing.PACKET_LENGTH)  # Read in bytes
-        if len(raw_bytes) == 0:  # If it didn't send a message, we don't parse
-            return
-
-        # self.parseData(raw_bytes)
+        """Reads and parses whatever messages have come in.  Returns False if the read timed out without getting anything"""
+
+        # Don't block for long if there are more messages waiting to go out
+        read_timeout = QUEUED_WRITE_INTERVAL if self.outgoing_serial_queue else SERIAL_READ_TIMEOUT
+        if self.framer.hasHeldFrame():
+            read_timeout = min(read_timeout, HELD_PACKET_TIMEOUT)
+        if self.serial.timeout != read_timeout:
+            self.serial.timeout = read_timeout
+
+        # Grab everything that's come in, but block until there's at least enough for a whole packet
+        raw_bytes = self.serial.read(max(self.serial.in_waiting, self.framer.getBytesNeeded()))
+        if len(raw_bytes) > 0:
+            # Partial packets stay in the framer until the rest comes in
+            frames = self.framer.addData(raw_bytes)
+            self.last_data_time = time.time()
+        else:
+            # Nothing came in after the packet the framer is holding, so there's nothing to check it against
+            frames = self.framer.flush()
+            if not frames:
+                return False
 
-        for i in range(0, len(raw_bytes), fcb_message_parsing.PACKET_LENGTH):
-            self.parseData(raw_bytes[i : i + fcb_message_parsing.PACKET_LENGTH])
-        # self.serial.flushInput()
+        # Parse straight out of bytes instead of the bytearray or a memoryview, indexing those costs more
+        frames = bytes(frames)
+        for offset in range(0, len(frames), fcb_message_parsing.PACKET_LENGTH):
+            self.handleParseResult(*fcb_message_parsing.parse_fcb_message_from(frames, offset))
 
-        if self.log_to_file:
-            self.serial_logger.write_raw(raw_bytes)
+        # Only whole packets get logged, so every line of the raw log still starts on a packet boundary
+        if self.log_to_file and frames:
+            self.serial_logger.write_raw(frames)
 
-        self.last_data_time = time.time()
+        return True
 
     def writeData(self):
         if len(self.outgoing_serial_queue) > 0:
@@ -204,6 +267,18 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
                 print(e)
 
     def updateEveryEnabledLoop(self):
+        self.diagnostics_box_helper.updatePanel("Serial Framing", self.framer.getCounters())
+
+        for radio_id, radio_stream in self.radio_streams.items():
+            annunciator_index = RADIO_LINK_ANNUNCIATOR_INDEX + radio_id
+            if self.receive_all_radios:
+                [level, message] = radio_stream.getAnnunciatorState()
+                self.annunciator.setAnnunciator(annunciator_index, "{} Link".format(radio_stream.name), level, message)
+                self.diagnostics_box_helper.updatePanel("{} Link".format(radio_stream.name), radio_stream.getDiagnostics())
+            else:
+                self.annunciator.setAnnunciator(annunciator_index, " ", 0, " ")
+        if self.receive_all_radios:
+            self.diagnostics_box_helper.updatePanel("Radio Merging", self.packet_merger.getDiagnostics())
         super(GroundStationDataInterface, self).updateEveryEnabledLoop()
 
         self.reconfigure_options_dictionary[self.radio_reconfigure_page.getPageName()] = self.radio_reconfigure_page.getDataStructure()
@@ -211,7 +286,7 @@ class GroundStationDataInterface(FCBDataInterfaceCore):
 
     def logMessageToFile(self, message_type, parsed_message):
         if self.log_to_file:
-            self.serial_logger.write_parsed(message_type, str(parsed_message))
+            self.serial_logger.write_parsed(message_type, parsed_message)
 
     def closeOut(self):
         self.serial_logger.close()
@@ -1,10 +1,19 @@
 import os
-import time
 
 from src.constants import Constants
+from src.CustomLogging.binary_log import BINARY_LOG_EXTENSION
+from src.CustomLogging.run_catalog import RUN_CATALOG
+from src.Modules.DataInterfaceTools.recorded_run import RecordedRun
+from src.Modules.DataInterfaceTools.replay_engine import ReplayEngine
 from src.Modules.fcb_data_interface_core import FCBDataInterfaceCore
 from src.Postprocessing.recorded_data_reader import RecordedDataReader
 
+PARSED_LOG_NAME = "GroundStationDataInterface_parsed"
+
+
+def get_parsed_log_path(run_name, extension):
+    return f"logs/{run_name}/{PARSED_LOG_NAME}{extension}"
+
 
 class GroundStationRecordedDataInterface(FCBDataInterfaceCore):
     """
@@ -18,6 +27,14 @@ class GroundStationRecordedDataInterface(FCBDataInterfaceCore):
 
         self.file_name = ""
         self.reader = None
+        self.spin_period = None  # Nothing to do until there's a recording to play
+
+        # Plays packets back on their recorded timing, and gives us the speed/pause/seek controls
+        self.replay = ReplayEngine("Ground Station Replay", on_change=self.wakeUp)
+        self.reconfigure_options_dictionary[self.replay.getPageName()] = self.replay.getDataStructure()
+        reconfigure_callbacks = self.replay.getReconfigureCallbacks(Constants.primary_reconfigure)
+        for callback in reconfigure_callbacks:
+            self.callback_handler.addCallback(callback, reconfigure_callbacks[callback])
 
     def startUp(self):
         pass
@@ -30,6 +47,8 @@ class GroundStationRecordedDataInterface(FCBDataInterfaceCore):
             if not self.reader.parsedToFullHistory():
                 self.reader.parseIntoIndividualLists()
 
+            self.replay.setPacketTimes(self.reader.getPacketTimes())
+
             # Only use runs where we got packets with the rssi field (meaning that data came in over the radio)
             runs_to_use = []
             for run in self.reader.getRuns():
@@ -37,14 +56,10 @@ class GroundStationRecordedDataInterface(FCBDataInterfaceCore):
                 if len(data_series) > 0 and run not in runs_to_use:
                     runs_to_use.append(run)
 
-            # Put this data in the right spot so we can view it later
+            # Put this data in the right spot so we can view it later.  Keys only get pulled out of the reader when a widget asks for them
+            reader = self.reader
             for run in runs_to_use:
-                if run not in self.recorded_data_dictionary:
-                    self.recorded_data_dictionary[run] = {}
-
-                for key in self.reader.getRecordedDataKeys(run):
-                    [data_series, time_series] = self.reader.getFullHistoryForKey(run, key)
-                    self.recorded_data_dictionary[run][key] = [data_series, time_series]
+                self.recorded_data_dictionary[run] = RecordedRun(reader.getRecordedDataKeys(run), lambda key, run=run: reader.getFullHistoryForKey(run, key))
 
     def hasRecordedData(self):
         """
@@ -54,17 +69,19 @@ class GroundStationRecordedDataInterface(FCBDataInterfaceCore):
 
     def getRunNames(self):
         """
-        Runs every tick of the GUI (which seems unnecessarily fast)
+        Runs every tick of the GUI, so this comes from the run catalog instead of going to disk every time
         """
-        runs = list(filter(lambda it: os.path.isdir(f"logs/{it}") and os.path.exists(f"logs/{it}/GroundStationDataInterface_parsed.txt"), os.listdir("logs")))
-        runs.sort(reverse=True)
-        return runs
+        return RUN_CATALOG.getRunNames([PARSED_LOG_NAME + ".txt", PARSED_LOG_NAME + BINARY_LOG_EXTENSION])
 
     def setSpecificRunSelected(self, run_name):
         pass
 
     def getSpecificRun(self, run_name):
-        self.file_name = f"logs/{run_name}/GroundStationDataInterface_parsed.txt"
+        # Prefer the binary log if this run has one, since it doesn't have to be eval()'d line by line
+        if os.path.exists(get_parsed_log_path(run_name, BINARY_LOG_EXTENSION)):
+            self.file_name = get_parsed_log_path(run_name, BINARY_LOG_EXTENSION)
+        else:
+            self.file_name = get_parsed_log_path(run_name, ".txt")
         # re-trigger indexing if required
         self.runOnEnableAndDisable()
 
@@ -75,19 +92,22 @@ class GroundStationRecordedDataInterface(FCBDataInterfaceCore):
             self.good_fcb_data = False
             self.connected = False
             self.has_data = False
+            self.spin_period = None
             return
 
         self.good_fcb_data = True
         self.connected = True
         self.has_data = True
 
-        [packet_type, parsed_packet] = self.reader.getNextPacket()
-        self.logger.info("New [{0}] message".format(packet_type))
+        # Packets come out of the file one at a time as they're due, instead of all being held in memory
+        for packet_num in self.replay.getDuePackets():
+            [packet_type, parsed_packet] = self.reader.getPacket(packet_num)
+
+            # We changed how crc is logged at some point, so this is needed to look at old data
+            if Constants.crc_key in parsed_packet and parsed_packet[Constants.crc_key] == "1":
+                parsed_packet[Constants.crc_key] = "Good"
 
-        # We changed how crc is logged at some point, so this is needed to look at old data
-        if Constants.crc_key in parsed_packet and parsed_packet[Constants.crc_key] == "1":
-            parsed_packet[Constants.crc_key] = "Good"
+            self.handleParsedData(packet_type, parsed_packet)
 
-        self.handleParsedData(packet_type, parsed_packet)
         self.updateEveryEnabledLoop()
-        time.sleep(0.05)
+        self.spin_period = self.replay.getTimeUntilNextPacket()
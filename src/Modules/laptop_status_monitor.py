@@ -1,5 +1,3 @@
-import time
-
 import psutil
 
 from src.constants import Constants
@@ -13,6 +11,7 @@ class LaptopStatusMonitor(ThreadedModuleCore):
 
     def __init__(self):
         super().__init__()
+        self.spin_period = 1
 
     def spin(self):
         battery = psutil.sensors_battery()  # returns a tuple
@@ -24,5 +23,3 @@ class LaptopStatusMonitor(ThreadedModuleCore):
         if battery is not None:
             self.data_dictionary[Constants.laptop_battery_percent_key] = float(battery.percent)
             self.data_dictionary[Constants.laptop_battery_charging_key] = battery.power_plugged
-
-        time.sleep(1)
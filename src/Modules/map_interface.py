@@ -2,10 +2,15 @@
 Handles interfacing the map tile manager with the GUI data pipeline
 """
 
+import time
+
 from src.constants import Constants
+from src.data_helpers import get_value_from_dictionary
 from src.Modules.MapTileManager.map_tile_manager import MapTileManager
 from src.Modules.module_core import ThreadedModuleCore
 
+PREFETCH_PERIOD = 2  # Seconds between looking at where the vehicle is headed to prefetch tiles
+
 
 class MapInterface(ThreadedModuleCore):
     """
@@ -15,16 +20,41 @@ class MapInterface(ThreadedModuleCore):
     def __init__(self):
         super(MapInterface, self).__init__()
 
-        self.tile_manager = MapTileManager()
+        memory_budget = self.config_saver.get("tile_cache_megabytes", 256, int) * 1024 * 1024
+        compress_cold_tiles = self.config_saver.get("compress_cold_tiles", "True", str).lower() == "true"
+        self.tile_manager = MapTileManager(memory_budget=memory_budget, compress_cold_tiles=compress_cold_tiles)
+        self.tile_manager.request_callback = self.wakeUp
 
-        self.data_dictionary[Constants.map_tile_manager_key] = self.tile_manager
+        # Downloads tiles ahead of where the vehicle is going.  Otherwise, this only does anything when the map widget asks for tiles
+        self.prefetch_tiles = self.config_saver.get("prefetch_tiles", "True", str).lower() == "true"
+        self.spin_period = PREFETCH_PERIOD if self.prefetch_tiles else None
+        self.last_prefetch_time = 0
 
-    def getDataDictionary(self):
-        """Don't want it to copy every loop"""
-        return self.data_dictionary
+        # Only needs to go to the GUI once, the data bus keeps it after that
+        self.data_dictionary[Constants.map_tile_manager_key] = self.tile_manager
 
     def spin(self):
         try:
             self.tile_manager.process_requests()
         except Exception as e:
             print("Error getting map tiles {}".format(e))
+
+        if self.prefetch_tiles and time.time() - self.last_prefetch_time > PREFETCH_PERIOD:
+            self.last_prefetch_time = time.time()
+            try:
+                self.prefetchTiles()
+            except Exception as e:
+                print("Error prefetching map tiles {}".format(e))
+
+    def prefetchTiles(self):
+        latitude = get_value_from_dictionary(self.gui_full_data_dictionary, Constants.latitude_key, 0)
+        longitude = get_value_from_dictionary(self.gui_full_data_dictionary, Constants.longitude_key, 0)
+        if latitude == 0 or longitude == 0:  # Same as the map widget, 0 means we don't have a position yet
+            return
+
+        ground_speed = float(get_value_from_dictionary(self.gui_full_data_dictionary, Constants.ground_speed_key, 0))
+        course = float(get_value_from_dictionary(self.gui_full_data_dictionary, Constants.course_over_ground_key, 0))
+        altitude = get_value_from_dictionary(self.gui_full_data_dictionary, Constants.altitude_key, None)
+        vertical_speed = get_value_from_dictionary(self.gui_full_data_dictionary, Constants.vertical_speed_key, None)
+
+        self.tile_manager.prefetch_trajectory(float(latitude), float(longitude), ground_speed, course, altitude, vertical_speed)
@@ -10,6 +10,7 @@ import time
 from src.callback_handler import CallbackHandler
 from src.config import ConfigSaver
 from src.CustomLogging.dpf_logger import MAIN_GUI_LOGGER
+from src.data_bus import ModuleDataDictionary
 
 
 class ThreadedModuleCore(threading.Thread):
@@ -18,7 +19,11 @@ class ThreadedModuleCore(threading.Thread):
     This class spins up a new thread to run the module code in, and handles cross-thread data transfer so callbacks are called in the correct thread (I think)
 
     The two most important methods here to override for new modules are the runOnEnableAndDisable() method and the spin() method.
-    runOnEnableAndDisable() runs whenever the module is enabled or disabled, and spin runs once every .01 seconds at maximum.
+    runOnEnableAndDisable() runs whenever the module is enabled or disabled, and spin runs once every spin_period seconds at maximum.
+
+    Between spins the thread blocks instead of polling.  It wakes up when spin_period runs out, or when wakeUp() is called (modules
+    should call it from callbacks that give the thread new work).  Set spin_period to None to only spin when woken up.  Disabled
+    modules block until they're enabled, stopped or woken up.
 
     This class also provides an interface for supplying pre-recorded time-series data to the GUI.
     """
@@ -32,7 +37,7 @@ class ThreadedModuleCore(threading.Thread):
             self.module_name = module_name
 
         self.logger = MAIN_GUI_LOGGER.get_logger(self.module_name)
-        self.data_dictionary = {}
+        self.data_dictionary = ModuleDataDictionary()  # New data since the last GUI loop.  Only put data in here that changed
         self.gui_full_data_dictionary = {}
         self.recorded_data_dictionary = {}  # {run_name: {run_dict}}
         self.serial_devices = {}  # Dictionary {name: callback_function, ...} of serial devices to provide to the main GUI
@@ -49,12 +54,23 @@ class ThreadedModuleCore(threading.Thread):
 
         self.reconfigure_options_dictionary = {}
 
+        self.spin_period = 0.01  # Seconds to wait between spins while enabled, or None to wait for wakeUp()
+        self.wake_condition = threading.Condition()
+        self.wake_requested = False
+
+        # Counters for the wakeups per second metric
+        self.wakeup_count = 0
+        self.idle_wakeup_count = 0
+        self.last_wakeup_counts = [0, 0]
+        self.last_wakeup_rate_time = time.time()
+
     def getSerialDevices(self):
         """Returns a dict that is {device_name: callback_function(str: portname)} that contains all the serial devices added by this module"""
         return self.serial_devices
 
     def getReconfigureDictionary(self):
-        return self.reconfigure_options_dictionary
+        # Copy so the GUI doesn't iterate it while this thread is changing it
+        return self.reconfigure_options_dictionary.copy()
 
     def getSpecificRun(self, run_name):
         if run_name in self.recorded_data_dictionary:
@@ -86,6 +102,7 @@ class ThreadedModuleCore(threading.Thread):
 
     def setEnabled(self, enabled):
         self.enabled = enabled
+        self.wakeUp()
 
     def toggleEnabled(self):
         self.setEnabled(not self.enabled)
@@ -96,6 +113,8 @@ class ThreadedModuleCore(threading.Thread):
         """
         self.startUp()
         while self.should_be_running:
+            write_count = self.data_dictionary.write_count
+
             if self.enabled != self.was_enabled:  # If the enabled state changes, run the method for that
                 self.runOnEnableAndDisable()
                 self.was_enabled = self.enabled
@@ -103,9 +122,51 @@ class ThreadedModuleCore(threading.Thread):
             if self.enabled:
                 self.spin()
             self.runsEveryLoop()
-            time.sleep(0.01)  # Keep python from locking the database objects all the time
+
+            # Woke up, but didn't have anything new for the GUI
+            self.recordWakeUp(idle=write_count == self.data_dictionary.write_count)
+
+            if self.enabled:
+                self.waitForWakeUp(self.spin_period)
+            else:
+                self.waitForWakeUp(None)
         self.closeOut()
 
+    def wakeUp(self):
+        """Wakes up the module thread if it's waiting.  Safe to call from any thread"""
+        with self.wake_condition:
+            self.wake_requested = True
+            self.wake_condition.notify()
+
+    def waitForWakeUp(self, timeout):
+        """Blocks until wakeUp() is called, or timeout seconds pass (forever if timeout is None).  Returns True if wakeUp() was called"""
+        with self.wake_condition:
+            if not self.wake_requested:
+                self.wake_condition.wait(timeout)
+            woken_up = self.wake_requested
+            self.wake_requested = False
+        return woken_up
+
+    def recordWakeUp(self, idle):
+        """
+        Counts one wakeup of the module thread for the wakeups per second metric.
+        Modules that block on something else, like a serial port read, should call this each time that returns
+        """
+        self.wakeup_count += 1
+        if idle:
+            self.idle_wakeup_count += 1
+
+    def getWakeUpRates(self):
+        """Returns [wakeups per second, idle wakeups per second] since the last time this was called"""
+        now = time.time()
+        elapsed = max(now - self.last_wakeup_rate_time, 1e-6)
+        counts = [self.wakeup_count, self.idle_wakeup_count]
+
+        rates = [(counts[i] - self.last_wakeup_counts[i]) / elapsed for i in range(len(counts))]
+        self.last_wakeup_counts = counts
+        self.last_wakeup_rate_time = now
+        return rates
+
     def startUp(self):
         """Runs once the thread starts before anything else"""
         pass
@@ -133,19 +194,19 @@ class ThreadedModuleCore(threading.Thread):
 
     def stop(self):
         self.should_be_running = False
+        self.wakeUp()
 
     def setFullDataDictionary(self, data_dict):
         """
         Allows the GUI to give each interface the full database dictionary
-        This feels like a hack, but I don't have a great alternative right now
+        The GUI only does this once, with the data bus, which always has the latest value for each key.
+        Only look up keys in it, don't iterate over it from the module thread
         """
 
         self.gui_full_data_dictionary = data_dict
 
     def getDataDictionary(self):
         if self.enabled:
-            temporary_dict = self.data_dictionary.copy()
-            self.data_dictionary = {}
-            return temporary_dict
+            return self.data_dictionary.drain()
         else:
             return {}
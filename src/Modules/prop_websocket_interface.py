@@ -31,6 +31,7 @@ class PropWebsocketInterface(ThreadedModuleCore):
         self.command_queue = []
 
         self.primary_module = True
+        self.spin_period = 1  # Time between connection attempts, mainLoop blocks on the websocket while connected
 
     def propCommandCallback(self, command):
         self.logger.debug(f"Trying to queue command: {command}")
@@ -42,6 +43,7 @@ class PropWebsocketInterface(ThreadedModuleCore):
     def changeWsServer(self, name):
         self.serial_port = f"ws://{name}:9002"
         self.connected = False
+        self.wakeUp()
 
     def spin(self):
         self.loop.run_until_complete(self.mainLoop())
@@ -157,8 +159,6 @@ class PropWebsocketInterface(ThreadedModuleCore):
 
         if not self.should_be_running:
             self.loop.stop()
-        else:
-            time.sleep(1)
 
     def updateAnnunciator(self):
         if self.connected:
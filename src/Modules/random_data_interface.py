@@ -1,6 +1,5 @@
 import math
 import random
-import time
 
 import navpy
 
@@ -24,6 +23,7 @@ class RandomDataInterface(ThreadedModuleCore):
         self.t = 0
 
         self.vehicle_position_filter = GPSPositionFilter("random data")
+        self.spin_period = 0.02
 
     def spin(self):
         self.i += 3
@@ -102,6 +102,4 @@ class RandomDataInterface(ThreadedModuleCore):
         if self.i % 10 == 1:
             self.logger.info(str(random.random()))
 
-        time.sleep(0.02)
-
         self.t = self.t + 0.3
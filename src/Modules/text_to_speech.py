@@ -36,6 +36,8 @@ class TextToSpeech(ThreadedModuleCore):
         self.ascent_speech_interval_seconds = 5
         self.descent_interval_seconds = 10
 
+        self.spin_period = 0.1  # Only reads from the database, and nobody can tell if we start talking 100 ms late
+
     def spin(self):
         state = get_value_from_dictionary(self.gui_full_data_dictionary, Constants.fcb_state_key, "")
         altitude = get_value_from_dictionary(self.gui_full_data_dictionary, Constants.altitude_key, "Invalid Altitude")
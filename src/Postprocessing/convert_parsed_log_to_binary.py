@@ -0,0 +1,55 @@
+"""
+One-shot converter from old *_parsed.txt text logs to the binary log format
+
+Usage: python -m src.Postprocessing.convert_parsed_log_to_binary logs/<run>/GroundStationDataInterface_parsed.txt [more files...]
+Writes the binary log next to each text log, with the same name and a .bin extension.
+"""
+
+import datetime
+import os
+import sys
+import time
+
+from src.CustomLogging.binary_log import BINARY_LOG_EXTENSION, BinaryLogWriter
+from src.Postprocessing.recorded_data_reader import RecordedDataReader
+
+# Keys RecordedDataReader adds to each packet that aren't part of the original message
+READER_ADDED_KEYS = ["timestamp", "run_number", "distance"]
+
+
+def convert_parsed_log_to_binary(text_file_name, binary_file_name=None):
+    if binary_file_name is None:
+        binary_file_name = os.path.splitext(text_file_name)[0] + BINARY_LOG_EXTENSION
+
+    if os.path.exists(binary_file_name):
+        os.remove(binary_file_name)
+
+    reader = RecordedDataReader(file_name=text_file_name)
+    writer = BinaryLogWriter(binary_file_name)
+
+    runs_written = 0
+    for packet_num in range(reader.getPacketCount()):
+        [packet_type, packet] = reader.getPacket(packet_num)
+        packet = dict(packet)
+        timestamp = datetime.datetime.fromisoformat(packet["timestamp"]).timestamp()
+        run_number = packet["run_number"]
+
+        # Keep run numbers lined up with the text log, even if some runs didn't have any packets
+        while runs_written < run_number:
+            writer.writeRunStart(timestamp)
+            runs_written += 1
+
+        for key in READER_ADDED_KEYS:
+            packet.pop(key, None)
+
+        writer.writePacket(packet_type, packet, timestamp)
+
+    writer.close()
+    return binary_file_name
+
+
+if __name__ == "__main__":
+    for file_name in sys.argv[1:]:
+        start_time = time.time()
+        output_file_name = convert_parsed_log_to_binary(file_name)
+        print(f"Converted {file_name} to {output_file_name} in {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,245 @@
+"""
+Bulk decoder for raw radio captures (*_raw.txt files from SerialLogger.write_raw)
+
+Reads the whole capture, splits it into PACKET_LENGTH byte frames, groups the frames by message type and decodes each group at
+once with numpy.frombuffer, using dtypes built from the fcb_message_parsing layouts.
+
+Usage: python -m src.Postprocessing.raw_capture_decoder logs/<run>/GroundStationDataInterface_raw.txt
+"""
+
+import codecs
+import datetime
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy
+
+from src.constants import Constants
+from src.data_helpers import quaternion_to_euler_angle
+from src.Modules.MessageParsing.fcb_message_parsing import (
+    CALLSIGN_LENGTH,
+    GROUND_STATION_MESSAGE_TYPES,
+    HEADER_LENGTH,
+    MESSAGE_CALLBACKS,
+    NON_CALLSIGN_BYTES,
+    PACKET_LENGTH,
+    LineCutterMessageBase,
+    OrientationMessage,
+    get_packet_dtype,
+    gps_time_to_string,
+    lat_lon_decimal_minutes_to_decimal_degrees,
+    parse_pyro_continuity_byte,
+    parse_pyro_fire_status,
+)
+
+GROUND_STATION_MESSAGE_NUMBER = 200
+RECEIVE_TIME_KEY = "receive_time"
+
+
+def lat_lon_decimal_minutes_to_decimal_degrees_vectorized(lat_lon_values):
+    """Same as lat_lon_decimal_minutes_to_decimal_degrees, for a whole array at once"""
+    lat_lon_values = numpy.asarray(lat_lon_values, dtype=numpy.float64)
+    abs_val = numpy.abs(lat_lon_values)
+    converted = (numpy.trunc(abs_val / 100.0) + (abs_val % 100.0) / 60.0) * numpy.sign(lat_lon_values)
+
+    # If its between -90 and 90, its probably actually the in dd.ddddd
+    return numpy.where((lat_lon_values > -90) & (lat_lon_values < 90), lat_lon_values, converted)
+
+
+def unpack_bits(values, bit_count):
+    """Turns an integer array into a (len, bit_count) bool array, least significant bit first"""
+    values = numpy.asarray(values).astype(numpy.uint32)
+    return ((values[:, None] >> numpy.arange(bit_count, dtype=numpy.uint32)) & 1).astype(bool)
+
+
+# Vectorized versions of the parse functions used in messageData layouts
+VECTORIZED_TRANSFORMS = {
+    lat_lon_decimal_minutes_to_decimal_degrees: lat_lon_decimal_minutes_to_decimal_degrees_vectorized,
+    parse_pyro_continuity_byte: lambda values: unpack_bits(values, Constants.MAX_PYROS),
+    parse_pyro_fire_status: lambda values: unpack_bits(values, 16),
+    gps_time_to_string: lambda values: values.astype("datetime64[s]"),
+}
+
+
+def parse_raw_line_time(timestamp_string):
+    """HH:MM:SS.ffffff to seconds since midnight"""
+    [hours, minutes, seconds] = timestamp_string.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def read_raw_capture(file_name) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Reads a raw capture into (frames, receive_times).
+
+    frames is a (N, PACKET_LENGTH) uint8 array, and receive_times is the unix time each frame's serial read was logged at.
+    Each serial read is split into whole frames, and any partial frame left over at the end of a read is dropped
+    """
+
+    chunks: List[bytes] = []
+    chunk_frame_counts: List[int] = []
+    chunk_times: List[float] = []
+
+    day_start = datetime.datetime.fromtimestamp(0).timestamp()
+    last_time_of_day = 0
+
+    with open(file_name, errors="replace") as file:
+        for line in file:
+            if line.startswith("RUN START"):
+                run_start = datetime.datetime.fromisoformat(line.split("RUN START")[1].strip())
+                day_start = datetime.datetime.combine(run_start.date(), datetime.time()).timestamp()
+                last_time_of_day = 0
+                continue
+
+            # Lines look like HH:MM:SS.ffffff: b'\x02\x01...'
+            split_index = line.find(": b")
+            if split_index < 0:
+                continue  # Blank lines and things like "Switching radio to band 3"
+
+            # escape_decode undoes the bytes repr without evaluating it as Python
+            data = codecs.escape_decode(line[split_index + 4 : len(line.rstrip()) - 1].encode())[0]
+            frame_count = len(data) // PACKET_LENGTH
+            if frame_count == 0:
+                continue
+
+            time_of_day = parse_raw_line_time(line[:split_index])
+            if time_of_day < last_time_of_day:  # Went past midnight
+                day_start += 24 * 3600
+            last_time_of_day = time_of_day
+
+            chunks.append(data[: frame_count * PACKET_LENGTH])
+            chunk_frame_counts.append(frame_count)
+            chunk_times.append(day_start + time_of_day)
+
+    frames = numpy.frombuffer(b"".join(chunks), dtype=numpy.uint8).reshape(-1, PACKET_LENGTH)
+    receive_times = numpy.repeat(numpy.array(chunk_times, dtype=numpy.float64), chunk_frame_counts)
+    return frames, receive_times
+
+
+def decode_callsigns(callsigns):
+    # There's only ever a handful of different callsigns, so only clean up each one once
+    [unique_callsigns, inverse] = numpy.unique(callsigns, return_inverse=True)
+    cleaned = [it[:CALLSIGN_LENGTH].translate(None, NON_CALLSIGN_BYTES).decode("latin-1").strip() for it in unique_callsigns]
+    return numpy.array(cleaned, dtype=object)[inverse]
+
+
+def decode_frame_group(frames, receive_times, message_class, codec) -> numpy.recarray:
+    """Decodes frames that all have the same layout into one record array"""
+
+    packets = numpy.ascontiguousarray(frames).view(get_packet_dtype(codec))[:, 0]
+
+    columns = {RECEIVE_TIME_KEY: receive_times}
+    for key in [Constants.software_version_key, Constants.serial_number_key, Constants.timestamp_ms_key]:
+        columns[key] = packets[key]
+    columns[Constants.callsign_key] = decode_callsigns(packets[Constants.callsign_key])
+
+    if codec is None:
+        columns["payload"] = numpy.frombuffer(packets["payload"].tobytes(), dtype=numpy.uint8).reshape(len(packets), -1)
+    else:
+        # Same scale and transform plan the codec uses for single packets, applied to whole columns
+        for key in codec.keys:
+            columns[key] = packets[key]
+        for _, key, scale in codec.scaled_fields:
+            columns[key] = packets[key] * scale
+        for _, key, function in codec.transformed_fields:
+            if function in VECTORIZED_TRANSFORMS:
+                columns[key] = VECTORIZED_TRANSFORMS[function](packets[key])
+
+    if message_class is OrientationMessage:
+        [roll, pitch, yaw] = quaternion_to_euler_angle([columns["qw"], columns["qx"], columns["qy"], columns["qz"]])
+        columns[Constants.roll_position_key] = roll
+        columns[Constants.pitch_position_key] = pitch
+        columns[Constants.yaw_position_key] = yaw
+
+    # Radio status trailer
+    rssi = packets["rssi_raw"].astype(numpy.float64) - 50
+    rssi[packets["rssi_raw"] == -128] = numpy.nan
+    columns[Constants.radio_id_key] = packets[Constants.radio_id_key]
+    columns[Constants.rssi_val_key] = rssi
+    columns[Constants.lqi_key] = packets[Constants.lqi_key]
+    columns[Constants.crc_key] = packets[Constants.crc_key]
+
+    return make_record_array(columns)
+
+
+def decode_ground_station_frames(frames, receive_times) -> numpy.recarray:
+    """Ground station GPS packets don't have the FCB header or a radio trailer"""
+    dtype = numpy.dtype(
+        {
+            "names": ["message_number", "latitude", "longitude", "altitude", "pressure", "temperature"],
+            "formats": ["u1", "<f4", "<f4", "<f4", "<f8", "<f8"],
+            "offsets": [0, 1, 5, 9, 13, 21],
+            "itemsize": PACKET_LENGTH,
+        }
+    )
+    packets = numpy.ascontiguousarray(frames).view(dtype)[:, 0]
+
+    return make_record_array(
+        {
+            RECEIVE_TIME_KEY: receive_times,
+            Constants.ground_station_latitude_key: lat_lon_decimal_minutes_to_decimal_degrees_vectorized(packets["latitude"]),
+            Constants.ground_station_longitude_key: lat_lon_decimal_minutes_to_decimal_degrees_vectorized(packets["longitude"]),
+            Constants.ground_station_altitude_key: packets["altitude"],
+            Constants.ground_station_pressure_key: packets["pressure"],
+            Constants.ground_station_temperature_key: packets["temperature"],
+        }
+    )
+
+
+def make_record_array(columns: Dict[str, numpy.ndarray]) -> numpy.recarray:
+    length = len(next(iter(columns.values())))
+    dtype = [(key, columns[key].dtype, columns[key].shape[1:]) for key in columns]
+    records = numpy.recarray(length, dtype=dtype)
+    for key in columns:
+        records[key] = columns[key]
+    return records
+
+
+def decode_frames(frames, receive_times) -> Dict[str, numpy.recarray]:
+    """
+    Decodes (N, PACKET_LENGTH) frames into {message_type: record_array}.
+
+    Message types are named the same way parse_fcb_message names them, so line cutter messages get one array per line cutter
+    """
+
+    ret = {}
+    message_numbers = frames[:, 0]
+
+    for message_number in numpy.unique(message_numbers):
+        message_number = int(message_number)
+        mask = message_numbers == message_number
+
+        if message_number == GROUND_STATION_MESSAGE_NUMBER:
+            ret[GROUND_STATION_MESSAGE_TYPES[0]] = decode_ground_station_frames(frames[mask], receive_times[mask])
+        elif message_number in MESSAGE_CALLBACKS:
+            [message_type, message_class] = MESSAGE_CALLBACKS[message_number]
+
+            if issubclass(message_class, LineCutterMessageBase):
+                line_cutter_numbers = frames[:, HEADER_LENGTH]
+                for line_cutter_number in numpy.unique(line_cutter_numbers[mask]):
+                    if line_cutter_number > Constants.MAX_LINE_CUTTER_ID_VALID:
+                        continue
+                    line_cutter_mask = mask & (line_cutter_numbers == line_cutter_number)
+                    codec = message_class.getLineCutterCodec(int(line_cutter_number))
+                    ret[message_type + str(line_cutter_number)] = decode_frame_group(frames[line_cutter_mask], receive_times[line_cutter_mask], message_class, codec)
+            else:
+                # Messages without a fixed layout (like the CLI strings) keep their payload as raw bytes
+                codec = message_class.getCodec() if len(message_class.messageData) > 0 else None
+                ret[message_type] = decode_frame_group(frames[mask], receive_times[mask], message_class, codec)
+
+    return ret
+
+
+def decode_raw_capture(file_name) -> Dict[str, numpy.recarray]:
+    """Reads and decodes a whole raw capture.  Returns {message_type: record_array}"""
+    frames, receive_times = read_raw_capture(file_name)
+    return decode_frames(frames, receive_times)
+
+
+if __name__ == "__main__":
+    for file_name in sys.argv[1:]:
+        start_time = time.time()
+        decoded = decode_raw_capture(file_name)
+        print(f"Decoded {file_name} in {time.time() - start_time:.2f} seconds")
+        for message_type in decoded:
+            print(f"    {message_type}: {len(decoded[message_type])} packets")
@@ -7,107 +7,182 @@ import os
 import time
 
 import navpy
+import numpy
 
 from src.constants import Constants
+from src.CustomLogging.binary_log import BinaryLogReader, is_binary_log
 from src.data_helpers import vector_length
 
 
 class RecordedDataReader(object):
     def __init__(self, file_name="parsed_messages.txt", load_slower=False, logging_callback=None, logging_interval=5):
-        self.data_struct = []
+        """
+        Indexes a recorded data file.
+
+        Text logs are read through once, to build the full history of each key and an index of where each packet's line starts.
+        Single packets (for playback) are re-read from the file through that index, instead of keeping every packet in memory
+        """
+
         self.packet_types = []
         self.full_history_data_struct = {}  # {run_name: {run_dict}}
         self.parsed_to_full_history = False
-        has_first_point = False
-        first_point = []
+        self.binary_reader = None
+        self.first_point = None
 
-        big_packet_data = {}
-        packet_data = {}
+        # Index of the packets in a text log
+        self.file = None
+        self.packet_offsets = numpy.zeros(0, dtype=numpy.int64)  # Byte offset of each packet's line
+        self.packet_times = numpy.zeros(0)  # Unix time of each packet
+        self.packet_runs = numpy.zeros(0, dtype=numpy.int32)  # Run number of each packet
+        self.run_dates = {}  # {run_number: date}
+
+        fields = {}
         data_date = datetime.datetime.fromtimestamp(0).date()
         run_number = 0
         last_logging_time = 0
+        startTime = time.time()
 
         if not os.path.exists(file_name):
             # bad path, just return?
+            self.fields = []
+            self.packetIndex = 0
             return
 
-        file = open(file_name, errors='replace')
-        data = file.readlines()
+        # Binary logs are indexed without decoding anything, so none of the line-by-line stuff below is needed
+        if is_binary_log(file_name):
+            self.binary_reader = BinaryLogReader(file_name)
+            self.fields = self.binary_reader.getKeys() + ["timestamp", "run_number"]
+            self.packetIndex = 0
+            if logging_callback is not None:
+                logging_callback(f"Indexed {self.binary_reader.getPacketCount()} binary log packets in {time.time() - startTime} seconds")
+            return
+
+        self.file = open(file_name, "rb")
+        file_size = max(os.path.getsize(file_name), 1)
+        self.run_dates[run_number] = data_date
+
+        packet_offsets = []
+        packet_times = []
+        packet_runs = []
+        first_time = None
+
+        offset = 0
+        for i, raw_line in enumerate(self.file):
+            line_offset = offset
+            offset += len(raw_line)
+            line = raw_line.decode(errors="replace")
 
-        i = 0
-        startTime = time.time()
-        for line in data:
             if len(line.strip()) == 0:
                 pass
             elif "RUN START" in line:
                 timestamp_string = line.split("RUN START")[1].strip()
                 data_date = datetime.datetime.fromisoformat(timestamp_string).date()
                 run_number += 1
+                self.run_dates[run_number] = data_date
             else:
                 try:
-                    nan = float("nan")  # noqa: F841
-                    timestamp = line.split(" ")[0][0:-1]
-                    packet_type = line.split(timestamp)[1].split("{")[0][2:].strip()  # don't even ask
-                    packet_data = eval("{" + line.split("{")[1])
-
-                    timestamp_string = "{0} {1}".format(str(data_date), timestamp)
-                    packet_data["timestamp"] = timestamp_string
-                    packet_data["run_number"] = run_number
+                    [packet_type, packet_data] = self.parseLine(line, data_date, run_number)
+                    data_time = datetime.datetime.fromisoformat(packet_data["timestamp"])
                 except Exception as e:
                     print(f"Exception for line [ {line} ]: {e}")
                     continue
 
-                # Calculate distance from start
-                if Constants.latitude_key in packet_data and packet_data[Constants.latitude_key] != 0:
-                    if not has_first_point:
-                        first_point = [packet_data[Constants.latitude_key], packet_data[Constants.longitude_key]]
-                        has_first_point = True
-
-                    ned = navpy.lla2ned(packet_data[Constants.latitude_key], packet_data[Constants.longitude_key], 0, first_point[0], first_point[1], 0)
-                    distance = vector_length(ned[0], ned[1])
-                    packet_data["distance"] = distance
-
-                self.data_struct.append(packet_data)
+                packet_offsets.append(line_offset)
+                packet_times.append(data_time.timestamp())
+                packet_runs.append(run_number)
                 self.packet_types.append(packet_type)
-                big_packet_data.update(packet_data)
+                fields.update(dict.fromkeys(packet_data))
+
+                # Add to the full history as we go, instead of keeping every packet around to do it later
+                if first_time is None:
+                    first_time = data_time
+                run_dict = self.full_history_data_struct.setdefault("run_{}".format(run_number), {})
+                delta_seconds = (data_time - first_time).seconds
+                for key in packet_data:
+                    if key not in run_dict:
+                        run_dict[key] = ([], [])
+                    run_dict[key][0].append(packet_data[key])
+                    run_dict[key][1].append(delta_seconds)
 
             if load_slower and (i % 500 == 0):
                 time.sleep(0.000000001)  # This many 0s probably don't help, but this sleep keeps the file indexing from taking all the CPU resources
-            i = i + 1
 
             if logging_callback is not None and time.time() - last_logging_time > logging_interval:
-                logging_callback("Indexing recorded dat: {0:.2f}% done".format(100 * data.index(line) / len(data)))
+                logging_callback("Indexing recorded dat: {0:.2f}% done".format(100 * offset / file_size))
                 last_logging_time = time.time()
                 logging_callback(str(f"Indexing took {time.time() - startTime} seconds"))
 
-        self.fields = list(big_packet_data.keys())
+        self.packet_offsets = numpy.array(packet_offsets, dtype=numpy.int64)
+        self.packet_times = numpy.array(packet_times, dtype=numpy.float64)
+        self.packet_runs = numpy.array(packet_runs, dtype=numpy.int32)
+        self.parsed_to_full_history = len(packet_offsets) > 0
+
+        self.fields = list(fields.keys())
         self.packetIndex = 0
 
-    def parseIntoIndividualLists(self):
-        if len(self.data_struct) == 0:
-            return
-        if "timestamp" not in self.data_struct[0]:
-            return
+    def parseLine(self, line, data_date, run_number):
+        """Returns [packet_type, packet_data] for one packet line of a text log"""
+        nan = float("nan")  # noqa: F841
+        timestamp = line.split(" ")[0][0:-1]
+        packet_type = line.split(timestamp)[1].split("{")[0][2:].strip()  # don't even ask
+        packet_data = eval("{" + line.split("{")[1])
 
-        first_time = datetime.datetime.fromisoformat(self.data_struct[0]["timestamp"])
-        run_number = 0
+        timestamp_string = "{0} {1}".format(str(data_date), timestamp)
+        packet_data["timestamp"] = timestamp_string
+        packet_data["run_number"] = run_number
+
+        # Calculate distance from start
+        if Constants.latitude_key in packet_data and packet_data[Constants.latitude_key] != 0:
+            if self.first_point is None:
+                self.first_point = [packet_data[Constants.latitude_key], packet_data[Constants.longitude_key]]
+
+            ned = navpy.lla2ned(packet_data[Constants.latitude_key], packet_data[Constants.longitude_key], 0, self.first_point[0], self.first_point[1], 0)
+            distance = vector_length(ned[0], ned[1])
+            packet_data["distance"] = distance
 
-        for packet in self.data_struct:
-            if "run_number" in packet:
-                run_number = packet["run_number"]
+        return [packet_type, packet_data]
 
-            run_name = "run_{}".format(run_number)
-            for key in packet:
-                if run_name not in self.full_history_data_struct:
-                    self.full_history_data_struct[run_name] = {}
-                if key not in self.full_history_data_struct[run_name]:
-                    self.full_history_data_struct[run_name][key] = ([], [])
+    def parseIntoIndividualLists(self):
+        if self.binary_reader is not None:
+            self.parseBinaryIntoIndividualLists()
+        # Text logs get put into individual lists while they're indexed
 
-                data_time = datetime.datetime.fromisoformat(packet["timestamp"])
-                delta_time = data_time - first_time
+    def parseBinaryIntoIndividualLists(self):
+        """Same as parseIntoIndividualLists, but each key comes out of the binary log as a whole NumPy column"""
+        if self.binary_reader.getPacketCount() == 0:
+            return
 
-                self.full_history_data_struct[run_name][key][0].append(packet[key])
-                self.full_history_data_struct[run_name][key][1].append(delta_time.seconds)
+        first_time = self.binary_reader.getPacketTime(0)
+        has_first_point = False
+        first_point = []
+
+        for run_name in self.binary_reader.getRuns():
+            run_dict = {}
+            for key, (data_series, time_series) in self.binary_reader.getKeyArrays(run_name).items():
+                run_dict[key] = (data_series, time_series - first_time)
+
+            # Calculate distance from start, same as we do for text logs
+            if Constants.latitude_key in run_dict and Constants.longitude_key in run_dict:
+                latitude, time_series = run_dict[Constants.latitude_key]
+                longitude = run_dict[Constants.longitude_key][0]
+                if len(latitude) == len(longitude):
+                    latitude = latitude.astype(float)
+                    longitude = longitude.astype(float)
+                    has_position = latitude != 0
+
+                    if numpy.any(has_position):
+                        if not has_first_point:
+                            first_index = numpy.argmax(has_position)
+                            first_point = [latitude[first_index], longitude[first_index]]
+                            has_first_point = True
+
+                        latitude = latitude[has_position]
+                        longitude = longitude[has_position]
+                        ned = navpy.lla2ned(latitude, longitude, numpy.zeros(len(latitude)), first_point[0], first_point[1], 0)
+                        ned = numpy.reshape(ned, (-1, 3))
+                        run_dict["distance"] = (numpy.hypot(ned[:, 0], ned[:, 1]), time_series[has_position])
+
+            self.full_history_data_struct[run_name] = run_dict
 
         self.parsed_to_full_history = True
 
@@ -135,9 +210,25 @@ class RecordedDataReader(object):
     def parsedToFullHistory(self):
         return self.parsed_to_full_history
 
+    def getPacketCount(self):
+        if self.binary_reader is not None:
+            return self.binary_reader.getPacketCount()
+        return len(self.packet_offsets)
+
+    def getPacketTimes(self) -> numpy.ndarray:
+        """Unix time of every packet, in packet order.  This is the timestamp index replay uses to find packets"""
+        if self.binary_reader is not None:
+            return self.binary_reader.packet_times
+        return self.packet_times
+
     def getPacket(self, packet_num):
-        if packet_num < len(self.packet_types):
-            return [self.packet_types[packet_num], self.data_struct[packet_num]]
+        if self.binary_reader is not None:
+            return self.binary_reader.getPacket(packet_num)
+        if 0 <= packet_num < len(self.packet_offsets):
+            self.file.seek(int(self.packet_offsets[packet_num]))
+            line = self.file.readline().decode(errors="replace")
+            run_number = int(self.packet_runs[packet_num])
+            return self.parseLine(line, self.run_dates[run_number], run_number)
         else:
             return ["", {}]
 
@@ -1,13 +1,15 @@
 """
-turns parsed_message.txt into a .csv file
+turns parsed_message.txt (or a binary *_parsed.bin log) into a .csv file
 """
 
 import csv
+import sys
 
 from src.Postprocessing.recorded_data_reader import RecordedDataReader
 
 if __name__ == "__main__":
-    reader = RecordedDataReader(file_name="../parsed_messages.txt")
+    file_name = sys.argv[1] if len(sys.argv) > 1 else "../parsed_messages.txt"
+    reader = RecordedDataReader(file_name=file_name)
 
     with open("export.csv", "w") as csvfile:
         # creating a csv dict writer object
@@ -17,4 +19,5 @@ if __name__ == "__main__":
         writer.writeheader()
 
         # writing data rows
-        writer.writerows(reader.data_struct)
+        for packet_num in range(reader.getPacketCount()):
+            writer.writerow(reader.getPacket(packet_num)[1])
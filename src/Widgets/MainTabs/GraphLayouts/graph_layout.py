@@ -1,5 +1,5 @@
 from src.data_helpers import interpolate
-from src.Widgets.graph_tab_control import GraphTabControl
+from src.Widgets.graph_tab_control import SLIDER_RESOLUTION, GraphTabControl
 from src.Widgets.graph_widget import GraphWidget
 from src.Widgets.MainTabs.main_tab_common import TabCommon
 
@@ -11,7 +11,7 @@ class GraphLayoutCommon(TabCommon):
         self.graphControlWidget = self.addWidget(GraphTabControl())
 
         self.slider_min = 0
-        self.slider_max = 1000
+        self.slider_max = SLIDER_RESOLUTION
 
         self.graphControlWidget.rangeSlider.valueChanged.connect(self.onSliderValueChange)
         self.graphControlWidget.resetGraphButton.pressed.connect(self.clearAllGraphs)
@@ -22,12 +22,17 @@ class GraphLayoutCommon(TabCommon):
                 widget.clearGraph()
 
         # Reset slider position as well
-        self.graphControlWidget.rangeSlider.setSliderPosition([0, 1000])
+        self.graphControlWidget.rangeSlider.setSliderPosition([0, SLIDER_RESOLUTION])
 
     def onSliderValueChange(self, data):
         self.slider_min = data[0]
         self.slider_max = data[1]
 
+        # Redraw at the new level of detail right away, instead of waiting for the graphs' next update
+        for widget in self.widgetList:
+            if type(widget) == GraphWidget:
+                widget.last_update_time = 0
+
     def customUpdateVehicleData(self, data):
         graphs_enabled = self.graphControlWidget.graphsEnabled()
         try:
@@ -55,12 +60,12 @@ class GraphLayoutCommon(TabCommon):
         if self.slider_min == 0:
             graph_min = None
         else:
-            graph_min = interpolate(self.slider_min, 0, 1000, smallest_time, largest_time)
+            graph_min = interpolate(self.slider_min, 0, SLIDER_RESOLUTION, smallest_time, largest_time)
 
-        if self.slider_max == 1000:
+        if self.slider_max == SLIDER_RESOLUTION:
             graph_max = None
         else:
-            graph_max = interpolate(self.slider_max, 0, 1000, smallest_time, largest_time)
+            graph_max = interpolate(self.slider_max, 0, SLIDER_RESOLUTION, smallest_time, largest_time)
 
         for widget in self.widgetList:
             if type(widget) == GraphWidget:
@@ -65,6 +65,7 @@ class BoardCliWrapper(custom_q_widget_base.CustomQWidgetBase):
         layout.addItem(tempLayout)
 
         self.downloadButton = self.add(QPushButton(text="Download selected flight"), onClick=self.onOffloadSelect)
+        self.progressLabel = self.add(QLabel(text=""))
         self.eraseButton = self.add(QPushButton(text="Erase FCB Memory"), onClick=self.erase)
 
         self.addSourceKey(
@@ -74,6 +75,13 @@ class BoardCliWrapper(custom_q_widget_base.CustomQWidgetBase):
             default_value="",
             hide_in_drop_down=True,
         )
+        self.addSourceKey(
+            "offload_progress",
+            str,
+            Constants.cli_offload_progress_key,
+            default_value="",
+            hide_in_drop_down=True,
+        )
 
         self.setLayout(layout)
 
@@ -147,6 +155,9 @@ class BoardCliWrapper(custom_q_widget_base.CustomQWidgetBase):
         in_prog = get_value_from_dictionary(vehicle_data, Constants.cli_interface_usb_command_running, False)
         self.setCommandInProgress(in_prog)
 
+        if self.isDictValueUpdated("offload_progress"):
+            self.progressLabel.setText(self.getDictValueUsingSourceKey("offload_progress"))
+
         if self.isDictValueUpdated("flights_list"):
             flight_list_str = self.getDictValueUsingSourceKey("flights_list")
             self.recreate_table(flight_list_str)
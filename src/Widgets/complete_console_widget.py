@@ -128,3 +128,14 @@ class CLIUSBInterface(CompleteConsoleWidget):
         self.title = "FCB CLI USB Interface"
 
         self.titleBox.setText(self.title)
+
+        # Live byte and throughput counters while an offload is running
+        self.statusBox = QLabel()
+        self.layout().addWidget(self.statusBox, 3, 0)
+        self.addSourceKey("offload_progress", str, Constants.cli_offload_progress_key, default_value="", hide_in_drop_down=True)
+
+    def updateData(self, vehicle_data, updated_data):
+        if self.isDictValueUpdated("offload_progress"):
+            self.statusBox.setText(self.getDictValueUsingSourceKey("offload_progress"))
+
+        super().updateData(vehicle_data, updated_data)
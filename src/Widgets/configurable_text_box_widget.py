@@ -26,6 +26,7 @@ class TextBoxWidget(CustomQWidgetBase):
         self.setLayout(layout)
 
         self.sourceConfig = {}
+        self.onlyUpdateOnSourceKeyChange = True  # Everything it shows comes from source keys
 
         if type(source_list) == list:
             for i in range(len(source_list)):
@@ -63,9 +63,13 @@ class CustomQWidgetBase(QFrame):
 
         self.vehicleData = {}
         self.recordedData = {}
-        self.updated_data_dictionary = {}  # Tracks which keys are new since the last GUI loop
+        self.updated_data_dictionary = {}  # {key: new_value} for only the keys that changed since the last GUI loop
         self.sourceDictionary = {}
 
+        # Widgets that only draw values from their source keys can set this, so they skip loops where none of those keys changed
+        self.onlyUpdateOnSourceKeyChange = False
+        self.sourceKeysChanged = True  # Forces the next update, for when the source keys or visibility change
+
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.rightClickMenu)
 
@@ -74,6 +78,10 @@ class CustomQWidgetBase(QFrame):
         self.isClosed = True
         self.callback_handler.closeOut()
 
+    def showEvent(self, a0: QtGui.QShowEvent) -> None:
+        super().showEvent(a0)
+        self.sourceKeysChanged = True  # Data might have changed while we were hidden
+
     def popOut(self):
         """
         Hide ourself and ask the base GUI to make a new copy in a new window
@@ -163,6 +171,11 @@ class CustomQWidgetBase(QFrame):
         """Called by the tab every loop.  DO NOT OVERRIDE"""
         self.vehicleData = vehicle_data
         self.updated_data_dictionary = updated_data
+
+        if self.onlyUpdateOnSourceKeyChange and not self.sourceKeysChanged and not self.hasUpdatedSourceKeys():
+            return []
+        self.sourceKeysChanged = False
+
         self.updateData(vehicle_data, updated_data)
         self.updateConsole(console_data)
         self.coreUpdate()
@@ -196,9 +209,11 @@ class CustomQWidgetBase(QFrame):
 
     def addSourceKey(self, internal_id: str, value_type, default_key: str, default_value=None, hide_in_drop_down=False, description=""):
         self.sourceDictionary[internal_id] = SourceKeyData(default_key, value_type, default_value, hide_in_drop_down, description)
+        self.sourceKeysChanged = True
 
     def removeSourceKey(self, internal_key_id):
         del self.sourceDictionary[internal_key_id]
+        self.sourceKeysChanged = True
 
     def getDictValueUsingSourceKey(self, internal_key_id):
         dictionary_key = self.sourceDictionary[internal_key_id].key_name
@@ -227,11 +242,11 @@ class CustomQWidgetBase(QFrame):
 
     def isDictValueUpdated(self, internal_key_id):
         dictionary_key = self.sourceDictionary[internal_key_id].key_name
+        return dictionary_key in self.updated_data_dictionary
 
-        if dictionary_key in self.updated_data_dictionary:
-            return self.updated_data_dictionary[dictionary_key]
-        else:
-            return False
+    def hasUpdatedSourceKeys(self):
+        """True if any key this widget reads through addSourceKey changed since the last GUI loop"""
+        return any(source.key_name in self.updated_data_dictionary for source in self.sourceDictionary.values())
 
     def getValueIfUpdatedUsingSourceKey(self, internal_key_id):
         if self.isDictValueUpdated(internal_key_id):
@@ -242,6 +257,7 @@ class CustomQWidgetBase(QFrame):
 
     def updateDictKeyTarget(self, internal_key_id, new_key):
         self.sourceDictionary[internal_key_id].key_name = new_key
+        self.sourceKeysChanged = True
 
     def getAvailableSourceOptions(self, source):
         value_type = self.sourceDictionary[source].value_type
@@ -4,6 +4,8 @@ Starts up a scroll area that shows all the data in the database dictionary
 from PyQt5.QtGui import QFont
 from PyQt5.QtWidgets import QGridLayout, QLabel, QScrollArea
 
+from src.constants import Constants
+from src.CustomLogging.log_writer import LOG_WRITER
 from src.Widgets.custom_q_widget_base import CustomQWidgetBase
 
 
@@ -28,6 +30,19 @@ class DatabaseView(CustomQWidgetBase):
 
         string += "Callbacks: {0}\n\n".format(self.callback_handler.getAvailableCallbacks())
 
+        string += "Callback queue depth: {0} (max {1})\n".format(self.callback_handler.getQueueDepth(), self.callback_handler.getMaxQueueDepth())
+        callback_stats = self.callback_handler.getCallbackStats()
+        for callback_name in sorted(callback_stats.keys()):
+            stats = callback_stats[callback_name]
+            string += "    {0}: {1} calls, latency {2:.1f} ms average, {3:.1f} ms max\n".format(callback_name, stats.call_count, stats.getAverageLatency() * 1000, stats.max_latency * 1000)
+        string += "\n"
+
+        if Constants.map_tile_manager_key in self.vehicleData:
+            string += "Map tile cache: {}\n\n".format(self.vehicleData[Constants.map_tile_manager_key].get_cache_stats_string())
+            string += "Map tile downloads: {}\n\n".format(self.vehicleData[Constants.map_tile_manager_key].get_download_stats_string())
+
+        string += "Log writer: {}\n\n".format(LOG_WRITER.getStatsString())
+
         keys = list(self.vehicleData.keys())
         keys.sort()
 
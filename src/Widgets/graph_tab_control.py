@@ -16,6 +16,8 @@ from qtrangeslider import QRangeSlider
 
 from src.Widgets import custom_q_widget_base
 
+SLIDER_RESOLUTION = 100000  # Steps on the range slider.  Lots of them, so it can zoom in on a small part of a long recording
+
 
 class GraphTabControl(custom_q_widget_base.CustomQWidgetBase):
     def __init__(self, widget: QWidget = None):
@@ -31,8 +33,8 @@ class GraphTabControl(custom_q_widget_base.CustomQWidgetBase):
         self.historyTextBox.setText("50")
 
         self.rangeSlider = QRangeSlider(Qt.Horizontal)
-        self.rangeSlider.setRange(0, 1000)
-        self.rangeSlider.setSliderPosition([0, 1000])
+        self.rangeSlider.setRange(0, SLIDER_RESOLUTION)
+        self.rangeSlider.setSliderPosition([0, SLIDER_RESOLUTION])
         self.historyTextBox.setMaximumWidth(100)
 
         self.graphs_enabled = True
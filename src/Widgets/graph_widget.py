@@ -1,12 +1,13 @@
 import math
 import time
 from copy import copy
+from typing import Dict
 
 from PyQt5.QtWidgets import QGridLayout, QWidget
 from pyqtgraph import PlotWidget
 
-from src.data_helpers import check_type, first_index_in_list_larger_than
 from src.Modules.DataInterfaceTools.pyqtgraph_helper import get_pen_from_line_number
+from src.time_series_buffer import TimeSeriesBuffer
 from src.Widgets.custom_q_widget_base import CustomQWidgetBase
 
 PEN_COLORS = ["red", "blue", "green", "magenta"]
@@ -53,8 +54,8 @@ class GraphWidget(CustomQWidgetBase):
             source = source_list[i]
             self.addSourceKey("line {}".format(i), float, source, default_value=0)
 
-        self.data_dictionary = {}  # Stores the history for each data field we
-        self.time_dictionary = {}  # Stores the times we've taken data at (the x axis) for each field we track
+        self.series_dictionary: Dict[str, TimeSeriesBuffer] = {}  # Stores the history (times and values) for each data field we track
+        self.recorded_series_sources = {}  # The recorded [data_series, time_series] each series was made from, so they're only converted once
         self.plot_line_dictionary = {}  # Stores the plot line objects
         self.start_time = time.time()
         self.last_update_time = time.time()
@@ -83,54 +84,60 @@ class GraphWidget(CustomQWidgetBase):
     def updateData(self, vehicle_data, updated_data):
         if not self.recorded_data_mode:
             if self.record_new_data:
+                current_time = time.time() - self.start_time
+
                 for source in self.sourceDictionary:
                     value = self.getDictValueUsingSourceKey(source)
-
-                    if source not in self.data_dictionary:
-                        self.data_dictionary[source] = [float("nan")]
-                        self.time_dictionary[source] = [float("nan")]
-                    elif self.auto_range:
+                    try:
+                        value = float(value) if value is not None else None
+                    except (TypeError, ValueError):
+                        value = None  # Can't graph it
+
+                    if source not in self.series_dictionary or source in self.recorded_series_sources:
+                        self.series_dictionary[source] = TimeSeriesBuffer()
+                        self.series_dictionary[source].append(float("nan"), float("nan"))
+                        self.recorded_series_sources.pop(source, None)
+                    elif self.auto_range and value is not None:
                         self.data_range["min"] = min(self.data_range["min"], value)
                         self.data_range["max"] = max(self.data_range["max"], value)
                         self.graphWidget.setYRange(**self.data_range)
 
+                    series = self.series_dictionary[source]
+
                     # <sarcasm> This logic makes perfect sense </sarcasm>
                     # The base goal is to make the last value in the array a nan when the data isn't updated so the graph x axis keeps updating
                     # We need 5 cases because we don't want to overwrite any data, and we don't want NaNs anywhere other than the last spot and a None check
                     if value is None:  # We got invalid data
-                        self.time_dictionary[source][-1] = time.time() - self.start_time
-                    elif self.isDictValueUpdated(source) and math.isnan(self.data_dictionary[source][-1]):  # We got new data this time but not last time
-                        self.data_dictionary[source][-1] = value
-                        self.time_dictionary[source][-1] = time.time() - self.start_time
+                        series.setLast(current_time, series.getLastValue())
+                    elif self.isDictValueUpdated(source) and math.isnan(series.getLastValue()):  # We got new data this time but not last time
+                        series.setLast(current_time, value)
                     elif self.isDictValueUpdated(source):  # We got new data this time and last time
-                        self.data_dictionary[source].append(value)
-                        self.time_dictionary[source].append(time.time() - self.start_time)
-                    elif math.isnan(self.data_dictionary[source][-1]):  # We didn't get new data this time or last time
-                        self.time_dictionary[source][-1] = time.time() - self.start_time
+                        series.append(current_time, value)
+                    elif math.isnan(series.getLastValue()):  # We didn't get new data this time or last time
+                        series.setLast(current_time, series.getLastValue())
                     else:  # We didn't get new data this time, but did last time
-                        self.data_dictionary[source].append(float("nan"))
-                        self.time_dictionary[source].append(time.time() - self.start_time)
-
-                    oldest_allowable_time = time.time() - self.start_time - self.max_time_to_keep
-                    if math.isnan(self.time_dictionary[source][0]):
-                        check_index = 1
-                    else:
-                        check_index = 0
-
-                    if self.max_time_to_keep > 0 and self.time_dictionary[source][check_index] < oldest_allowable_time:
-                        slice_index = first_index_in_list_larger_than(self.time_dictionary[source], oldest_allowable_time)
-                        self.time_dictionary[source] = [oldest_allowable_time] + self.time_dictionary[source][slice_index:]
-                        self.data_dictionary[source] = [float("nan")] + self.data_dictionary[source][slice_index:]
+                        series.append(current_time, float("nan"))
+
+                    if self.max_time_to_keep > 0:
+                        series.discardBefore(current_time - self.max_time_to_keep)
         else:
             for source in self.sourceDictionary:
-                [data_series, time_series] = self.getRecordedDictDataUsingSourceKey(source)
+                recorded_data = self.getRecordedDictDataUsingSourceKey(source)
+                [data_series, time_series] = recorded_data
+
+                # Recorded data doesn't change from loop to loop, so only convert it when we get a different series
+                last_recorded_data = self.recorded_series_sources.get(source)
+                if last_recorded_data is not None and last_recorded_data[0] is data_series and last_recorded_data[1] is time_series:
+                    continue
 
+                series = TimeSeriesBuffer()
                 if len(data_series) > 0 and len(data_series) == len(time_series):
-                    self.data_dictionary[source] = data_series
-                    self.time_dictionary[source] = time_series
+                    series.setData(time_series, data_series)
                 else:
-                    self.data_dictionary[source] = [float("nan")]
-                    self.time_dictionary[source] = [0]
+                    series.setData([0], [float("nan")])
+
+                self.series_dictionary[source] = series
+                self.recorded_series_sources[source] = recorded_data
 
     def updateInFocus(self):
         """Only re-draw graph if we're looking at it"""
@@ -138,7 +145,7 @@ class GraphWidget(CustomQWidgetBase):
 
     def updatePlotStaggered(self):
         """Updates one line at a time"""
-        keys = list(self.data_dictionary.keys())
+        keys = list(self.series_dictionary.keys())
         key = keys[self.plot_line_index]
         num_keys = len(keys)
 
@@ -160,34 +167,45 @@ class GraphWidget(CustomQWidgetBase):
             return
         self.last_update_time = time.time()
 
-        for data_name in self.data_dictionary:
+        for data_name in self.series_dictionary:
             self.updatePlotLine(data_name)
 
     def updatePlotLine(self, data_name):
         data_label = self.sourceDictionary[data_name].key_name
         if data_name not in self.plot_line_dictionary:
-            self.plot_line_dictionary[data_name] = self.graphWidget.plot(self.time_dictionary[data_name], self.data_dictionary[data_name], name=data_label, pen=get_pen_from_line_number(len(self.plot_line_dictionary)))
+            self.plot_line_dictionary[data_name] = self.graphWidget.plot(name=data_label, pen=get_pen_from_line_number(len(self.plot_line_dictionary)))
         if self.plot_line_dictionary[data_name].name() != data_label:
             index = list(self.plot_line_dictionary.keys()).index(data_name)  # The index of the line that we're working on
 
             self.plot_line_dictionary[data_name].opts["name"] = data_label  # Force change theform name of the line
             self.graphWidget.getPlotItem().legend.items[index][1].setText(data_label)  # Change the name of the legend item
-            self.data_dictionary[data_name] = [float("nan")]  # Reset the data history
-            self.time_dictionary[data_name] = [0]
+            self.series_dictionary[data_name] = TimeSeriesBuffer()  # Reset the data history
+            self.series_dictionary[data_name].append(0, float("nan"))
+            self.recorded_series_sources.pop(data_name, None)
+
+        # Views into the buffer go straight to pyqtgraph, limited to the slider range (None means no limit)
+        # Long windows get decimated to about 2 points per pixel, and get more detailed as the window gets smaller
+        [min_x, max_x] = self.getVisibleTimeRange()
+        [time_series, data_series] = self.series_dictionary[data_name].getDecimatedWindow(min_x, max_x, self.getPlotPixelWidth())
 
         # Connect=finite allows NaN values to be skipped
-        if self.min_x is None and self.max_x is None:  # No restrictions
-            self.plot_line_dictionary[data_name].setData(self.time_dictionary[data_name], self.data_dictionary[data_name], connect="finite")
-        elif self.min_x is None:  # No minimum, truncate maximum
-            max_index = first_index_in_list_larger_than(self.time_dictionary[data_name], self.max_x)
-            self.plot_line_dictionary[data_name].setData(self.time_dictionary[data_name][0:max_index], self.data_dictionary[data_name][0:max_index], connect="finite")
-        elif self.max_x is None:  # No maximum, truncate minimum
-            min_index = first_index_in_list_larger_than(self.time_dictionary[data_name], self.min_x)
-            self.plot_line_dictionary[data_name].setData(self.time_dictionary[data_name][min_index:], self.data_dictionary[data_name][min_index:], connect="finite")
-        else:  # Truncate both max and min
-            max_index = first_index_in_list_larger_than(self.time_dictionary[data_name], self.max_x)
-            min_index = first_index_in_list_larger_than(self.time_dictionary[data_name], self.min_x)
-            self.plot_line_dictionary[data_name].setData(self.time_dictionary[data_name][min_index:max_index], self.data_dictionary[data_name][min_index:max_index], connect="finite")
+        self.plot_line_dictionary[data_name].setData(time_series, data_series, connect="finite")
+
+    def getPlotPixelWidth(self):
+        return max(int(self.graphWidget.getPlotItem().vb.width()), 100)
+
+    def getVisibleTimeRange(self):
+        """Slider range, narrowed down to what's on screen if the user zoomed in on the graph itself"""
+        [min_x, max_x] = [self.min_x, self.max_x]
+
+        view_box = self.graphWidget.getPlotItem().vb
+        if not view_box.autoRangeEnabled()[0]:
+            [view_min, view_max] = view_box.viewRange()[0]
+            margin = (view_max - view_min) * 0.5  # Keep some data off screen, so panning doesn't show a gap before the next redraw
+            min_x = view_min - margin if min_x is None else max(min_x, view_min - margin)
+            max_x = view_max + margin if max_x is None else min(max_x, view_max + margin)
+
+        return [min_x, max_x]
 
     def setHistoryLength(self, history_length):
         self.max_time_to_keep = history_length
@@ -218,12 +236,13 @@ class GraphWidget(CustomQWidgetBase):
         self.removeSourceKey(line_name)
         self.graphWidget.getPlotItem().removeItem(self.plot_line_dictionary[line_name])
         self.plot_line_dictionary[line_name].clear()
-        del self.data_dictionary[line_name]
+        self.series_dictionary.pop(line_name, None)
+        self.recorded_series_sources.pop(line_name, None)
         del self.plot_line_dictionary[line_name]
 
     def clearGraph(self):
-        self.time_dictionary = {}
-        self.data_dictionary = {}
+        self.series_dictionary = {}
+        self.recorded_series_sources = {}
         self.start_time = time.time()
         self.setToPreset()
 
@@ -233,7 +252,7 @@ class GraphWidget(CustomQWidgetBase):
             self.data_range = copy(self.range_preset)
 
     def getNumberOfLines(self):
-        return len(self.data_dictionary)
+        return len(self.series_dictionary)
 
     def setXAxisBounds(self, min_value, max_value):
         self.min_x = min_value
@@ -241,22 +260,26 @@ class GraphWidget(CustomQWidgetBase):
 
     def getLargestTime(self):
         time_val = -1
-        for key in self.time_dictionary:
-            largest_time = max(self.time_dictionary[key])
+        for key in self.series_dictionary:
+            time_range = self.series_dictionary[key].getTimeRange()
+            if time_range is None:
+                continue
             if time_val == -1:
-                time_val = largest_time
+                time_val = time_range[1]
             else:
-                time_val = max(time_val, largest_time)
+                time_val = max(time_val, time_range[1])
         return time_val
 
     def getSmallestTime(self):
         time_val = -1
-        for key in self.time_dictionary:
-            smallest_time = min(self.time_dictionary[key])
+        for key in self.series_dictionary:
+            time_range = self.series_dictionary[key].getTimeRange()
+            if time_range is None:
+                continue
             if time_val == -1:
-                time_val = smallest_time
+                time_val = time_range[0]
             else:
-                time_val = min(time_val, smallest_time)
+                time_val = min(time_val, time_range[0])
         return time_val
 
     def customUpdateAfterThemeSet(self):
@@ -281,12 +304,9 @@ class GraphWidget(CustomQWidgetBase):
 
     def getAvailableSourceOptions(self, source):
         option_list = super().getAvailableSourceOptions(source)
-        value_type = self.sourceDictionary[source].value_type
 
         if self.recorded_data_mode:
-            for key in self.recordedData:
-                # Check if the first datapoint is castable to float
-                if check_type(self.recordedData[key][1][0], value_type):
-                    option_list.append(key)
+            # Recorded runs only load a key when it's asked for, so don't load every key just to fill in a drop down
+            option_list.extend(self.recordedData.keys())
 
         return option_list
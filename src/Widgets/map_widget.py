@@ -6,12 +6,23 @@ import navpy
 import numpy
 from PyQt5 import QtGui
 from PyQt5.QtCore import QPoint, Qt
-from PyQt5.QtGui import QBrush, QColor, QMouseEvent, QPainter, QPen, QPolygon
+from PyQt5.QtGui import (
+    QBrush,
+    QColor,
+    QMouseEvent,
+    QPainter,
+    QPainterPath,
+    QPen,
+    QPolygon,
+    QPolygonF,
+    QTransform,
+)
 from PyQt5.QtWidgets import QGridLayout, QLabel, QMenu, QWidget
 
 from src.constants import Constants
 from src.data_helpers import (
     distance_between_points,
+    douglas_peucker,
     get_value_from_dictionary,
     interpolate,
 )
@@ -21,6 +32,8 @@ BACKGROUND_COLOR = (255, 144, 30)  # BGR for OpenCV
 
 EXTRA_POSITION_SOURCES = {"egg_finder": [Constants.backup_gps_latitude, Constants.backup_gps_longitude]}
 
+TRAIL_SIMPLIFY_TOLERANCE = 0.5  # Pixels.  Trail points closer than this to the simplified line don't get drawn
+
 
 class MapWidget(CustomQWidgetBase):
     def __init__(self, parent: QWidget = None, points_to_keep=200, update_interval=3):
@@ -346,6 +359,69 @@ class MapImageBackground(QLabel):
         self.setPixmap(convert_to_qt_format)
 
 
+class MapTrail(object):
+    def __init__(self):
+        """
+        A line on the map, like the vehicle's breadcrumb trail.  Points are kept in a numpy array that grows by doubling, so adding one is cheap.
+
+        The line is kept as a QPainterPath in meters, and gets drawn through the painter's transform, so panning and zooming don't
+        touch it.  It only gets remade when the zoom changes by a factor of 2, simplified so zoomed out trails don't draw thousands
+        of overlapping segments.  Points added in between get tacked on the end
+        """
+        self.points = numpy.zeros((256, 2))
+        self.count = 0
+
+        self.path = None
+        self.path_level = None  # Simplification level the path was made for
+        self.path_count = 0  # How many points the path has been given
+
+    def append(self, x, y):
+        if self.count == len(self.points):
+            self.points = numpy.concatenate((self.points, numpy.zeros_like(self.points)))
+        self.points[self.count] = [x, y]
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+        self.path = None
+
+    def getPoints(self):
+        return self.points[: self.count]
+
+    def getLastPoint(self):
+        return self.points[self.count - 1] if self.count > 0 else None
+
+    def __len__(self):
+        return self.count
+
+    def getPath(self, meters_per_pixel) -> QPainterPath:
+        # Points less than TRAIL_SIMPLIFY_TOLERANCE pixels off the line get dropped, rounded down to a power of 2 meters so small zooms reuse the path
+        level = math.floor(math.log2(max(meters_per_pixel * TRAIL_SIMPLIFY_TOLERANCE, 1e-6)))
+
+        if self.path is None or level != self.path_level:
+            points = douglas_peucker(self.getPoints(), 2.0**level)
+
+            # Fill the polygon straight from numpy, QPointF is two doubles
+            polygon = QPolygonF(len(points))
+            if len(points) > 0:
+                buffer = polygon.data()
+                buffer.setsize(len(points) * 16)
+                numpy.frombuffer(buffer, numpy.float64).reshape(-1, 2)[:] = points
+
+            self.path = QPainterPath()
+            self.path.addPolygon(polygon)
+            self.path_level = level
+        else:
+            for [x, y] in self.points[self.path_count : self.count]:
+                if self.path.elementCount() == 0:
+                    self.path.moveTo(x, y)
+                else:
+                    self.path.lineTo(x, y)
+
+        self.path_count = self.count
+        return self.path
+
+
 class MapDrawWidget(QWidget):
     def __init__(self, update_interval):
         """Widget that draws the arrows and lines on top of the map"""
@@ -358,8 +434,8 @@ class MapDrawWidget(QWidget):
 
         self.origin_offset_meters = [0, 0]
 
-        self.oldPoints = []
-        self.paths = {}
+        self.trail = MapTrail()  # Vehicle breadcrumbs, oldest first
+        self.paths = {}  # {name: MapTrail}
         self.opaque_background = True
 
         self.position_dict = {}
@@ -430,36 +506,33 @@ class MapDrawWidget(QWidget):
             painter.setBrush(QBrush(QColor(30, 144, 255), Qt.SolidPattern))
             painter.drawRect(0, 0, self.width(), self.height())
 
-        # Draw paths
-        painter.setPen(QPen(QColor(180, 235, 52), 3, Qt.SolidLine))
-        for pathName in self.paths:
-            path = self.paths[pathName]
-            for i in range(len(path) - 1):
-                [x1, y1] = path[i]
-                [x2, y2] = path[i + 1]
-
-                p1 = self.pointToDrawLocation(x1, y1)
-                p2 = self.pointToDrawLocation(x2, y2)
-                painter.drawLine(p1[0], p1[1], p2[0], p2[1])
+        # Draw paths and old points.  They're in meters, so draw them through the transform from meters to pixels
+        [x_scale, x_offset, y_scale, y_offset] = self.getScreenTransform()
+        meters_per_pixel = 1 / abs(y_scale)
+        painter.save()
+        painter.setTransform(QTransform(x_scale, 0, 0, y_scale, x_offset, y_offset))
+        painter.setBrush(Qt.NoBrush)  # They're open paths, so they'd get filled in otherwise
 
-        # Draw old points
-        painter.setPen(QPen(QColor(10, 10, 10), 1, Qt.SolidLine))
-        for i in range(1, len(self.oldPoints)):
-            point = self.oldPoints[i]
-            lastPoint = self.oldPoints[i - 1]
+        pen = QPen(QColor(180, 235, 52), 3, Qt.SolidLine)
+        pen.setCosmetic(True)  # Width in pixels, not meters
+        painter.setPen(pen)
+        for pathName in self.paths:
+            painter.drawPath(self.paths[pathName].getPath(meters_per_pixel))
 
-            [xPos, yPos] = self.pointToDrawLocation(point[0], point[1])
-            [oldX, oldY] = self.pointToDrawLocation(lastPoint[0], lastPoint[1])
-            painter.drawLine(int(xPos), int(yPos), int(oldX), int(oldY))
+        pen = QPen(QColor(10, 10, 10), 1, Qt.SolidLine)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        painter.drawPath(self.trail.getPath(meters_per_pixel))
+        painter.restore()
 
         # Draw current positions
 
         for position in self.position_dict:
             [xPos, yPos] = self.pointToDrawLocation(self.position_dict[position][0], self.position_dict[position][1])
 
-            if len(self.oldPoints) > 0 and position == "default":
+            if len(self.trail) > 0 and position == "default":
                 painter.setPen(QPen(QColor(10, 10, 10), 1, Qt.SolidLine))
-                lastPoint = self.oldPoints[0]
+                lastPoint = self.trail.getLastPoint()
                 [oldX, oldY] = self.pointToDrawLocation(lastPoint[0], lastPoint[1])
                 painter.drawLine(int(xPos), int(yPos), int(oldX), int(oldY))
 
@@ -530,6 +603,19 @@ class MapDrawWidget(QWidget):
         out_y = interpolate(y, self.min_axis_value - self.origin_offset_meters[1], self.max_axis_value - self.origin_offset_meters[1], self.height() - (self.padding + 10), self.padding)
         return [int(out_x), int(out_y)]
 
+    def getScreenTransform(self):
+        """Returns [x scale, x offset, y scale, y offset] from meters to pixels, the same as pointToDrawLocation() without the rounding"""
+        size_ratio = self.height() / self.width()
+
+        x_min = (self.min_axis_value / size_ratio) - self.origin_offset_meters[0]
+        x_max = (self.max_axis_value / size_ratio) - self.origin_offset_meters[0]
+        y_min = self.min_axis_value - self.origin_offset_meters[1]
+        y_max = self.max_axis_value - self.origin_offset_meters[1]
+
+        x_scale = (self.width() - self.padding - (self.padding + 10)) / (x_max - x_min)
+        y_scale = (self.padding - (self.height() - (self.padding + 10))) / (y_max - y_min)
+        return [x_scale, (self.padding + 10) - x_min * x_scale, y_scale, (self.height() - (self.padding + 10)) - y_min * y_scale]
+
     def drawLocationToPoint(self, x, y):
         """Should be the opposite of the function above"""
         size_ratio = self.height() / self.width()
@@ -553,8 +639,8 @@ class MapDrawWidget(QWidget):
             return
 
         # Get distance to last point in history
-        if len(self.oldPoints) > 0:
-            last_point_in_list = self.oldPoints[0]
+        if len(self.trail) > 0:
+            last_point_in_list = self.trail.getLastPoint()
             distance = distance_between_points(x, y, last_point_in_list[0], last_point_in_list[1])
         else:
             distance = 0
@@ -562,12 +648,11 @@ class MapDrawWidget(QWidget):
         # Update history if we need to
         if x == 0:
             return
-        if len(self.oldPoints) == 0:
-            self.oldPoints = [[x, y]]
+        if len(self.trail) == 0:
+            self.trail.append(x, y)
         else:
             if time.time() > self.lastPointTime + self.newPointInterval or distance > self.newPointSpacing:
-                self.oldPoints = [[x, y]] + self.oldPoints
-                # [:self.pointsToKeep] We keep all the points now
+                self.trail.append(x, y)  # We keep all the points now
                 self.lastPointTime = time.time()
 
         # Figure out how many decimals to use on the axis scales
@@ -581,7 +666,7 @@ class MapDrawWidget(QWidget):
             self.decimals = 0
 
     def clearMap(self):
-        self.oldPoints = []
+        self.trail.clear()
         self.paths = {}
         self.min_axis_value = -10
         self.max_axis_value = 10
@@ -19,6 +19,7 @@ class ModuleConfiguration(CustomQWidgetBase):
         self.loadTimeBoxList = []
         self.enableButtonList = []
         self.hasRecordedDataBoxList = []
+        self.wakeupBoxList = []
         self.moduleNameList = []
 
         self.layout = QGridLayout()
@@ -35,23 +36,27 @@ class ModuleConfiguration(CustomQWidgetBase):
             enabled = line_data[0]
             load_time = line_data[1]
             has_recorded_data = line_data[2]
+            wakeup_rates = line_data[3] if len(line_data) > 3 else [0, 0]
 
             if i >= len(self.nameBoxList):
                 name_box = QLabel()
                 load_time_box = QLabel()
                 enable_button = QPushButton()
                 has_recorded_data_box = QLabel()
+                wakeup_box = QLabel()
 
                 layout_row = len(self.nameBoxList)
                 self.layout.addWidget(name_box, layout_row, 0)
                 self.layout.addWidget(load_time_box, layout_row, 1)
                 self.layout.addWidget(enable_button, layout_row, 2)
-                self.layout.addWidget(has_recorded_data_box, layout_row, 3)
+                self.layout.addWidget(wakeup_box, layout_row, 3)
+                self.layout.addWidget(has_recorded_data_box, layout_row, 4)
 
                 self.nameBoxList.append(name_box)
                 self.loadTimeBoxList.append(load_time_box)
                 self.enableButtonList.append(enable_button)
                 self.hasRecordedDataBoxList.append(has_recorded_data_box)
+                self.wakeupBoxList.append(wakeup_box)
                 self.moduleNameList.append(line_name)
 
                 enable_button.clicked.connect(lambda a, index=i: self.enableButtonCallback(a, index))
@@ -60,6 +65,7 @@ class ModuleConfiguration(CustomQWidgetBase):
             self.setLoadTime(i, load_time)
             self.setEnabledText(i, enabled)
             self.setHasRecordedData(i, has_recorded_data)
+            self.setWakeupRates(i, wakeup_rates)
 
             i += 1
 
@@ -107,6 +113,15 @@ class ModuleConfiguration(CustomQWidgetBase):
             recorded_data_box.adjustSize()
             self.updateStyle(index)
 
+    def setWakeupRates(self, index, wakeup_rates):
+        box_text = "Wakeups: {0:.1f}/s ({1:.1f} idle)".format(wakeup_rates[0], wakeup_rates[1])
+        wakeup_box = self.wakeupBoxList[index]
+
+        if box_text != wakeup_box.text():
+            wakeup_box.setText(box_text)
+            wakeup_box.adjustSize()
+            self.updateStyle(index)
+
     def customUpdateAfterThemeSet(self):
         for i in range(len(self.nameBoxList)):
             self.updateStyle(i)
@@ -115,10 +130,13 @@ class ModuleConfiguration(CustomQWidgetBase):
         name_box = self.nameBoxList[index]
         load_time_box = self.loadTimeBoxList[index]
         has_recorded_data_box = self.hasRecordedDataBoxList[index]
+        wakeup_box = self.wakeupBoxList[index]
 
         name_box.setAlignment(QtCore.Qt.AlignVCenter)
         name_box.setStyleSheet("font: 12pt")
         load_time_box.setAlignment(QtCore.Qt.AlignVCenter)
         load_time_box.setStyleSheet("font: 12pt")
+        wakeup_box.setAlignment(QtCore.Qt.AlignVCenter)
+        wakeup_box.setStyleSheet("font: 12pt")
         has_recorded_data_box.setAlignment(QtCore.Qt.AlignVCenter | QtCore.Qt.AlignRight)
         has_recorded_data_box.setStyleSheet("font: 12pt")
@@ -8,7 +8,6 @@ import sys
 from os import listdir
 from os.path import isfile, join
 
-import pandas as pd
 import pyqtgraph
 from PyQt5 import QtCore
 from PyQt5.QtCore import Qt
@@ -29,6 +28,7 @@ from src.constants import Constants
 from src.data_helpers import first_index_in_list_larger_than, interpolate
 from src.Modules.DataInterfaceTools.pyqtgraph_helper import get_pen_from_line_number
 from src.python_avionics.model.fcb_offload_analyzer import FcbOffloadAnalyzer
+from src.python_avionics.model.offload_csv_cache import read_csv_cached
 from src.Widgets import custom_q_widget_base
 
 
@@ -271,7 +271,7 @@ class OffloadGraphWidget(custom_q_widget_base.CustomQWidgetBase):
         self.raw_file_path = os.path.join("output", f"{flightName}-output-FCB.csv")
         if not os.path.exists(self.raw_file_path):
             return
-        csv = pd.read_csv(self.raw_file_path)
+        csv = read_csv_cached(self.raw_file_path)
         self.raw_file = csv
 
         # Hack since timestamp_s is in ms
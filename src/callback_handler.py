@@ -3,19 +3,53 @@ Class that handles callbacks across the GUI
 
 Exploits class variables so that you can make as many instances of this as you want, and they will all share the same queue and callback list.
 Just don't call processCallbacks anywhere other than the main loop.
+
+requestCallback can be called from any thread.  The data is handed to the callback functions as-is (not copied), so don't change it after requesting the callback.
 """
 
-import copy
-from typing import List
+import collections
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+CALLBACK_TIME_BUDGET = 0.005  # Most time (in seconds) processCallbacks spends each GUI loop.  Whatever's left over waits for the next loop
+
+
+class CallbackStats(object):
+    """Counters for one callback name"""
+
+    def __init__(self):
+        self.call_count = 0
+        self.total_latency = 0.0  # Time between requestCallback and the callback running, summed over every call
+        self.max_latency = 0.0
+
+    def addCall(self, latency):
+        self.call_count += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def getAverageLatency(self):
+        if self.call_count == 0:
+            return 0.0
+        return self.total_latency / self.call_count
 
 
 class CallbackHandler(object):
     # Having these as class variables means they're shared across objects
-    callback_functions = {}  # Dictionary of list of callback functions that can be called from any widget.  These are typically added by modules.  {callback_name: [function_pointer, pointer, ...], ...}
-    callback_queue = []  # List of callback function names to call.  These are called in the GUI thread during the update() function
+    # Callback functions that can be called from any widget.  These are typically added by modules.  {callback_name: (function_pointer, pointer, ...), ...}
+    # The tuples are replaced instead of changed, so processCallbacks can loop over them without holding the lock
+    callback_functions: Dict[str, Tuple[Callable, ...]] = {}
+    registration_lock = threading.RLock()  # Reentrant, since __del__ can end up calling closeOut while we hold it
+
+    # [callback_name, data, request_time] for each requested callback.  These are called in the GUI thread during the update() function
+    # deque appends and pops are atomic, so any thread can request callbacks without a lock
+    callback_queue = collections.deque()
+
+    callback_stats: Dict[str, CallbackStats] = collections.defaultdict(CallbackStats)
+    max_queue_depth = 0
 
     def __init__(self):
-        self.own_callback_fns = {}
+        self.own_callback_fns: Dict[str, List[Callable]] = {}
 
     def __del__(self):
         self.closeOut()
@@ -26,43 +60,66 @@ class CallbackHandler(object):
         That way whatever added those callbacks can be safely deleted also
         """
 
-        for callback in self.own_callback_fns:
-            index = self.own_callback_fns[callback]
-            self.callback_functions[callback][index] = None
+        with self.registration_lock:
+            for callback in self.own_callback_fns:
+                if callback not in self.callback_functions:
+                    continue
+
+                own_functions = self.own_callback_fns[callback]
+                remaining = tuple(function for function in self.callback_functions[callback] if not any(function is own for own in own_functions))
+                if remaining:
+                    self.callback_functions[callback] = remaining
+                else:
+                    del self.callback_functions[callback]
+
+            self.own_callback_fns = {}
 
     def requestCallback(self, callback_name: str, data):
-        self.callback_queue += [[callback_name, data]]
+        self.callback_queue.append([callback_name, data, time.time()])
 
     def requestMultipleCallbacks(self, callbacks: List):
-        self.callback_queue += callbacks
+        request_time = time.time()
+        self.callback_queue.extend([[callback[0], callback[1], request_time] for callback in callbacks])
 
     def processCallbacks(self):
-        callbacks = copy.deepcopy(self.callback_queue)
-        self.callback_queue.clear()
-
-        for callback_data in callbacks:
-            callback_name = callback_data[0]
-            if callback_name in self.callback_functions:
-                # print("Processing callback {}".format(callback_name))
-                callback_list = self.callback_functions[callback_name]
-                for callback_function in callback_list:
-                    if callback_function is not None:
-                        try:
-                            callback_function(callback_data[1])  # <sarcasm>What amazingly clean code</sarcasm>
-                        except Exception as e:
-                            print("Unable to call callback {0}: [{1}]".format(callback_name, e))
-            else:
-                pass
-                # print("{} isn't a valid callback".format(callback_data[0]))  # Debugging code
-                # print(callback_name, callback_data[1])
-                # print(list(self.callback_functions.keys()))
+        # Only process callbacks that were already queued, so callbacks that request more callbacks can't keep us here forever
+        queue_depth = len(self.callback_queue)
+        CallbackHandler.max_queue_depth = max(CallbackHandler.max_queue_depth, queue_depth)
 
-    def addCallback(self, target: str, callback: callable):
-        if target not in self.callback_functions:
-            self.callback_functions[target] = []
+        start_time = time.time()
+        for _ in range(queue_depth):
+            if time.time() - start_time > CALLBACK_TIME_BUDGET:
+                break  # Out of time for this loop, leave the rest in the queue
+
+            [callback_name, data, request_time] = self.callback_queue.popleft()
+            callback_list = self.callback_functions.get(callback_name)
+            if callback_list is None:
+                # print("{} isn't a valid callback".format(callback_name))  # Debugging code
+                continue
+
+            self.callback_stats[callback_name].addCall(time.time() - request_time)
 
-        self.callback_functions[target].append(callback)
-        self.own_callback_fns[target] = len(self.callback_functions[target]) - 1
+            # print("Processing callback {}".format(callback_name))
+            for callback_function in callback_list:
+                try:
+                    callback_function(data)
+                except Exception as e:
+                    print("Unable to call callback {0}: [{1}]".format(callback_name, e))
+
+    def addCallback(self, target: str, callback: callable):
+        with self.registration_lock:
+            self.callback_functions[target] = self.callback_functions.get(target, ()) + (callback,)
+        self.own_callback_fns.setdefault(target, []).append(callback)
 
     def getAvailableCallbacks(self) -> list:
         return list(self.callback_functions.keys())
+
+    def getQueueDepth(self) -> int:
+        return len(self.callback_queue)
+
+    def getMaxQueueDepth(self) -> int:
+        return self.max_queue_depth
+
+    def getCallbackStats(self) -> Dict[str, CallbackStats]:
+        """{callback_name: CallbackStats} for every callback that has been called"""
+        return dict(self.callback_stats)
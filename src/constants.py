@@ -92,6 +92,7 @@ class Constants:
     radio_id_key = "radio_id"
     radio_id_string = "radio_name"
     loop_time_key = "gui_loop_time"
+    idle_wakeups_key = "idle_module_wakeups_per_second"
 
     primary_annunciator = "annunciator_1"
     primary_reconfigure = "primary_reconfigure"
@@ -99,6 +100,7 @@ class Constants:
     cli_interface_usb_command_key = "cli_interface_usb"
     cli_interface_usb_result_key = "cli_interface_usb_result"
     cli_interface_usb_command_running = "fcb_cli_command_running"
+    cli_offload_progress_key = "fcb_offload_progress"
     cli_string_key = "cli_string"
     usb_gps_string_key = "gps_string"
     cli_flights_list_key = "fcb_flights_list"
@@ -191,6 +193,10 @@ class Constants:
     def makeLineCutterString(line_cutter_number, line_cutter_key):
         return "line_cutter_{0}_{1}".format(line_cutter_number, line_cutter_key)
 
+    @staticmethod
+    def makeRadioString(radio_id, key):
+        return "radio_{0}_{1}".format(radio_id, key)
+
     @staticmethod
     def makeDiagnosticsKey(source_name, page_name):
         return f"{Constants.diagnostics_key}/{source_name}/{page_name}"
@@ -0,0 +1,90 @@
+"""
+Data bus between the modules and the GUI
+
+Modules publish deltas (only the keys that changed) into the bus from their own threads.  Once per GUI loop, the GUI collects
+the keys that changed since the last loop, so the cost of each loop scales with how much data changed instead of with how big
+the database is.
+"""
+
+import threading
+
+
+class ModuleDataDictionary(dict):
+    """
+    The dictionary modules put new data in.
+
+    Behaves like a normal dict for the module, but writes and the GUI draining it are done under a lock, so data written while
+    the GUI is grabbing it doesn't get lost, and the GUI never iterates it while it's changing size.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.write_count = 0  # Lets the module tell if anything was written, even after the GUI drained it
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+            self.write_count += 1
+
+    def update(self, *args, **kwargs):
+        with self.lock:
+            super().update(*args, **kwargs)
+            self.write_count += 1
+
+    def drain(self) -> dict:
+        """Returns everything written since the last drain, and empties the dictionary"""
+        with self.lock:
+            data = dict(self)
+            self.clear()
+        return data
+
+
+class DataBus(object):
+    def __init__(self):
+        """
+        Thread safe key/value store that keeps track of which keys changed.
+
+        publish() can be called from any thread.  collectChanges() should only be called from the GUI thread, once per loop.
+        """
+
+        self.lock = threading.Lock()
+        self.values = {}  # Latest value for every key
+        self.pending_changes = {}  # {key: value} changed since the last collectChanges
+
+    def publish(self, delta: dict):
+        """Adds a dictionary of changed values to the bus"""
+        if not delta:
+            return
+
+        with self.lock:
+            self.values.update(delta)
+            self.pending_changes.update(delta)
+
+    def collectChanges(self) -> dict:
+        """Returns {key: value} for every key that changed since the last time this was called"""
+        with self.lock:
+            changes = self.pending_changes
+            self.pending_changes = {}
+        return changes
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        # Iterate over a copy, since other threads can add keys while we're iterating
+        with self.lock:
+            keys = list(self.values.keys())
+        return iter(keys)
+
+    def keys(self):
+        return list(iter(self))
@@ -78,6 +78,49 @@ def interpolate(value, in_min, in_max, out_min, out_max):
     return out_min + (scaled * out_span)
 
 
+def douglas_peucker(points: numpy.ndarray, tolerance: float) -> numpy.ndarray:
+    """
+    Simplifies a line of [[x, y], ...] points, dropping the ones that are less than [tolerance] away from the simplified line.
+    The first and last points are always kept.
+
+    Instead of recursing on one section at a time, every section that still needs splitting gets split each pass, with numpy
+    doing the distance math for all of them at once.  Noisy lines (like GPS on foot) split into thousands of sections
+    """
+
+    if len(points) < 3:
+        return points
+
+    keep = numpy.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    active = numpy.arange(1, len(points) - 1)  # Points in sections that might still need splitting
+
+    while len(active) > 0:
+        kept = numpy.flatnonzero(keep)
+        section = numpy.searchsorted(kept, active) - 1  # Section n goes from kept[n] to kept[n + 1]
+
+        # Distance from each point to the line through the ends of its section
+        start = points[kept[section]]
+        line = points[kept[section + 1]] - start
+        offset = points[active] - start
+        line_length = numpy.hypot(line[:, 0], line[:, 1])
+        distances = numpy.hypot(offset[:, 0], offset[:, 1])
+        has_length = line_length > 0
+        distances[has_length] = numpy.abs(line[has_length, 0] * offset[has_length, 1] - line[has_length, 1] * offset[has_length, 0]) / line_length[has_length]
+
+        # Active points are sorted, so each section's points are next to each other
+        new_section = numpy.r_[True, section[1:] != section[:-1]]
+        section_max = numpy.maximum.reduceat(distances, numpy.flatnonzero(new_section))[numpy.cumsum(new_section) - 1]
+
+        # Split each section that's too far off at its farthest point (the first one, if there's a tie)
+        farthest = numpy.flatnonzero((distances > tolerance) & (distances == section_max))
+        [_, first] = numpy.unique(section[farthest], return_index=True)
+        keep[active[farthest[first]]] = True
+
+        active = active[(section_max > tolerance) & ~keep[active]]
+
+    return points[keep]
+
+
 def nearest_multiple(value, base):
     """Returns the nearest multiple of [base] to [value]"""
 
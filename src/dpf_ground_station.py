@@ -20,6 +20,7 @@ from src.callback_handler import CallbackHandler
 from src.config import ConfigSaver
 from src.constants import Constants
 from src.CustomLogging.dpf_logger import MAIN_GUI_LOGGER
+from src.data_bus import DataBus
 from src.Modules.module_core import ThreadedModuleCore
 from src.usb_device_tools import get_port_list_with_fancy_names
 from src.Widgets import (
@@ -92,10 +93,12 @@ class DPFGUI:
 
         self.GUIStopCommanded = False  # Currently not used, but can be set to True to stop the GUI in the correct thread
 
-        # This could use some restructuring
-        # Big dictionary that contains the overall database all the widgets draw from
-        self.database_dictionary = {}
-        # Tracks which keys are new since the last GUI loop
+        # Store that modules' new data gets published into.  Only the GUI thread publishes to it, from updateGUI
+        self.data_bus = DataBus()
+        # Big dictionary that contains the overall database all the widgets draw from (the latest value of every key on the bus)
+        # Read only, anything that changes it has to go through updateDatabaseDictionary so the change gets tracked
+        self.database_dictionary = self.data_bus.values
+        # Tracks which keys are new since the last GUI loop {key: new_value}
         self.updated_data_dictionary = {}
         # List of log messages in primary console [[message, level], []...]
         self.ConsoleData = [[]]
@@ -103,6 +106,9 @@ class DPFGUI:
         self.module_dictionary: Dict[str, ThreadedModuleCore] = {}
         # Dictionary of module load times {module_name: load_time, ...}
         self.module_load_time_dictionary = {}
+        # Dictionary of how often each module's thread wakes up {module_name: [wakeups_per_second, idle_wakeups_per_second], ...}
+        self.module_wakeup_rates = {}
+        self.last_wakeup_rate_time = time.time()
         # List of modules that we don't provide a drop-down option to enable or disable
         self.hidden_modules = []
         self.playback_data_sources = []
@@ -430,7 +436,12 @@ class DPFGUI:
 
         module_data = {}
 
-        # Get data from interfaces
+        # Wakeup rates are averaged over a second, so they don't jump around
+        update_wakeup_rates = time.time() - self.last_wakeup_rate_time > 1
+        if update_wakeup_rates:
+            self.last_wakeup_rate_time = time.time()
+
+        # Get data from interfaces.  Modules only hand over the keys that changed since the last loop
         for interface in self.module_dictionary:
             interface_object = self.module_dictionary[interface]
             if interface_object.hasRecordedData():
@@ -439,18 +450,19 @@ class DPFGUI:
 
                 self.playback_data_sources.sort(reverse=True)
             self.updateDatabaseDictionary(interface_object.getDataDictionary())
+            self.updateReconfigureOptions(Constants.primary_reconfigure, interface_object.getReconfigureDictionary())
 
-            module_data[interface] = [interface_object.enabled, self.module_load_time_dictionary[interface], interface_object.hasRecordedData()]
+            if update_wakeup_rates or interface not in self.module_wakeup_rates:
+                self.module_wakeup_rates[interface] = interface_object.getWakeUpRates()
 
-        # Send full database dictionary back to the data interfaces
-        for interface in self.module_dictionary:
-            try:
-                self.module_dictionary[interface].setFullDataDictionary(self.database_dictionary)
-                self.updateReconfigureOptions(Constants.primary_reconfigure, self.module_dictionary[interface].getReconfigureDictionary())
-            except RuntimeError:  # Sometimes there's a "dictionary changed size during iteration" error here that I don't want to debug
-                pass
+            module_data[interface] = [interface_object.enabled, self.module_load_time_dictionary[interface], interface_object.hasRecordedData(), self.module_wakeup_rates[interface]]
 
-        self.database_dictionary[Constants.module_data_key] = module_data
+        self.updateDatabaseDictionary({Constants.module_data_key: module_data})
+        if update_wakeup_rates:
+            self.updateDatabaseDictionary({Constants.idle_wakeups_key: sum(rates[1] for rates in self.module_wakeup_rates.values())})
+
+        # Everything that changed since the last loop, and nothing else
+        self.updated_data_dictionary = self.data_bus.collectChanges()
 
         # Update tabs
         tab_index_to_remove = -1
@@ -470,23 +482,20 @@ class DPFGUI:
         # Process callbacks
         self.callback_handler.processCallbacks()
 
-        # Set every field as not-updated
-        for key in self.updated_data_dictionary:
-            self.updated_data_dictionary[key] = False
-
-        self.database_dictionary[Constants.loop_time_key] = time.time() - start_time
-        self.updated_data_dictionary[Constants.loop_time_key] = True
+        # Goes out with next loop's changes
+        self.updateDatabaseDictionary({Constants.loop_time_key: time.time() - start_time})
 
     def updateReconfigureOptions(self, database_dict_target, new_data):
-        if database_dict_target not in self.database_dictionary:
-            self.database_dictionary[database_dict_target] = {}
+        # Every module hands these over every loop, so only publish when something actually changed
+        current_options = self.data_bus.get(database_dict_target)
+        new_options = dict(current_options or {})
+        new_options.update(new_data)
 
-        self.database_dictionary[database_dict_target].update(new_data)
+        if new_options != current_options:
+            self.updateDatabaseDictionary({database_dict_target: new_options})
 
     def updateDatabaseDictionary(self, new_dict: dict):
-        for key in new_dict:
-            self.database_dictionary[key] = new_dict[key]
-            self.updated_data_dictionary[key] = True
+        self.data_bus.publish(new_dict)
 
     def makeNewWidgetInCurrentTab(self, name):
         if name in self.widgetClasses:
@@ -631,6 +640,7 @@ class DPFGUI:
 
             interface_object = interface_class()
             interface_object.setEnabled(enabled)
+            interface_object.setFullDataDictionary(self.data_bus)  # Modules keep a reference, so this only has to happen once
 
             interface_object.start()
 
@@ -7,13 +7,16 @@ import struct
 import sys
 import time
 import typing
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 from collections import namedtuple
-from typing import Any, List
+from typing import Any, Callable, List, Optional
 
+import numpy as np
 import pandas as pd
 
 from src.python_avionics.exceptions import FcbIncompleteError, FcbNoAckError
+from src.python_avionics.model.offload_csv_cache import cache_dataframe, read_csv_cached
+from src.python_avionics.model.offload_transfer import OffloadProgress, OffloadTransfer
 from src.python_avionics.model.serial_port import SerialPort, SerialPortManager
 from src.python_avionics.view.console_view import ConsoleView
 
@@ -38,13 +41,16 @@ class FcbCli:
 
     LOG_TYPES = ["FCB", "LINECUTTER"]
 
-    def __init__(self, serial_port: SerialPort):
+    def __init__(self, serial_port: SerialPort, offload_progress_cb: Optional[Callable[[OffloadProgress], None]] = None):
         """
         Initialize an FCB instance.
 
         :param serial_port: Serial port to use to communicate with FCB CLI
+        :param offload_progress_cb: Called with byte and throughput counters while an offload transfer runs
         """
         self.serial_port = serial_port
+        self.offload_progress_cb = offload_progress_cb
+        self.last_command_time_s = 0.0  # How long the last run_command took, from sending it to getting the full response
 
     def _read_ack(self) -> bool:
         """
@@ -52,22 +58,27 @@ class FcbCli:
 
         :return: Whether acknowledgement was found or not
         """
-        rx_data = self.serial_port.read(size=len(self._ACK))
+        rx_data = self.serial_port.read_until(self._ACK.encode("utf-8"))
         if rx_data is None:
             print("Ack got no data?")
             return False
 
         print(f"Ack got {rx_data.decode('utf-8')}")
-        return rx_data.decode("utf-8") == self._ACK
+        return True
 
-    def _has_complete(self, search_str: str) -> bool:
+    def _read_complete(self, fcb_command: str, timeout_s: float = 2, on_data: Optional[Callable[[bytes], None]] = None) -> str:
         """
-        Return whether given string ends with complete identifier
+        Read a response up to and including the complete identifier.
 
-        :param search_str: String to search
-        :return: Whether complete identifier was found
+        :param fcb_command: Command the response is for, for errors
+        :param timeout_s: Give up once this long goes by without any new data
+        :param on_data: Called with each new chunk of data as it comes in
+        :return: Response string
         """
-        return search_str.endswith(self._COMPLETE)
+        rx_data = self.serial_port.read_until(self._COMPLETE.encode("utf-8"), timeout_s=timeout_s, on_data=on_data)
+        if rx_data is None:
+            raise FcbIncompleteError(fcb_command=fcb_command)
+        return rx_data.decode("utf-8")
 
     def run_command(self, command: str) -> Any:
         """
@@ -131,18 +142,30 @@ class FcbCli:
         commands = shlex.split(command, posix=False)
         parsed_args, commands = command_parser.parse_known_args(commands)
 
-        # Run appropriate function based on given command and arguments
+        start_time = time.time()
+        try:
+            return self._run_parsed_command(parsed_args)
+        finally:
+            self.last_command_time_s = time.time() - start_time
+
+    def _run_parsed_command(self, parsed_args: Namespace) -> Any:
+        """
+        Run the function for an already parsed command.
+
+        :param parsed_args: Arguments from run_command's parser
+        :return: Return value from command, or None if no command matched
+        """
         if parsed_args.command == "help":
             return self.run_help()
         if parsed_args.command == "offload":
             if parsed_args.list:
                 return self.run_offload_help()
             else:
-                self.run_offload(
+                decode_summary = self.run_offload(
                     flight_name=parsed_args.flight_name,
                     flight_num=parsed_args.flight_num,
                 )
-            return "Success"
+                return f"Success. {decode_summary}"
         if parsed_args.command == "sense":
             return self.run_sense()
         if parsed_args.command == "sim":
@@ -173,28 +196,15 @@ class FcbCli:
         self.serial_port.write(self._linebreak(self._HELP_COMMAND).encode("utf-8"))
         if not self._read_ack():
             raise FcbNoAckError(fcb_command=self._HELP_COMMAND)
-        help_bytes = self.serial_port.read(size=10000)
-        help_str = "" if not help_bytes else help_bytes.decode("utf-8")
-        if not self._has_complete(search_str=help_str):
-            raise FcbIncompleteError(fcb_command=self._HELP_COMMAND)
+        help_str = self._read_complete(fcb_command=self._HELP_COMMAND)
         return help_str.strip(self._COMPLETE)
 
     def read_until_complete(self) -> typing.Tuple[typing.Union[str, None], bool]:
-        # Loop until timeout hits, returning early if the string ends with the complete string
-
-        startTime = time.time()
-        TIMEOUT = 2
-        ret_str = ""
-        while time.time() - startTime < TIMEOUT:
-            byte_in = self.serial_port.read(1)
-            if not byte_in:
-                return (None, False)
-            ret_str += byte_in.decode("utf-8")
-
-            if self._has_complete(search_str=ret_str):
-                return (ret_str, True)
-
-        return (None, False)
+        # Read until the complete string shows up, or 2 seconds go by without any data
+        rx_data = self.serial_port.read_until(self._COMPLETE.encode("utf-8"), timeout_s=2)
+        if rx_data is None:
+            return (None, False)
+        return (rx_data.decode("utf-8"), True)
 
     def run_offload_help(self) -> str:
         # Seems like we need a flush here to get rid of extra data hiding in the rx buffer
@@ -215,52 +225,36 @@ class FcbCli:
         help_str = help_str.strip(self._COMPLETE)
         return help_str
 
-    def run_offload(self, flight_name: str, flight_num: int) -> None:
+    def run_offload(self, flight_name: str, flight_num: int) -> str:
         """
         Manage data offload on the FCB.
 
         :param flight_name: Name of flight, used in saving output
         :param flight_num: Flight number as reported by FCB in run_offload_help
+        :return: Summary of the decoded records
         """
 
-        # Seems like we need a flush here to get rid of extra data hiding in the rx buffer
-        # without this we sometimes get leftover data from the last CLI command
-        self.serial_port.flush()
-
-        # Start offloading provided flight number
-        self.serial_port.write(self._linebreak(self._OFFLOAD_FLIGHT_COMMAND.format(flight_num=flight_num)).encode("utf-8"))
-        if not self._read_ack():
-            raise FcbNoAckError(fcb_command=self._OFFLOAD_FLIGHT_COMMAND)
-
-        # Offload into output binary file
+        # Offload into output binary file.  A .part file left over from a failed offload of this flight gets resumed
         if not os.path.isdir("output"):
             os.makedirs("output")
         output_bin_filepath = os.path.join("output", f"{flight_name}-output.bin")
         if os.path.isfile(output_bin_filepath):
             raise FileExistsError(output_bin_filepath)
-        k_read_size = 2048
-        with open(output_bin_filepath, "wb") as output_bin_file:
-            while True:
-                byte_array = self.serial_port.read(size=k_read_size)
-                if not byte_array:
-                    raise FcbIncompleteError(fcb_command=self._OFFLOAD_FLIGHT_COMMAND)
-                output_bin_file.write(byte_array)
-                if len(byte_array) < k_read_size:
-                    break
-
-        # Ensure offload is complete. Must read here since complete message could be
-        # split between the last two reads
-        with open(output_bin_filepath, "rb") as output_bin_file:
-            output_bin_file.seek(-len(self._COMPLETE), os.SEEK_END)
-            complete_str = output_bin_file.read().decode("utf-8")
-        if complete_str != self._COMPLETE:
-            raise FcbIncompleteError(fcb_command=self._OFFLOAD_FLIGHT_COMMAND)
+
+        def start_offload() -> None:
+            # Start offloading provided flight number. The transfer flushes the rx buffer before each attempt
+            self.serial_port.write(self._linebreak(self._OFFLOAD_FLIGHT_COMMAND.format(flight_num=flight_num)).encode("utf-8"))
+            if not self._read_ack():
+                raise FcbNoAckError(fcb_command=self._OFFLOAD_FLIGHT_COMMAND)
+
+        transfer = OffloadTransfer(self.serial_port, output_bin_filepath, self._COMPLETE.encode("utf-8"), progress_cb=self.offload_progress_cb)
+        transfer.run(start_offload)
 
         # Read binary file metadata
-        input_bin_file = open(output_bin_filepath, "rb")
         metadata_struct_str = f"<{''.join([prop.unpack_str for prop in self._metadata_struct])}"
         metadata_struct_size = struct.Struct(metadata_struct_str).size
-        packed_data = input_bin_file.read(metadata_struct_size)
+        with open(output_bin_filepath, "rb") as input_bin_file:
+            packed_data = input_bin_file.read(metadata_struct_size)
         if len(packed_data) == 0:
             raise RuntimeError("No metadata read from FCB")
         unpacked_data = struct.unpack(metadata_struct_str, packed_data)
@@ -270,36 +264,71 @@ class FcbCli:
         output_json_filepath = os.path.join("output", f"{flight_name}-metadata.json")
         if os.path.isfile(output_json_filepath):
             raise FileExistsError(output_json_filepath)
-        output_json_file = open(output_json_filepath, "w", newline="")
-        json_dict = dict([(element.name, value) for element, value in zip(self._metadata_struct, unpacked_data)])
-        json.dump(json_dict, output_json_file, indent=4)
+        with open(output_json_filepath, "w", newline="") as output_json_file:
+            json_dict = dict([(element.name, value) for element, value in zip(self._metadata_struct, unpacked_data)])
+            json.dump(json_dict, output_json_file, indent=4)
+
+        return self.decode_offload_bin(output_bin_filepath, flight_name, metadata_struct_size)
+
+    def decode_offload_bin(self, bin_filepath: str, flight_name: str, data_start: int) -> str:
+        """
+        Decode log records from an offloaded binary file, and save one CSV (plus its columnar cache) per log type.
+
+        Records are fixed size slots the size of the largest log type, with the packet type in the first byte.  The whole file
+        is viewed as a 2D array of slots, so each log type is decoded in one go instead of a struct.unpack per record.
 
-        # Open and read binary file line by line, saving to csvs
+        :param bin_filepath: Path to the offloaded binary file
+        :param flight_name: Name of flight, used in saving output
+        :param data_start: Byte offset the log records start at (after the metadata)
+        :return: Summary of how many records were decoded and how long it took
+        """
         output_csv_filepaths = [os.path.join("output", f"{flight_name}-output-{log_type}.csv") for log_type in self.LOG_TYPES]
         for filepath in output_csv_filepaths:
             if os.path.isfile(filepath):
                 raise FileExistsError(filepath)
-        output_csv_files = [open(filepath, "w", newline="") for filepath in output_csv_filepaths]
-        csv_writers = [csv.writer(csv_file) for csv_file in output_csv_files]
-        log_struct_strs: List[str] = ["" for _ in self.LOG_TYPES]
-        log_struct_sizes: List[int] = [0 for _ in self.LOG_TYPES]
-        for i, _ in enumerate(self.LOG_TYPES):
-            csv_writers[i].writerow([prop.name for prop in self._log_data_struct[i]])
-            log_struct_strs[i] = f"<{''.join([prop.unpack_str for prop in self._log_data_struct[i]])}"
-            log_struct_sizes[i] = struct.Struct(log_struct_strs[i]).size
-        log_struct_full_size = max(log_struct_sizes)
-        while True:
-            packed_data = input_bin_file.read(log_struct_full_size)
-            if len(packed_data) == 0:
-                break
-            try:
-                packet_type = int(packed_data[0])
-                unpacked_data = struct.unpack(log_struct_strs[packet_type], packed_data[0 : log_struct_sizes[packet_type]])
-            except (struct.error, IndexError):
-                continue
+
+        start_time = time.time()
+        log_dtypes = [_unpack_properties_to_dtype(self._log_data_struct[i]) for i, _ in enumerate(self.LOG_TYPES)]
+        log_struct_full_size = max(dtype.itemsize for dtype in log_dtypes)
+
+        bin_data = np.memmap(bin_filepath, dtype=np.uint8, mode="r")
+        records = bin_data[data_start:]
+        record_count = len(records) // log_struct_full_size
+        slots = records[: record_count * log_struct_full_size].reshape(record_count, log_struct_full_size)
+
+        # The last slot can be cut short, but is still good if it's long enough for its own packet type
+        tail = records[record_count * log_struct_full_size :]
+        if len(tail) > 0 and tail[0] < len(log_dtypes) and len(tail) >= log_dtypes[tail[0]].itemsize:
+            padded_tail = np.zeros((1, log_struct_full_size), dtype=np.uint8)
+            padded_tail[0, : len(tail)] = tail
+            slots = np.concatenate([slots, padded_tail])
+
+        summary = []
+        packet_types = slots[:, 0]
+        for i, log_type in enumerate(self.LOG_TYPES):
+            # Anything that isn't a known packet type (like erased flash or the complete string) never matches a mask
+            dtype = log_dtypes[i]
+            names = [prop.name for prop in self._log_data_struct[i]]  # Same as dtype.names, which mypy only knows as Optional
+            decoded = np.ascontiguousarray(slots[packet_types == i, : dtype.itemsize]).view(dtype).reshape(-1)
+
             # Only keep things if timestamp isn't 0xFF
-            if unpacked_data[1] < (2 << 32) - 1:
-                csv_writers[packet_type].writerow(unpacked_data)
+            timestamp_name = names[1]
+            decoded = decoded[decoded[timestamp_name] != np.iinfo(dtype[timestamp_name]).max]
+
+            # Formatting the numbers is most of the work left, and csv.writer does that faster than DataFrame.to_csv
+            with open(output_csv_filepaths[i], "w", newline="") as output_csv_file:
+                csv_writer = csv.writer(output_csv_file)
+                csv_writer.writerow(names)
+                csv_writer.writerows(decoded.tolist())
+
+            # Widen everything to what pd.read_csv would give back, so the columnar cache matches the CSV exactly
+            df = pd.DataFrame({name: decoded[name].astype(np.float64 if dtype[name].kind == "f" else np.int64) for name in names})
+            cache_dataframe(output_csv_filepaths[i], df)
+
+            summary.append(f"{len(decoded)} {log_type}")
+
+        del bin_data
+        return f"Decoded {' and '.join(summary)} records in {time.time() - start_time:.2f} s"
 
     def run_erase(self) -> None:
         """
@@ -313,15 +342,11 @@ class FcbCli:
         self.serial_port.write(self._linebreak(self._ERASE_FLASH_COMMAND).encode("utf-8"))
         if not self._read_ack():
             raise FcbNoAckError(fcb_command=self._ERASE_FLASH_COMMAND)
-        help_bytes = self.serial_port.read(size=10000)
-        help_str = "" if not help_bytes else help_bytes.decode("utf-8")
-        # Read from FCB once per second until complete msg is read
-        while not self._has_complete(search_str=help_str):
-            if not help_bytes:
-                raise FcbIncompleteError(fcb_command=self._ERASE_FLASH_COMMAND)
-            ConsoleView.cli_erase_print(help_str)
-            help_bytes = self.serial_port.read(size=10000)
-            help_str = "" if not help_bytes else help_bytes.decode("utf-8")
+        # The FCB prints progress about once per second until it's done
+        self._read_complete(
+            fcb_command=self._ERASE_FLASH_COMMAND,
+            on_data=lambda data: ConsoleView.cli_erase_print(data.decode("utf-8", errors="replace")),
+        )
 
     def run_sim(self, flight_filepath: str) -> None:
         """
@@ -332,7 +357,7 @@ class FcbCli:
         k_min_code_loop_period_s = 0.02
 
         # Read CSV to ensure flight filepath is valid
-        df = pd.read_csv(flight_filepath, index_col=0)
+        df = read_csv_cached(flight_filepath, index_col=0)
 
         # Seems like we need a flush here to get rid of extra data hiding in the rx buffer
         # without this we sometimes get leftover data from the last CLI command
@@ -426,11 +451,7 @@ class FcbCli:
             self.serial_port.write(data)
 
         # Check for complete ACK
-        complete_data = self.serial_port.read(size=len(self._COMPLETE))
-        if not complete_data:
-            raise FcbIncompleteError(fcb_command=self._SIM_COMMAND)
-        if not self._has_complete(search_str=complete_data.decode("utf8")):
-            raise FcbIncompleteError(fcb_command=self._SIM_COMMAND)
+        self._read_complete(fcb_command=self._SIM_COMMAND)
 
     def run_sense(self) -> str:
         """
@@ -446,10 +467,7 @@ class FcbCli:
         self.serial_port.write(self._linebreak(self._SENSE_COMMAND).encode("utf-8"))
         if not self._read_ack():
             raise FcbNoAckError(fcb_command=self._SENSE_COMMAND)
-        sense_bytes = self.serial_port.read(size=10000)
-        sense_str = "" if not sense_bytes else sense_bytes.decode("utf-8")
-        if not self._has_complete(search_str=sense_str):
-            raise FcbIncompleteError(fcb_command=self._SENSE_COMMAND)
+        sense_str = self._read_complete(fcb_command=self._SENSE_COMMAND)
         return sense_str.strip(self._COMPLETE)
 
     @property
@@ -648,6 +666,16 @@ class FcbCli:
         return unpack_properties
 
 
+def _unpack_properties_to_dtype(unpack_properties: List[UnpackProperty]) -> np.dtype:
+    """
+    Build the packed little endian NumPy dtype that matches a list of struct unpack properties.
+
+    :param unpack_properties: Properties with single character struct format strings
+    :return: Structured dtype with one field per property
+    """
+    return np.dtype([(prop.name, f"<{prop.unpack_str}") for prop in unpack_properties])
+
+
 if __name__ == "__main__":
     # Get port from user via console
     port_list = SerialPortManager.get_connected_ports()
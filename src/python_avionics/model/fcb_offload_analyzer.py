@@ -10,6 +10,7 @@ import pandas as pd
 from matplotlib.backend_bases import MouseButton
 
 from src.python_avionics.model.fcb_cli import FcbCli
+from src.python_avionics.model.offload_csv_cache import read_csv_cached
 from src.python_avionics.model.serial_port import SerialPortManager
 from src.python_avionics.view.console_view import ConsoleView
 
@@ -37,7 +38,7 @@ class FcbOffloadAnalyzer:
 
         :return Output filepath
         """
-        df = pd.read_csv(self._offload_data_filepath)
+        df = read_csv_cached(self._offload_data_filepath)
 
         # Ask for data to keep of launch and trim
         df_timestamp_col = "timestamp_s" if "timestamp_s" in df.columns else "timestamp_ms"
@@ -121,7 +122,7 @@ def _graph_data(post_processed_file: str) -> None:
 
     :param post_processed_file: CSV file of post-processed data
     """
-    df = pd.read_csv(post_processed_file)
+    df = read_csv_cached(post_processed_file)
     df_timestamp_col = "timestamp_s" if "timestamp_s" in df.columns else "timestamp_ms"
     # IMU data
     fig, ax = plt.subplots(4)
@@ -0,0 +1,179 @@
+"""Columnar binary cache for offloaded CSVs, so each one only has to be parsed once."""
+
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, cast
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR_NAME = ".offload_cache"
+_META_FILE_NAME = "meta.json"
+_CACHE_VERSION = 1
+
+_cache_lock = threading.Lock()
+
+
+def _get_cache_dir(filepath: str) -> str:
+    """
+    Get the folder the cache for one CSV lives in, next to the CSV.
+
+    :param filepath: Path to the CSV
+    :return: Cache folder path
+    """
+    directory, file_name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, CACHE_DIR_NAME, file_name)
+
+
+def _get_source_key(filepath: str) -> Dict[str, Any]:
+    """
+    Get what identifies the current contents of a CSV, so a cache of an older version of it is never used.
+
+    :param filepath: Path to the CSV
+    :return: Dict of the file's size and modification time
+    """
+    stat = os.stat(filepath)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_meta(filepath: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the cache metadata for a CSV.
+
+    :param filepath: Path to the CSV
+    :return: Metadata, or None if there's no cache or it's out of date
+    """
+    try:
+        with open(os.path.join(_get_cache_dir(filepath), _META_FILE_NAME)) as meta_file:
+            meta = cast(Dict[str, Any], json.load(meta_file))
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != _CACHE_VERSION or meta.get("source") != _get_source_key(filepath):
+        return None
+    return meta
+
+
+def _write_cache(filepath: str, df: pd.DataFrame) -> None:
+    """
+    Save every number column of a freshly parsed CSV to its own .npy file.
+
+    Text columns would need pickling, so they're only listed in the metadata, and get parsed out of the CSV when they're asked
+    for.  Metadata is written last, so a cache that didn't finish writing is never read.
+
+    :param filepath: Path to the CSV the dataframe came from
+    :param df: Dataframe straight out of pd.read_csv
+    """
+    cache_dir = _get_cache_dir(filepath)
+    try:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.makedirs(cache_dir)
+        text_columns = []
+        for i, column in enumerate(df.columns):
+            values = df.iloc[:, i].to_numpy()
+            if values.dtype == object:
+                text_columns.append(str(column))
+            else:
+                np.save(os.path.join(cache_dir, f"{i}.npy"), values, allow_pickle=False)
+
+        meta = {
+            "version": _CACHE_VERSION,
+            "source": _get_source_key(filepath),
+            "columns": [str(column) for column in df.columns],
+            "text_columns": text_columns,
+        }
+        with open(os.path.join(cache_dir, _META_FILE_NAME), "w") as meta_file:
+            json.dump(meta, meta_file)
+    except OSError as e:
+        print(f"Unable to cache {filepath}: {e}")
+
+
+def _set_index(df: pd.DataFrame, index_column: Optional[str]) -> pd.DataFrame:
+    """
+    Do what pd.read_csv's index_col does, for a dataframe that was read without it.
+
+    :param df: Dataframe read without an index column
+    :param index_column: Name of the column to use as the index, or None
+    :return: Dataframe with that column as its index
+    """
+    if index_column is None:
+        return df
+
+    df = df.set_index(index_column)
+    if str(index_column).startswith("Unnamed: "):  # Blank header, which pandas leaves unnamed for index columns
+        df.index.name = None
+    return df
+
+
+def cache_dataframe(filepath: str, df: pd.DataFrame) -> None:
+    """
+    Cache a dataframe that was just saved to a CSV, so the first read of that CSV doesn't have to parse it.
+
+    :param filepath: Path to the CSV the dataframe was saved to, after it's been closed
+    :param df: Dataframe with the same columns and dtypes pd.read_csv would give for that CSV
+    """
+    with _cache_lock:
+        _write_cache(filepath, df)
+
+
+def read_csv_columns(filepath: str) -> List[str]:
+    """
+    Get the column names of a CSV, without reading any of its data.
+
+    :param filepath: Path to the CSV
+    :return: Column names, in file order
+    """
+    meta = _read_meta(filepath)
+    if meta is not None:
+        return cast(List[str], meta["columns"])
+    return [str(column) for column in pd.read_csv(filepath, nrows=0).columns]
+
+
+def read_csv_cached(filepath: str, columns: Optional[List[str]] = None, index_col: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read a CSV like pd.read_csv, but from its columnar cache if it has an up to date one.
+
+    The first read of a CSV parses the whole thing and caches it.  Later reads only load the columns that were asked for, and
+    only parse the CSV again for text columns.
+
+    :param filepath: Path to the CSV
+    :param columns: Columns to read, or None for all of them
+    :param index_col: Position (in the whole file) of the column to use as the index, or None
+    :return: Dataframe of the CSV
+    """
+    with _cache_lock:
+        meta = _read_meta(filepath)
+        if meta is None:
+            df = pd.read_csv(filepath)
+            _write_cache(filepath, df)
+            all_columns = [str(column) for column in df.columns]
+            text_columns: List[str] = []
+        else:
+            df = None
+            all_columns = cast(List[str], meta["columns"])
+            text_columns = cast(List[str], meta.get("text_columns", []))
+
+        index_column = all_columns[index_col] if index_col is not None else None
+        if columns is not None:
+            missing = [column for column in columns if column not in all_columns]
+            if missing:
+                raise KeyError(f"{missing} not in {filepath}")
+        wanted = [column for column in all_columns if columns is None or column in columns or column == index_column]
+
+        if df is not None:
+            df = df[wanted] if columns is not None else df
+        else:
+            cache_dir = _get_cache_dir(filepath)
+            data = {column: np.load(os.path.join(cache_dir, f"{all_columns.index(column)}.npy"), allow_pickle=False) for column in wanted if column not in text_columns}
+
+            wanted_text_positions = [all_columns.index(column) for column in wanted if column in text_columns]
+            if wanted_text_positions:
+                text_df = pd.read_csv(filepath, usecols=wanted_text_positions)
+                for i, position in enumerate(sorted(wanted_text_positions)):
+                    data[all_columns[position]] = text_df.iloc[:, i]  # Kept as a series, so it keeps the dtype pd.read_csv gave it
+
+            df = pd.DataFrame(data, columns=wanted)
+
+    return _set_index(df, index_column)
@@ -0,0 +1,170 @@
+"""Streams an FCB flash offload to disk, with live progress and the ability to pick up where a failed transfer left off."""
+
+import os
+import time
+from typing import BinaryIO, Callable, List, Optional, Tuple
+
+from src.python_avionics.exceptions import FcbIncompleteError
+from src.python_avionics.model.serial_port import SerialPort
+
+
+class OffloadProgress:
+    """Byte and throughput counters for an offload transfer."""
+
+    def __init__(self) -> None:
+        """Initialize counters for a transfer that hasn't started yet."""
+        self.start_time = time.time()
+        self.bytes_saved = 0  # Bytes in the .part file, including what a previous transfer saved
+        self.bytes_received = 0  # Bytes read from the serial port across every attempt
+        self.bytes_per_second = 0.0
+        self.attempt = 1
+        self.resumed_from = 0
+        self.done = False
+
+    def __str__(self) -> str:
+        """Get a one line summary for the console."""
+        status = "Offload done" if self.done else f"Offloading (attempt {self.attempt})"
+        resumed = f", resumed from {self.resumed_from / 1024:.1f} kB" if self.resumed_from > 0 else ""
+        return f"{status}: {self.bytes_saved / 1024:.1f} kB saved, {self.bytes_per_second / 1024:.1f} kB/s, {time.time() - self.start_time:.0f} s{resumed}"
+
+
+class OffloadTransfer:
+    """
+    Reads an offload stream into a .part file until the complete identifier shows up.
+
+    Gaps in the data don't end the transfer, only the complete identifier or STALL_TIMEOUT_S without any data does.  After a
+    stall, the offload command gets sent again.  The FCB always sends a flight from the start, so the part of the new stream
+    that's already saved is checked against the .part file and skipped, and only new bytes get written.  A .part file left
+    behind by a failed transfer is resumed the same way the next time the same flight is offloaded.
+    """
+
+    MIN_READ_SIZE = 2048
+    MAX_READ_SIZE = 64 * 1024
+    TARGET_READ_TIME_S = 0.25  # Size reads so each one takes about this long at the current throughput
+    STALL_TIMEOUT_S = 10
+    MAX_ATTEMPTS = 3
+    PROGRESS_PERIOD_S = 0.25
+    THROUGHPUT_WINDOW_S = 2.0
+
+    def __init__(
+        self,
+        serial_port: SerialPort,
+        output_filepath: str,
+        complete_identifier: bytes,
+        progress_cb: Optional[Callable[[OffloadProgress], None]] = None,
+    ) -> None:
+        """
+        Initialize a transfer into the given file.
+
+        :param serial_port: Serial port the offload comes in on
+        :param output_filepath: Where the finished offload goes.  Data goes into output_filepath + ".part" until it's done
+        :param complete_identifier: Bytes the FCB ends the offload with.  These are kept at the end of the file
+        :param progress_cb: Called with the progress counters every PROGRESS_PERIOD_S while the transfer runs
+        """
+        self.serial_port = serial_port
+        self.output_filepath = output_filepath
+        self.part_filepath = f"{output_filepath}.part"
+        self.complete_identifier = complete_identifier
+        self.progress_cb = progress_cb
+        self.progress = OffloadProgress()
+
+        self._last_progress_time = 0.0
+        self._throughput_window: List[Tuple[float, int]] = []  # [(time, bytes_received)]
+
+    def run(self, send_command: Callable[[], None]) -> OffloadProgress:
+        """
+        Run the transfer, retrying after stalls, and rename the .part file to the output file once it's complete.
+
+        :param send_command: Sends the offload command and checks its ack.  Gets called again for every retry
+        :return: Final progress counters
+        """
+        with open(self.part_filepath, "ab+") as part_file:
+            part_file.seek(0, os.SEEK_END)
+            self.progress.bytes_saved = part_file.tell()
+            self.progress.resumed_from = self.progress.bytes_saved
+
+            for attempt in range(1, self.MAX_ATTEMPTS + 1):
+                self.progress.attempt = attempt
+                self.serial_port.flush()
+                send_command()
+                if self._read_stream(part_file):
+                    break
+            else:
+                self._report_progress(force=True)
+                raise FcbIncompleteError(fcb_command=f"offload into {self.part_filepath}")
+
+        os.replace(self.part_filepath, self.output_filepath)
+        self.progress.done = True
+        self._report_progress(force=True)
+        return self.progress
+
+    def _read_stream(self, part_file: BinaryIO) -> bool:
+        """
+        Read one attempt's stream into the .part file.
+
+        :param part_file: Open .part file
+        :return: Whether the complete identifier was received
+        """
+        stream_offset = 0
+        tail = b""
+        last_data_time = time.time()
+
+        while time.time() - last_data_time < self.STALL_TIMEOUT_S:
+            data = self.serial_port.read(size=self._get_read_size())
+            if not data:
+                self._report_progress()
+                continue
+            last_data_time = time.time()
+            self.progress.bytes_received += len(data)
+
+            # Skip over anything that's already saved, as long as it matches
+            saved_count = min(max(self.progress.bytes_saved - stream_offset, 0), len(data))
+            if saved_count > 0:
+                part_file.seek(stream_offset)
+                saved_data = part_file.read(saved_count)
+                if saved_data != data[:saved_count]:
+                    # The saved copy is wrong from here on, so this stream replaces it
+                    saved_count = next(i for i in range(saved_count) if saved_data[i] != data[i])
+                    part_file.truncate(stream_offset + saved_count)
+                    self.progress.bytes_saved = stream_offset + saved_count
+
+            # Append mode always writes at the end, which is right after everything that's saved
+            part_file.write(data[saved_count:])
+            part_file.flush()
+            stream_offset += len(data)
+            self.progress.bytes_saved = max(self.progress.bytes_saved, stream_offset)
+            self._report_progress()
+
+            # The identifier can be split between reads, so keep enough of the end of the stream around to find it
+            tail = (tail + data)[-len(self.complete_identifier) :]
+            if tail == self.complete_identifier and stream_offset >= self.progress.bytes_saved:
+                return True
+
+        return False
+
+    def _get_read_size(self) -> int:
+        """
+        Pick how many bytes to ask for, based on recent throughput.
+
+        :return: Read size in bytes
+        """
+        read_size = int(self.progress.bytes_per_second * self.TARGET_READ_TIME_S)
+        return min(max(read_size, self.MIN_READ_SIZE), self.MAX_READ_SIZE)
+
+    def _report_progress(self, force: bool = False) -> None:
+        """
+        Update the throughput counter and call the progress callback, at most every PROGRESS_PERIOD_S.
+
+        :param force: Call the callback even if it was called recently
+        """
+        now = time.time()
+        self._throughput_window.append((now, self.progress.bytes_received))
+        while len(self._throughput_window) > 2 and now - self._throughput_window[0][0] > self.THROUGHPUT_WINDOW_S:
+            self._throughput_window.pop(0)
+        window_time = now - self._throughput_window[0][0]
+        if window_time > 0:
+            self.progress.bytes_per_second = (self.progress.bytes_received - self._throughput_window[0][1]) / window_time
+
+        if self.progress_cb is not None and (force or now - self._last_progress_time >= self.PROGRESS_PERIOD_S):
+            self._last_progress_time = now
+            self.progress_cb(self.progress)
@@ -1,6 +1,7 @@
 """Handles all behavior related to serial port use and management"""
 
-from typing import List, Optional
+import time
+from typing import Callable, List, Optional
 
 import serial
 import serial.tools.list_ports
@@ -28,6 +29,10 @@ class SerialPort:
             timeout=self._DEFAULT_PORT_TIMEOUT_S,
         )
 
+        # Bytes that came in past the end of the last response, so the next read gets them first
+        self._rx_buffer = bytearray()
+        self._scan_position = 0  # Where the terminator search in _rx_buffer picks back up
+
     def write(self, data: bytes) -> None:
         """
         Write data to serial port.
@@ -43,6 +48,54 @@ class SerialPort:
         """
         Read a number of bytes from the serial port
 
+        :param size: Number of bytes to read from port
+        """
+        if self._rx_buffer:
+            data = bytes(self._rx_buffer[:size])
+            self._consume(len(data))
+            if len(data) == size:
+                return data
+            return data + (self._read_port(size - len(data)) or b"")
+        return self._read_port(size)
+
+    def read_until(self, terminator: bytes, timeout_s: float = _DEFAULT_PORT_TIMEOUT_S, on_data: Optional[Callable[[bytes], None]] = None) -> Optional[bytes]:
+        """
+        Read from the serial port until the terminator shows up, without waiting out the port timeout once it has.
+
+        Reads pull in everything that's waiting at once, and the terminator search picks up where the last one left off, so
+        this returns about as soon as the terminator is on the wire.  Anything after the terminator is kept for the next read.
+
+        :param terminator: Bytes that end the response
+        :param timeout_s: Give up once this long goes by without any new data
+        :param on_data: Called with each new chunk of data as it comes in
+        :return: Response, including the terminator, or None if it timed out (the partial response is thrown out)
+        """
+        last_data_time = time.time()
+        while True:
+            end = self._rx_buffer.find(terminator, self._scan_position)
+            if end >= 0:
+                end += len(terminator)
+                data = bytes(self._rx_buffer[:end])
+                self._consume(end)
+                return data
+            # The terminator could be split between this data and the next, so back up a little for the next search
+            self._scan_position = max(len(self._rx_buffer) - len(terminator) + 1, 0)
+
+            if time.time() - last_data_time > timeout_s:
+                self._consume(len(self._rx_buffer))
+                return None
+
+            chunk = self._read_port(max(self._in_waiting(), 1))
+            if chunk:
+                last_data_time = time.time()
+                self._rx_buffer += chunk
+                if on_data is not None:
+                    on_data(chunk)
+
+    def _read_port(self, size: int) -> Optional[bytes]:
+        """
+        Read straight from the serial port, skipping the rx buffer
+
         :param size: Number of bytes to read from port
         """
         try:
@@ -51,7 +104,25 @@ class SerialPort:
             raise SerialPortDisconnectedError(port_name=self.name)
         return data
 
+    def _in_waiting(self) -> int:
+        """Get the number of bytes the port has already received"""
+        try:
+            in_waiting: int = self.port.in_waiting
+        except Exception:
+            raise SerialPortDisconnectedError(port_name=self.name)
+        return in_waiting
+
+    def _consume(self, size: int) -> None:
+        """
+        Drop bytes off the front of the rx buffer
+
+        :param size: Number of bytes to drop
+        """
+        del self._rx_buffer[:size]
+        self._scan_position = 0
+
     def flush(self) -> None:
+        self._consume(len(self._rx_buffer))
         self.port.flush()
         self.port.flushInput()
         self.port.flushOutput()
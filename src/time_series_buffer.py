@@ -0,0 +1,336 @@
+"""
+Preallocated ring buffer for time series data, used to keep graph history
+
+Every sample is written twice, at index i and at index i + capacity.  That way the samples from the oldest to the newest are always one
+contiguous slice of the arrays, so the data can go straight to pyqtgraph as numpy views, without copying or re-ordering it.
+
+Times have to be added in order (never decreasing), which lets windows be found with a binary search.
+
+For long histories, MinMaxPyramid keeps the min and max of every 2, 4, 8, ... samples, so a graph can draw any window with about as many
+points as it has pixels, no matter how many samples are in the window.
+"""
+
+import math
+
+import numpy
+
+
+def decimate_min_max(times, values, bucket_count):
+    """
+    Splits the samples into bucket_count buckets, and returns [times, values] with the min and max of each bucket (so 2 points per bucket).
+    Costs O(number of samples), so it's only used when there isn't a pyramid to use
+    """
+
+    bucket_size = int(math.ceil(len(values) / float(bucket_count)))
+    if bucket_size <= 1:
+        return [times, values]
+
+    full_length = (len(values) // bucket_size) * bucket_size
+    bucket_times = times[0:full_length:bucket_size]
+    mins = numpy.fmin.reduce(values[0:full_length].reshape(-1, bucket_size), axis=1)
+    maxes = numpy.fmax.reduce(values[0:full_length].reshape(-1, bucket_size), axis=1)
+
+    if full_length < len(values):  # Leftover samples go in one last, smaller bucket
+        bucket_times = numpy.append(bucket_times, times[full_length])
+        mins = numpy.append(mins, numpy.fmin.reduce(values[full_length:]))
+        maxes = numpy.append(maxes, numpy.fmax.reduce(values[full_length:]))
+
+    return interleave_min_max(bucket_times, mins, maxes)
+
+
+def interleave_min_max(bucket_times, mins, maxes):
+    """Turns per-bucket min and max into one line that goes min, max, min, max..."""
+    out_times = numpy.repeat(bucket_times, 2)
+    out_values = numpy.empty(2 * len(mins), dtype=numpy.float64)
+    out_values[0::2] = mins
+    out_values[1::2] = maxes
+    return [out_times, out_values]
+
+
+class MinMaxPyramid(object):
+    """
+    Min/max summary of a time series at every power of two.
+
+    Level k (k >= 1) has one bucket for every 2**k samples: the time of its first sample, and the min and max value in it.  Only full buckets
+    are stored.  Level 0 is the raw data, which isn't stored here.  Buckets line up with sample indices, so samples can be added at the end
+    in O(1) (amortized), but can't be dropped from the front.
+    """
+
+    def __init__(self, times, values):
+        self.times = []  # One array per level (index 0 is level 1), with room to grow
+        self.mins = []
+        self.maxes = []
+        self.counts = []  # Number of full buckets in each level
+
+        # Build all the levels at once
+        level_times = times
+        level_mins = values
+        level_maxes = values
+        while len(level_mins) >= 2:
+            count = len(level_mins) // 2
+            level_times = level_times[0 : 2 * count : 2]
+            level_mins = numpy.fmin(level_mins[0 : 2 * count : 2], level_mins[1 : 2 * count : 2])
+            level_maxes = numpy.fmax(level_maxes[0 : 2 * count : 2], level_maxes[1 : 2 * count : 2])
+            self.addLevel(level_times, level_mins, level_maxes)
+
+    def addLevel(self, times, mins, maxes):
+        capacity = max(16, 2 * len(mins))
+        self.times.append(numpy.empty(capacity, dtype=numpy.float64))
+        self.mins.append(numpy.empty(capacity, dtype=numpy.float64))
+        self.maxes.append(numpy.empty(capacity, dtype=numpy.float64))
+        self.counts.append(len(mins))
+
+        self.times[-1][0 : len(mins)] = times
+        self.mins[-1][0 : len(mins)] = mins
+        self.maxes[-1][0 : len(mins)] = maxes
+
+    def getLevelCount(self):
+        """Number of levels, counting the raw data as level 0"""
+        return len(self.counts) + 1
+
+    def getBucket(self, level, index, times, values):
+        """[time, min, max] for one bucket.  times and values are the raw data, for level 0"""
+        if level == 0:
+            return [times[index], values[index], values[index]]
+        return [self.times[level - 1][index], self.mins[level - 1][index], self.maxes[level - 1][index]]
+
+    def updateSample(self, index, times, values):
+        """
+        Call after the sample at index was added or changed.  times and values are views of all the raw data.
+        Updates every bucket with that sample in it, which is O(number of levels)
+        """
+
+        level = 1
+        while True:
+            bucket_index = index >> 1
+            child_count = len(values) if level == 1 else self.counts[level - 2]
+            if child_count < 2 * bucket_index + 2:  # This bucket isn't full yet
+                return
+
+            [first_time, first_min, first_max] = self.getBucket(level - 1, 2 * bucket_index, times, values)
+            [_, second_min, second_max] = self.getBucket(level - 1, 2 * bucket_index + 1, times, values)
+
+            if level > len(self.counts):
+                self.addLevel([], [], [])
+            level_index = level - 1
+            if bucket_index == len(self.mins[level_index]):  # Out of room, double it
+                for level_arrays in [self.times, self.mins, self.maxes]:
+                    level_arrays[level_index] = numpy.concatenate([level_arrays[level_index], numpy.empty(len(level_arrays[level_index]), dtype=numpy.float64)])
+
+            self.times[level_index][bucket_index] = first_time
+            self.mins[level_index][bucket_index] = numpy.fmin(first_min, second_min)
+            self.maxes[level_index][bucket_index] = numpy.fmax(first_max, second_max)
+            self.counts[level_index] = max(self.counts[level_index], bucket_index + 1)
+
+            index = bucket_index
+            level += 1
+
+    def getDecimated(self, first, last, bucket_count, times, values):
+        """
+        Returns [times, values] covering raw samples [first, last) with about bucket_count min/max buckets.
+        Costs O(bucket_count + number of levels), no matter how many samples are in the window
+        """
+
+        level = int(math.ceil(math.log2(max((last - first) / float(bucket_count), 1))))
+        level = min(level, self.getLevelCount() - 1)
+        if level == 0:
+            return [times[first:last], values[first:last]]
+
+        bucket_size = 1 << level
+        full_start = min(-(-first // bucket_size) * bucket_size, last)  # First bucket boundary in the window
+        full_end = max(min((last // bucket_size) * bucket_size, self.counts[level - 1] * bucket_size), full_start)
+
+        # Whole buckets in the middle come straight from this level, and the ragged ends get covered with smaller buckets from lower levels
+        pieces = self.getCoveringBuckets(first, full_start, level, times, values)
+        pieces.append([self.times[level - 1][full_start // bucket_size : full_end // bucket_size], self.mins[level - 1][full_start // bucket_size : full_end // bucket_size], self.maxes[level - 1][full_start // bucket_size : full_end // bucket_size]])
+        pieces += self.getCoveringBuckets(full_end, last, level, times, values)
+
+        bucket_times = numpy.concatenate([piece[0] for piece in pieces])
+        mins = numpy.concatenate([piece[1] for piece in pieces])
+        maxes = numpy.concatenate([piece[2] for piece in pieces])
+        return interleave_min_max(bucket_times, mins, maxes)
+
+    def getCoveringBuckets(self, first, last, max_level, times, values):
+        """The fewest buckets (at most max_level - 1 of them on each end) that exactly cover samples [first, last)"""
+        pieces = []
+        index = first
+        while index < last:
+            level = max_level - 1
+            while level > 0 and (index % (1 << level) != 0 or index + (1 << level) > last or (index >> level) >= self.counts[level - 1]):
+                level -= 1
+
+            [bucket_time, bucket_min, bucket_max] = self.getBucket(level, index >> level, times, values)
+            pieces.append([numpy.array([bucket_time]), numpy.array([bucket_min]), numpy.array([bucket_max])])
+            index += 1 << level
+        return pieces
+
+
+class TimeSeriesBuffer(object):
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.times = numpy.empty(2 * capacity, dtype=numpy.float64)
+        self.values = numpy.empty(2 * capacity, dtype=numpy.float64)
+        self.start = 0  # Index of the oldest sample
+        self.length = 0
+
+        self.is_ring = True  # False when the arrays came from setData, and aren't laid out as a ring yet
+        self.time_range = None  # [min, max] for data from setData, which might not be sorted
+
+        # Only kept while samples are just being added at the end.  Dropping old samples throws it away
+        self.pyramid: MinMaxPyramid = None
+        self.discarded_since_last_draw = False
+
+    def __len__(self):
+        return self.length
+
+    def clear(self):
+        self.start = 0
+        self.length = 0
+        self.pyramid = None
+
+    def setData(self, times, values):
+        """Replaces everything in the buffer with these arrays.  Doesn't copy them unless something gets appended later"""
+        self.times = numpy.asarray(times, dtype=numpy.float64)
+        self.values = numpy.asarray(values, dtype=numpy.float64)
+        self.capacity = len(self.times)
+        self.start = 0
+        self.length = len(self.times)
+        self.is_ring = False
+        self.pyramid = None
+
+        if self.length > 0:
+            self.time_range = [numpy.nanmin(self.times), numpy.nanmax(self.times)]
+        else:
+            self.time_range = None
+
+    def resize(self, capacity):
+        """Moves the data into a new ring of this size.  Drops the oldest samples if there are more than capacity"""
+        times = self.getTimes()[-capacity:]
+        values = self.getValues()[-capacity:]
+
+        self.capacity = capacity
+        self.times = numpy.empty(2 * capacity, dtype=numpy.float64)
+        self.values = numpy.empty(2 * capacity, dtype=numpy.float64)
+        self.start = 0
+        self.length = len(times)
+
+        self.times[0 : self.length] = times
+        self.times[capacity : capacity + self.length] = times
+        self.values[0 : self.length] = values
+        self.values[capacity : capacity + self.length] = values
+
+        self.is_ring = True
+        self.time_range = None
+
+    def append(self, time, value):
+        if not self.is_ring or self.length == self.capacity:
+            self.resize(max(self.capacity * 2, 16))
+
+        index = self.start + self.length
+        if index >= self.capacity:
+            index -= self.capacity
+
+        self.length += 1
+        self.writeSample(index, time, value)
+
+        if self.pyramid is not None:
+            self.pyramid.updateSample(self.length - 1, self.getTimes(), self.getValues())
+
+    def writeSample(self, index, time, value):
+        """Writes both copies of the sample at index (0 <= index < capacity)"""
+        self.times[index] = time
+        self.times[index + self.capacity] = time
+        self.values[index] = value
+        self.values[index + self.capacity] = value
+
+    def setLast(self, time, value):
+        """Overwrites the newest sample"""
+        if not self.is_ring:
+            self.resize(max(self.capacity, 16))
+        self.writeSample((self.start + self.length - 1) % self.capacity, time, value)
+
+        if self.pyramid is not None:
+            self.pyramid.updateSample(self.length - 1, self.getTimes(), self.getValues())
+
+    def getLastTime(self):
+        return self.times[self.start + self.length - 1]
+
+    def getLastValue(self):
+        return self.values[self.start + self.length - 1]
+
+    def discardBefore(self, time, placeholder_value=float("nan")):
+        """
+        Drops every sample at or before time, and puts a (time, placeholder_value) sample in front of what's left.
+        The placeholder keeps the x axis of a graph covering the whole window, and a nan placeholder won't be drawn
+        """
+
+        if self.length == 0:
+            return
+
+        if self.times[self.start] > time:  # Nothing old enough to drop
+            return
+
+        if self.length > 1 and self.times[self.start + 1] > time:  # Usually only the placeholder has to move, so skip the search
+            first_to_keep = 1
+        else:
+            first_to_keep = int(numpy.searchsorted(self.getTimes(), time, side="right"))
+
+        if not self.is_ring:
+            self.resize(max(self.capacity, 16))
+
+        self.pyramid = None  # Its buckets are lined up with samples that just got dropped
+        self.discarded_since_last_draw = True
+
+        drop = first_to_keep - 1  # The last dropped sample becomes the placeholder
+        self.start = (self.start + drop) % self.capacity
+        self.length -= drop
+        self.writeSample(self.start, time, placeholder_value)
+
+    def getTimes(self) -> numpy.ndarray:
+        """View (not a copy) of all the times, oldest first"""
+        return self.times[self.start : self.start + self.length]
+
+    def getValues(self) -> numpy.ndarray:
+        """View (not a copy) of all the values, oldest first"""
+        return self.values[self.start : self.start + self.length]
+
+    def getWindowIndices(self, min_time=None, max_time=None):
+        """[first, last] indices (into getTimes()) of the samples with min_time < time <= max_time.  None means no limit"""
+        times = self.getTimes()
+        first = 0 if min_time is None else int(numpy.searchsorted(times, min_time, side="right"))
+        last = self.length if max_time is None else int(numpy.searchsorted(times, max_time, side="right"))
+        return [first, max(first, last)]
+
+    def getWindow(self, min_time=None, max_time=None):
+        """Returns views of [times, values] for min_time < time <= max_time.  None means no limit"""
+        [first, last] = self.getWindowIndices(min_time, max_time)
+        return [self.getTimes()[first:last], self.getValues()[first:last]]
+
+    def getDecimatedWindow(self, min_time=None, max_time=None, bucket_count=1000):
+        """
+        Like getWindow, but with at most about 2 * bucket_count points.  Windows with more samples than that are drawn as the min and max of
+        each bucket, so spikes don't disappear.  Returns the raw views when there are few enough samples
+        """
+
+        [first, last] = self.getWindowIndices(min_time, max_time)
+        if last - first <= 2 * bucket_count:
+            return [self.getTimes()[first:last], self.getValues()[first:last]]
+
+        # Samples are being dropped off the front every loop, so a pyramid would be thrown away right after it was built
+        if self.discarded_since_last_draw:
+            self.discarded_since_last_draw = False
+            return decimate_min_max(self.getTimes()[first:last], self.getValues()[first:last], bucket_count)
+
+        if self.pyramid is None:
+            self.pyramid = MinMaxPyramid(self.getTimes(), self.getValues())
+        return self.pyramid.getDecimated(first, last, bucket_count, self.getTimes(), self.getValues())
+
+    def getTimeRange(self):
+        """[smallest time, largest time], or None if there's no data"""
+        if self.length == 0:
+            return None
+        if self.time_range is not None:
+            return self.time_range
+
+        times = self.getTimes()
+        return [numpy.nanmin(times[[0, -1]]), numpy.nanmax(times[[0, -1]])]
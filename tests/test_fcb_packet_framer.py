@@ -0,0 +1,60 @@
+import random
+import struct
+
+from src.Modules.MessageParsing.fcb_message_parsing import PACKET_LENGTH
+from src.Modules.MessageParsing.fcb_packet_framer import PacketFramer
+
+RADIO_STATUS_LENGTH = 4
+
+
+def make_packet(message_number, timestamp, padding=b"\x00"):
+    # Short payload and zero padding, like most real packets
+    header = struct.pack("<BBBI8s", message_number, 1, 2, timestamp, b"KM6GNL\x00\x00")
+    body = (header + struct.pack("<fff", 1.0, 2.0, 3.0)).ljust(PACKET_LENGTH - RADIO_STATUS_LENGTH, padding)
+    return body + struct.pack("<Bb?B", 1, -40, True, 50)
+
+
+def make_packets(count, padding=b"\x00"):
+    random.seed(0)
+    return [make_packet(random.choice([2, 3, 6]), i, padding) for i in range(count)]
+
+
+def feed(framer, data, chunk_size):
+    frames = bytearray()
+    for i in range(0, len(data), chunk_size):
+        frames += framer.addData(data[i : i + chunk_size])
+    frames += framer.flush()  # Stream went quiet, like a read timing out
+    return [bytes(frames[i : i + PACKET_LENGTH]) for i in range(0, len(frames), PACKET_LENGTH)]
+
+
+def test_clean_stream_passes_through():
+    packets = make_packets(200)
+    for chunk_size in [len(packets) * PACKET_LENGTH, PACKET_LENGTH, 50, 7]:
+        framer = PacketFramer()
+        assert feed(framer, b"".join(packets), chunk_size) == packets
+        assert framer.resyncs == 0
+        assert not framer.hasHeldFrame()
+
+
+def test_short_packet_only_loses_that_packet():
+    packets = make_packets(200)
+    stream = b"".join(packets[:50]) + packets[50][:70] + b"".join(packets[51:])
+    expected = packets[:50] + packets[51:]
+
+    for chunk_size in [len(stream), PACKET_LENGTH, 50, 7]:
+        framer = PacketFramer()
+        assert feed(framer, stream, chunk_size) == expected
+        assert framer.resyncs == 1
+        assert framer.discarded_bytes == 70
+
+
+def test_packet_before_short_packet_survives():
+    # With no zero padding, the misaligned frame at the short packet fails its trailer check, so the packet before it
+    # fails the check on the packet after it too
+    packets = make_packets(200, padding=b"\xff")
+    stream = b"".join(packets[:50]) + packets[50][:70] + b"".join(packets[51:])
+
+    for chunk_size in [len(stream), PACKET_LENGTH, 50, 7]:
+        framer = PacketFramer()
+        assert feed(framer, stream, chunk_size) == packets[:50] + packets[51:]
+        assert framer.discarded_bytes == 70